@@ -9,17 +9,34 @@ Usage:      python3 LDA.py
             Sam Wiseman
 """
 
+import copy
 import csv
 import json
+import re
 import sys
-from collections import OrderedDict, Counter
-from numpy.random import choice
+import numpy as np
 import time
 import math
-from operator import itemgetter
-import copy
-
-def runLDA(corpus, iterations, alpha, beta):
+from array import array
+import contextlib
+import os
+import shutil
+import samplers
+import parallel
+import checkpoint
+import modelStore
+import onlineLDA
+import convergence
+import instrumentation
+import chunking
+import postings
+import corpusCache
+import chains
+import tokenStore
+import incremental
+
+def runLDA(corpus, iterations, alpha, beta, seed=None, blockSize=samplers.DEFAULT_BLOCK_SIZE, sampler='gibbs',
+           workers=1, checkpointFile=None, checkpointEvery=0, resume=False, monitor=None):
     """An implementation of Latent Dirichlet Allocation. Probabilistically
         generates "topics" for a given corpus, each of which contains many
         words that are related by their coocurrence in the text. Uses the
@@ -39,83 +56,222 @@ def runLDA(corpus, iterations, alpha, beta):
         beta (float): Another hyperparameter, this one affecting the P(t|d)
             calculation. A higher value for beta causes topics to contain a greater
             variety of words.
+        seed (int): Seed for the random number generator. Runs with the same seed
+            and settings produce the same topics. None draws a fresh seed.
+        blockSize (int): The most tokens the sampler resamples together in one
+            array operation. A block takes a stripe of consecutive tokens from
+            every document in turn (see samplers.blockSchedule); the approximation
+            is that each token misses the moves of the other tokens in its block.
+            1 gives exact sequential Gibbs sampling.
+        sampler (str): The name of the sampling engine in samplers.SWEEPS. 'gibbs'
+            computes the full conditional over every topic for each word; 'mh'
+            uses Metropolis-Hastings proposals whose cost does not grow with the
+            number of topics, and is the faster of the two beyond a few hundred topics.
+        workers (int): The number of processes to sample with. More than 1 splits
+            the documents between the processes and merges their word-topic
+            counts after every iteration (approximate distributed LDA).
+        checkpointFile (str): The .npz file checkpoints are written to and resumed from.
+            It is deleted once the run finishes if the run resumed from it or
+            wrote it; a checkpoint of another run is left alone unless this run
+            writes over it.
+        checkpointEvery (int): Write a checkpoint after every checkpointEvery
+            iterations. 0 turns checkpoints off.
+        resume (bool): Continue from checkpointFile, if it exists, instead of from
+            the first iteration. The resumed run gives the same topics as a run
+            that was never interrupted.
+        monitor (convergence.ConvergenceMonitor): Tracks the log-likelihood of the
+            run and may stop it early once it has converged. None turns tracking off.
+
+    Returns:
+        int: The number of iterations completed, which is less than iterations if
+            the monitor stopped the run early.
+
+    """
+    rng = np.random.default_rng(seed)
+    settings = {'alpha': alpha, 'beta': beta, 'topics': corpus.numTopics, 'sampler': sampler,
+                'block size': blockSize, 'workers': workers}
+    startIteration = 0
+    # the checkpoint is only deleted at the end if this run resumed from it or wrote it
+    ownsCheckpoint = False
+    if resume:
+        if os.path.exists(checkpointFile):
+            startIteration = checkpoint.loadCheckpoint(checkpointFile, corpus, rng, settings)
+            ownsCheckpoint = True
+            print("Resuming from iteration " + str(startIteration) + " of " + checkpointFile)
+        else:
+            print("No checkpoint found at " + checkpointFile + "; starting from the first iteration")
+    elif checkpointFile is not None and os.path.exists(checkpointFile):
+        if checkpointEvery:
+            print("Not resuming, so the checkpoint at " + checkpointFile + " will be overwritten; "
+                  "use --resume to continue the run it was taken from instead")
+        else:
+            print("Not resuming; the checkpoint at " + checkpointFile + " is left as it is")
+
+    if monitor is not None:
+        monitor.start(corpus, alpha, beta, startIteration)
+
+    def afterIteration(completed):
+        nonlocal ownsCheckpoint
+        if checkpointEvery and completed % checkpointEvery == 0 and completed < iterations:
+            checkpoint.saveCheckpoint(checkpointFile, corpus, completed, rng, settings)
+            ownsCheckpoint = True
+        return monitor is not None and monitor.measure(completed)
+
+    if workers > 1:
+        engine = parallel.ParallelSampler(corpus, workers, sampler, blockSize)
+        sweep = lambda: engine.sweep(alpha, beta, rng)
+    elif corpus.tokenStore is not None:
+        engine = contextlib.nullcontext()
+        sweep = lambda: corpus.tokenStore.sweep(samplers.SWEEPS[sampler], corpus, alpha, beta, rng, blockSize)
+    else:
+        engine = contextlib.nullcontext()
+        tokenDocs = samplers.tokenDocIndex(corpus.docOffsets)
+        schedule = samplers.blockSchedule(corpus.docOffsets, blockSize, tokenDocs)
+        sweep = lambda: samplers.SWEEPS[sampler](corpus, alpha, beta, rng, blockSize, tokenDocs, schedule)
+    with engine:
+        completed = sampleIterations(sweep, iterations, startIteration, afterIteration, len(corpus.tokenIds))
+    if monitor is not None:
+        monitor.finish()
+    if ownsCheckpoint:
+        checkpoint.removeCheckpoint(checkpointFile)
+    return completed
+
+
+def runOnlineLDA(fileName, numTopics, iterations, alpha, beta, stopLowerBound, stopUpperBound, stopWhitelist,
+                 stopBlacklist, seed=None, batchSize=onlineLDA.DEFAULT_BATCH_SIZE, tau0=onlineLDA.DEFAULT_TAU0,
+                 kappa=onlineLDA.DEFAULT_KAPPA):
+    """Trains LDA with online variational Bayes, streaming minibatches of documents
+        from a csv in the format written by txtToCsv. Only one document and the
+        (words x topics) model parameters are held in memory at a time. The csv is
+        read once to find the vocabulary and stopwords, then once per iteration.
+
+    Args:
+        fileName (str): The csv of (word, document) rows to train on.
+        numTopics (int): The number of topics.
+        iterations (int): The number of passes over the corpus.
+        alpha (float): The Dirichlet prior on document-topic distributions.
+        beta (float): The Dirichlet prior on topic-word distributions.
+        stopLowerBound (float): As in CorpusData.loadData.
+        stopUpperBound (float): As in CorpusData.loadData.
+        stopWhitelist (list): As in CorpusData.loadData.
+        stopBlacklist (list): As in CorpusData.loadData.
+        seed (int): Seed for the random number generator. None draws a fresh seed.
+        batchSize (int): The number of documents in each minibatch.
+        tau0 (float): Delay of the learning rate.
+        kappa (float): Decay of the learning rate.
+
+    Returns:
+        OnlineLDA: The trained model. Pass it to writeOnlineOutputs to get output in
+            the usual formats.
 
     """
-    printProgressBar(0, iterations, prefix='Progress', suffix='complete', length=50)
-    for i in range(0, iterations):
-        # getting start time to measure runtime
-        # delete the line below for the final release!
-        startTime = time.clock()
-        for doc in range(len(corpus.wordLocationArray)):
-            for word in range(len(corpus.wordLocationArray[doc])):
-                oldTopic = corpus.topicAssignmentByLoc[doc][word]
-                corpus.removeWordFromDataStructures(word, doc, oldTopic)
-                wordProbabilities = corpus.calculateProbabilities(doc, word, alpha, beta)
-                newTopic = choice(range(len(wordProbabilities)), p=wordProbabilities)
-                corpus.addWordToDataStructures(word, doc, newTopic)
-        estTime = math.ceil((time.clock() - startTime) * (iterations - i) / 60)
-        time.sleep(0.1)
+    # count the documents each word appears in, in the order the words first appear
+    wordDocCounts = {}
+    numDocs = 0
+    for docLabel, docWords in readDocuments(fileName):
+        numDocs += 1
+        for word in dict.fromkeys(docWords):
+            wordDocCounts[word] = wordDocCounts.get(word, 0) + 1
+    allWords = list(wordDocCounts)
+    stopwords, keepWord = findStopwords(allWords, np.array(list(wordDocCounts.values())), numDocs,
+                                        stopLowerBound, stopUpperBound, stopWhitelist, stopBlacklist)
+    vocab = [allWords[i] for i in np.flatnonzero(keepWord)]
+    del wordDocCounts, allWords
+
+    model = onlineLDA.OnlineLDA(vocab, numTopics, numDocs, alpha, beta, np.random.default_rng(seed), tau0, kappa,
+                                stopwords)
+    wordIds = model.wordIds
+
+    def trainPass():
+        docs = (np.array([wordIds[word] for word in docWords if word in wordIds], dtype=np.int32)
+                for docLabel, docWords in readDocuments(fileName))
+        for batch in onlineLDA.minibatches(docs, batchSize):
+            model.update(batch)
+
+    sampleIterations(trainPass, iterations)
+    return model
+
+
+def readDocuments(fileName):
+    """Streams the documents of a csv in the format written by txtToCsv, one at a time.
+        As in CorpusData.loadRows, a new document starts whenever the document label
+        changes.
+
+    Args:
+        fileName (str): The csv of (word, document) rows.
+
+    Yields:
+        (str, [str]): The label and the lowercased words of each document.
+
+    """
+    with open(fileName, 'r') as csvfile:
+        curDoc = None
+        docWords = []
+        for row in csv.reader(csvfile):
+            if curDoc != row[1]:
+                if docWords:
+                    yield curDoc, docWords
+                curDoc = row[1]
+                docWords = []
+            docWords.append(row[0].lower())
+        if docWords:
+            yield curDoc, docWords
+
+
+def sampleIterations(sweep, iterations, startIteration=0, afterIteration=None, numTokens=None):
+    """Calls sweep once per iteration while drawing the progress bar, and reports
+        the time each sweep takes to the instrumentation hooks. When the output is
+        not a terminal the progress bar is left out, and the hooks log the sweeps.
+
+    Args:
+        sweep (function): Performs one iteration of sampling.
+        iterations (int): The total number of iterations in the run.
+        startIteration (int): The number of iterations already completed.
+        afterIteration (function): Called with the number of completed iterations
+            after each sweep. Returning True ends the run early.
+        numTokens (int): The number of tokens sampled by each sweep, if known.
+
+    Returns:
+        int: The number of iterations completed.
+
+    """
+    showBar = instrumentation.useProgressBar()
+    if showBar:
+        printProgressBar(startIteration, iterations, prefix='Progress', suffix='complete', length=50)
+    for i in range(startIteration, iterations):
+        # getting start time to estimate the remaining runtime
+        startTime = time.perf_counter()
+        cpuStartTime = time.process_time()
+        sweep()
+        sweepTime = time.perf_counter() - startTime
+        instrumentation.sweepDone(i + 1, iterations, sweepTime, time.process_time() - cpuStartTime, numTokens)
+        if afterIteration is not None and afterIteration(i + 1):
+            if showBar:
+                printProgressBar(iterations, iterations, prefix='Progress', suffix='complete', length=50)
+            print("Converged after " + str(i + 1) + " iterations")
+            return i + 1
+        estTime = math.ceil(sweepTime * (iterations - i - 1) / 60)
+        if not showBar:
+            continue
         if i == iterations-1:
             printProgressBar(i + 1, iterations, prefix='Progress', suffix='complete', length=50)
         elif (estTime > 0):
             printProgressBar(i + 1, iterations, prefix='Progress', suffix='complete', length=50, estTimeRemaining=estTime)
         else:
             printProgressBar(i + 1, iterations, prefix='Progress', suffix='complete', length=50)
+    return iterations
+
+
+# rows written to the topic .csv by outputAsCSV, including the two header rows
+CSV_ROWS = 200
+# words printed for each topic by printTopics
+PRINTED_TOPIC_WORDS = 20
 
 
 # class that stores words from a text and organizes them in various ways to facilitate LDA
 # organization can be by location, by document, by word, and topic
 # the methods load in text, encode data, and output topics in various ways
 class CorpusData:
-    # Location Information
-    # 2d array: outer array contains documents which are arrays of words in the order they appear
-    wordLocationArray = []
-    # 2d array: outer array contains documents which are arrays of topics which exactly match the words
-    # in the previous array
-    topicAssignmentByLoc = []
-
-    #data structures used for creating the annotated text
-    #wordLocArrayStatic is wordLocationArray with stopwords included
-    #topicAssignByLocStatic is topicAssignmentByLoc with stopwords included
-    wordLocArrayStatic = []
-    topicAssignByLocStatic = []
-
-    # Word Information
-    # dictionary mapping unique words to the number of times they appear
-    uniqueWordDict = {}
-    # dictionary mapping unique words to an array indexed by topic of how many times they
-    # appear in each topic
-    wordDistributionAcrossTopics = {}
-
-    # Topic Information
-    # array of topics, where topics are dictionaries
-    # keys are words and the values are counts for that word
-    topicWordInstancesDict = []
-    # array of numbers, where each number is the number of words in the topic (corresponding by index)
-    topicTotalWordCount = []
-
-    # Document Information
-    # array of documents, each document is an array
-    # each index is a topic
-    # each value is number of words in the document that belong to that topic
-    docTopicalWordDist = []
-    # a list of of the number of words in each document
-    docTotalWordCounts = []
-    #a list of punctuation
-    punctuation = []
-    #the locations of the punctuation
-    puncLocations = []
-
-    # consideration: the way the csv is organized could vary. should we standardize it as
-    # pat of preprocessing? we are currently using the format given by wikiParse.py
-    # working csv
-    file = ""
-
-    # number of topics we want in the output
-
-    numTopics = 0
-
-    stopwords = []
 
     def __init__(self, file, numTopics):
         """Constructor for CorpusData.
@@ -128,8 +284,150 @@ class CorpusData:
             CorpusData: An instance of the corpus data class that only contains a file and number of topics.
 
         """
+        # consideration: the way the csv is organized could vary. should we standardize it as
+        # pat of preprocessing? we are currently using the format given by wikiParse.py
+        # working csv
         self.file = file
+        # number of topics we want in the output
         self.numTopics = numTopics
+        self.stopwords = []
+
+        # Vocabulary
+        # list mapping word ids to words, in the order the words first appear in the corpus
+        self.vocab = []
+        # dictionary mapping words to their ids in vocab
+        self.wordIds = {}
+
+        # Location Information
+        # flat int32 array of the word id of every (non-stopword) token in corpus order
+        self.tokenIds = np.zeros(0, dtype=np.int32)
+        # flat int32 array of the topic currently assigned to each token in tokenIds
+        self.tokenTopics = np.zeros(0, dtype=np.int32)
+        # document d owns tokenIds[docOffsets[d]:docOffsets[d + 1]]
+        self.docOffsets = np.zeros(1, dtype=np.int64)
+
+        # Count Information
+        # n_wt[w][t] is the number of times word w is assigned to topic t
+        self.n_wt = np.zeros((0, numTopics), dtype=np.int32)
+        # n_dt[d][t] is the number of words in document d assigned to topic t
+        self.n_dt = np.zeros((0, numTopics), dtype=np.int32)
+        # n_t[t] is the number of words assigned to topic t
+        self.n_t = np.zeros(numTopics, dtype=np.int64)
+
+        # Document Information
+        # a list of of the number of words in each document
+        self.docTotalWordCounts = []
+
+        #data structures used for creating the annotated text, with stopwords included
+        #staticVocab is vocab followed by the stopwords, in the order they first appear
+        self.staticVocab = []
+        #flat int32 array of the staticVocab id of every token in corpus order
+        self.staticTokenIds = np.zeros(0, dtype=np.int32)
+        #document d owns staticTokenIds[staticDocOffsets[d]:staticDocOffsets[d + 1]]
+        self.staticDocOffsets = np.zeros(1, dtype=np.int64)
+        #keepMask[i] is True if token i of staticTokenIds is not a stopword,
+        #so tokenIds is staticTokenIds[keepMask]
+        self.keepMask = np.zeros(0, dtype=bool)
+        #flat int32 array of the topic of every token, -1 for stopwords. set by createAnnoTextDataStructure
+        self.staticTopics = None
+        #inverted index of staticTokenIds: the documents and positions of each staticVocab word
+        self.postings = postings.Postings.build(self.staticTokenIds, self.staticDocOffsets, 0)
+        #the tokenStore.TokenStore holding tokenIds, tokenTopics and docOffsets on disk, or None
+        self.tokenStore = None
+        #called by samplers.moveTokens as moveListener(counts, words, docs, fromTopics, toTopics)
+        #after every change to the counts, or None
+        self.moveListener = None
+        #a list of punctuation
+        self.punctuation = []
+        #the locations of the punctuation
+        self.puncLocations = []
+
+    # the properties below rebuild the original string-keyed views from the count matrices.
+    # they are copies, so build them once and reuse them rather than calling them in a loop
+
+    @property
+    def numDocs(self):
+        """int: The number of documents in the corpus."""
+        return len(self.docOffsets) - 1
+
+    @property
+    def wordLocationArray(self):
+        """[[str]]: The documents as lists of words in the order they appear,
+            with stopwords removed.
+
+        """
+        vocab = self.vocab
+        return [[vocab[w] for w in doc] for doc in self._splitByDoc(self.tokenIds)]
+
+    @property
+    def topicAssignmentByLoc(self):
+        """[[int]]: The documents as lists of topics which exactly match the
+            words in wordLocationArray.
+
+        """
+        return self._splitByDoc(self.tokenTopics)
+
+    @property
+    def uniqueWordDict(self):
+        """dict: Maps each unique (non-stopword) word to the number of times it appears."""
+        return dict(zip(self.vocab, self.n_wt.sum(axis=1).tolist()))
+
+    @property
+    def wordDistributionAcrossTopics(self):
+        """dict: Maps each unique word to a list indexed by topic of how many
+            times it appears in each topic.
+
+        """
+        return dict(zip(self.vocab, self.n_wt.tolist()))
+
+    @property
+    def wordLocArrayStatic(self):
+        """[[str]]: wordLocationArray with stopwords included."""
+        vocab = self.staticVocab
+        return [[vocab[w] for w in doc] for doc in self._splitByDoc(self.staticTokenIds, self.staticDocOffsets)]
+
+    @property
+    def topicAssignByLocStatic(self):
+        """[[int]]: topicAssignmentByLoc with stopwords included, as of the last call to
+            createAnnoTextDataStructure. Stopwords have topic -1.
+
+        """
+        if self.staticTopics is None:
+            return []
+        return self._splitByDoc(self.staticTopics, self.staticDocOffsets)
+
+    @property
+    def topicWordInstancesDict(self):
+        """[dict]: One dictionary per topic mapping words to their counts in
+            that topic. Words that are not assigned to the topic are left out.
+
+        """
+        vocab = self.vocab
+        topics = []
+        for topic in range(self.numTopics):
+            column = self.n_wt[:, topic]
+            wordIds = np.flatnonzero(column)
+            topics.append(dict(zip([vocab[w] for w in wordIds], column[wordIds].tolist())))
+        return topics
+
+    @property
+    def topicTotalWordCount(self):
+        """[int]: The number of words in each topic."""
+        return self.n_t.tolist()
+
+    @property
+    def docTopicalWordDist(self):
+        """[[int]]: For each document, the number of its words that belong to each topic."""
+        return self.n_dt.tolist()
+
+    def _splitByDoc(self, tokenArray, docOffsets=None):
+        """Splits a flat per-token array into one list per document, using
+            docOffsets if given and the offsets of tokenIds otherwise.
+
+        """
+        values = tokenArray.tolist()
+        offsets = (self.docOffsets if docOffsets is None else docOffsets).tolist()
+        return [values[offsets[d]:offsets[d + 1]] for d in range(len(offsets) - 1)]
 
     # reads the csv and loads the appropriate data structures. may be refactored by struct
     # stopLowerBound and stopUpperBound are floats between 0 and 1
@@ -137,7 +435,7 @@ class CorpusData:
     # stopWhitelist and stopBlacklist are two lists of strings
     # strings in stopWhitelist will not be filtered out even if they are outside the document bounds
     # strings in stopBlacklist will be filtered out even if they are inside the document bounds
-    def loadData(self, stopLowerBound, stopUpperBound, stopWhitelist, stopBlacklist):
+    def loadData(self, stopLowerBound, stopUpperBound, stopWhitelist, stopBlacklist, store=None):
         """Reads the csv and loads the data structures used in LDA.
 
         Args:
@@ -147,123 +445,271 @@ class CorpusData:
                 to be included in the algorithm.
             stopWhitelist (list): A list of words that should never be filtered out of the algorithm.
             stopBlacklist (list): A list of words that should always be filtered out of the algorithm.
+            store (tokenStore.TokenStore): As in loadRows.
 
         """
         with open(self.file, 'r') as csvfile:
-            reader = csv.reader(csvfile)
-            wordsColumn = []
-            docColumn = []
-            curDoc = ""
-            curDocIndex = -1
-            # load our 2d wordsByLocation array
-            for row in reader:
-                # add the word to the current array if word's doc is curDoc
-                if curDoc == row[1]:
-                    self.wordLocationArray[curDocIndex].append(row[0].lower())
+            self.loadRows(csv.reader(csvfile), stopLowerBound, stopUpperBound, stopWhitelist, stopBlacklist, store)
+
+    def loadText(self, fileName, splitString, stopLowerBound, stopUpperBound, stopWhitelist, stopBlacklist,
+                 csvFile=None, store=None):
+        """Chunks a .txt file into documents and loads the data structures used in LDA
+            straight from the chunks, without reading back a .csv.
+
+        Args:
+            fileName (str): The name of the .txt file.
+            splitString (str): The string generated by makeChunkString that
+                gives instructions on how to split up the txt file into documents.
+            stopLowerBound (float): As in loadData.
+            stopUpperBound (float): As in loadData.
+            stopWhitelist (list): As in loadData.
+            stopBlacklist (list): As in loadData.
+            csvFile (str): If given, the chunked words are also written to this .csv,
+                as txtToCsv would write them.
+            store (tokenStore.TokenStore): As in loadRows.
+
+        """
+        rows = chunking.chunkText(fileName, splitString)
+        if csvFile is not None:
+            rows = chunking.writeRows(rows, csvFile)
+        self.loadRows(rows, stopLowerBound, stopUpperBound, stopWhitelist, stopBlacklist, store)
+
+    def loadRows(self, rows, stopLowerBound, stopUpperBound, stopWhitelist, stopBlacklist, store=None):
+        """Loads the data structures used in LDA from (word, document) pairs in a
+            single pass. A new document starts whenever the document label changes.
+            The words are encoded as they are read, and stopwords are then found and
+            removed with array operations over the encoded corpus.
+
+        Args:
+            rows (iterable): (word, document label) pairs in corpus order, such as the
+                rows of a csv.reader.
+            stopLowerBound (float): The minimum percentage of documents a word must appear in
+                to be included in the algorithm.
+            stopUpperBound (float): The maximum percentage of documents a word can appear in
+                to be included in the algorithm.
+            stopWhitelist (list): A list of words that should never be filtered out of the algorithm.
+            stopBlacklist (list): A list of words that should always be filtered out of the algorithm.
+            store (tokenStore.TokenStore): The store to load the corpus into, or None to
+                load it into memory. The word ids are written to the store as they
+                are read, a block of documents at a time, and the stopwords found and
+                removed a block at a time from there, so the corpus is never held
+                in memory whole.
+
+        """
+        # ids for every word in the corpus, stopwords included
+        allWordIds = {}
+        allWords = []
+        tokens = array('i')
+        # tokens already written to the store
+        written = 0
+        flushTokens = sys.maxsize if store is None else store.blockTokens
+        docStarts = []
+        docLabelCounts = {}
+        curDoc = None
+        openTokens = contextlib.nullcontext if store is None else store.openTokens
+        with instrumentation.phase('load'), openTokens() as tokenFile:
+            for row in rows:
+                word = row[0].lower()
+                wordId = allWordIds.get(word)
+                if wordId is None:
+                    wordId = allWordIds[word] = len(allWords)
+                    allWords.append(word)
                 # add the word to a new doc array if word's doc is not curDoc
-                else:
+                if curDoc != row[1]:
                     curDoc = row[1]
-                    curDocIndex += 1
-                    self.wordLocationArray.append([])
-                    self.wordLocationArray[curDocIndex].append(row[0].lower())
-                # have a list representing each column in the doc
-                wordsColumn.append(row[0].lower())
-                docColumn.append(row[1])
-
-                # load word counts into dictionary
-        self.uniqueWordDict = Counter(wordsColumn)
-        self.wordLocArrayStatic = copy.deepcopy(self.wordLocationArray)
-
-        # removes stopwords
-        wordDocCounts = dict.fromkeys(self.uniqueWordDict, 0)
-        for doc in self.wordLocationArray:
-            wordInDoc = []
-            for word in doc:
-                if word not in wordInDoc:
-                    wordInDoc.append(word)
-                    wordDocCounts[word] += 1
-        if stopLowerBound == "off":
-            stopLowerBound = 0
-        if stopUpperBound == "off":
-            stopUpperBound = 2
-
-        lowerBound = math.ceil(len(self.wordLocationArray) * float(stopLowerBound))
-        upperBound = math.ceil(len(self.wordLocationArray) * float(stopUpperBound))
-
-        # create an array of stopwords
-        for word in wordDocCounts:
-            if wordDocCounts[word] <= lowerBound or wordDocCounts[word] >= upperBound:
-                self.stopwords.append(word)
-        for bannedWord in stopBlacklist:
-            if bannedWord not in self.stopwords:
-                self.stopwords.append(bannedWord)
-        for allowedWord in stopWhitelist:
-            if allowedWord in self.stopwords:
-                self.stopwords.remove(allowedWord)
-
-        # remove all stopwords from wordLocationArray and uniqueWordDict
-        self.stopwords = set(self.stopwords)
-
-        for docWords in self.wordLocationArray:
-            docWords[:] = [w for w in docWords if w not in self.stopwords]
-        for w in self.stopwords:
-            self.uniqueWordDict.pop(w, None)
+                    if len(tokens) >= flushTokens:
+                        tokens.tofile(tokenFile)
+                        written += len(tokens)
+                        del tokens[:]
+                    docStarts.append(written + len(tokens))
+                tokens.append(wordId)
+                docLabelCounts[curDoc] = docLabelCounts.get(curDoc, 0) + 1
+            if store is not None:
+                tokens.tofile(tokenFile)
+                written += len(tokens)
+                del tokens[:]
 
         # count words in each document (docWordCounts)
-        docSet = list(OrderedDict.fromkeys(docColumn))
-        for doc in docSet:
-            self.docTotalWordCounts.append(docColumn.count(doc))
-
-        # build topicsByLocation by going through each topic in a loop
-        for i in range(len(self.wordLocationArray)):
-            self.topicAssignmentByLoc.append([0] * len(self.wordLocationArray[i]))
-        chosenTopic = 0
-        for i in range(len(self.wordLocationArray)):
-            for j in range(len(self.wordLocationArray[i])):
-                chosenTopic += 1
-                chosenTopic %= self.numTopics
-                # randTopic = random.randrange(self.numTopics)
-                # self.topicsByLocation[i][j] = randTopic
-                self.topicAssignmentByLoc[i][j] = chosenTopic
-
-        # create wordTopicCounts using the information in topicsByLocation
-        for i in range(len(self.wordLocationArray)):
-            for j in range(len(self.wordLocationArray[i])):
-                word = self.wordLocationArray[i][j]
-                assignedTopic = self.topicAssignmentByLoc[i][j]
-                if word not in self.wordDistributionAcrossTopics:
-                    self.wordDistributionAcrossTopics[word] = [0] * self.numTopics
-                self.wordDistributionAcrossTopics[word][assignedTopic] += 1
-
-        # create docList
-        for i in range(len(self.wordLocationArray)):
-            self.docTopicalWordDist.append([])
-            for j in range(self.numTopics):
-                self.docTopicalWordDist[i].append(0)
-        # i indexes by document in topicsbylocation, then the topic number becomes an index
-        for i in range(len(self.topicAssignmentByLoc)):
-            for topic in self.topicAssignmentByLoc[i]:
-                self.docTopicalWordDist[i][topic] += 1
-
-        # loading topicList and topicWordCounts
-        self.topicTotalWordCount = [0] * self.numTopics
-        self.topicWordInstancesDict = [{} for _ in range(self.numTopics)]
-        for word in self.wordDistributionAcrossTopics:
-            wordTopics = self.wordDistributionAcrossTopics[word]
-            for i in range(self.numTopics):
-                self.topicWordInstancesDict[i][word] = wordTopics[i]
-                self.topicTotalWordCount[i] += wordTopics[i]
-                # if wordTopics[i] != 0:
-                #    self.topicWordCounts[i] += 1
-
-    def printTopics(self):
-        """Prints each topic in topicList on a new line in the format "Topic 1: word1, word2,
+        self.docTotalWordCounts = list(docLabelCounts.values())
+
+        numDocs = len(docStarts)
+        self.staticDocOffsets = np.array(docStarts + [written + len(tokens)], dtype=np.int64)
+        if store is not None:
+            self._loadIntoStore(store, allWords, stopLowerBound, stopUpperBound, stopWhitelist, stopBlacklist)
+            return
+        allTokenIds = np.frombuffer(tokens, dtype=np.intc).astype(np.int32)
+        with instrumentation.phase('postings', tokens=len(tokens)):
+            allPostings = postings.Postings.build(allTokenIds, self.staticDocOffsets, len(allWords))
+        self.filterStopwords(allWords, allTokenIds, allPostings, stopLowerBound, stopUpperBound, stopWhitelist,
+                             stopBlacklist)
+
+    def filterStopwords(self, allWords, allTokenIds, allPostings, stopLowerBound, stopUpperBound, stopWhitelist,
+                        stopBlacklist):
+        """Finds the stopwords of the encoded corpus, sets its tokens with them removed
+            and gives the tokens their first topics. staticDocOffsets must be set.
+
+        Args:
+            allWords ([str]): Every distinct word in the corpus, in the order of their ids.
+            allTokenIds (numpy.ndarray): The word id of every token, stopwords included.
+            allPostings (postings.Postings): The inverted index of allTokenIds.
+            stopLowerBound (float): As in loadRows.
+            stopUpperBound (float): As in loadRows.
+            stopWhitelist (list): As in loadRows.
+            stopBlacklist (list): As in loadRows.
+
+        """
+        numDocs = len(self.staticDocOffsets) - 1
+        with instrumentation.phase('stopword filtering', tokens=len(allTokenIds), documents=numDocs):
+            self.stopwords, keepWord = findStopwords(allWords, allPostings.documentFrequency(), numDocs,
+                                                     stopLowerBound, stopUpperBound, stopWhitelist, stopBlacklist)
+
+            # renumber the words so the remaining words come first and the stopwords
+            # after them, each in the order they first appear
+            keptWords = np.flatnonzero(keepWord)
+            newIds = np.empty(len(allWords), dtype=np.int32)
+            newIds[np.concatenate((keptWords, np.flatnonzero(~keepWord)))] = np.arange(len(allWords))
+            self.setTokens([allWords[i] for i in keptWords] + [allWords[i] for i in np.flatnonzero(~keepWord)],
+                           len(keptWords), newIds[allTokenIds], self.staticDocOffsets, allPostings.renumber(newIds))
+        with instrumentation.phase('initialization', tokens=len(self.tokenIds)):
+            self.initializeTopics()
+
+    def _loadIntoStore(self, store, allWords, stopLowerBound, stopUpperBound, stopWhitelist, stopBlacklist):
+        """Finishes loadRows for a corpus whose word ids have been written to a store."""
+        numTokens = int(self.staticDocOffsets[-1])
+        numDocs = len(self.staticDocOffsets) - 1
+        with instrumentation.phase('stopword filtering', tokens=numTokens, documents=numDocs):
+            tokenCounts, docCounts = store.countWords(self.staticDocOffsets, len(allWords))
+            self.stopwords, keepWord = findStopwords(allWords, docCounts, numDocs,
+                                                     stopLowerBound, stopUpperBound, stopWhitelist, stopBlacklist)
+            keptWords = np.flatnonzero(keepWord)
+            newIds = np.empty(len(allWords), dtype=np.int32)
+            newIds[np.concatenate((keptWords, np.flatnonzero(~keepWord)))] = np.arange(len(allWords))
+            self.setVocab([allWords[i] for i in keptWords] + [allWords[i] for i in np.flatnonzero(~keepWord)],
+                          len(keptWords))
+        with instrumentation.phase('token store', tokens=numTokens):
+            store.holdTokens(self, self.staticDocOffsets, newIds, len(keptWords), tokenCounts)
+        with instrumentation.phase('initialization', tokens=len(self.tokenIds)):
+            self.initializeTopics()
+
+    def setVocab(self, staticVocab, numWords):
+        """Sets the vocabulary followed by the stopwords, of which the first numWords
+            are not stopwords.
+
+        """
+        self.staticVocab = staticVocab
+        self.vocab = staticVocab[:numWords]
+        self.wordIds = {word: i for i, word in enumerate(self.vocab)}
+
+    def setTokens(self, staticVocab, numWords, staticTokenIds, staticDocOffsets, index):
+        """Sets the words of the corpus, stopwords included, and removes the stopwords.
+
+        Args:
+            staticVocab ([str]): The vocabulary followed by the stopwords.
+            numWords (int): The number of words in staticVocab that are not stopwords.
+            staticTokenIds (numpy.ndarray): The staticVocab id of every token in corpus order.
+            staticDocOffsets (numpy.ndarray): The offsets of each document into staticTokenIds.
+            index (postings.Postings): The inverted index of staticTokenIds.
+
+        """
+        self.setVocab(staticVocab, numWords)
+        self.staticTokenIds = staticTokenIds
+        self.staticDocOffsets = staticDocOffsets
+        self.keepMask = staticTokenIds < numWords
+        self.postings = index
+
+        # remove all stopwords
+        self.tokenIds = staticTokenIds[self.keepMask]
+        keptBefore = np.zeros(len(staticTokenIds) + 1, dtype=np.int64)
+        np.cumsum(self.keepMask, out=keptBefore[1:])
+        self.docOffsets = keptBefore[staticDocOffsets]
+
+    def initializeTopics(self):
+        """Gives every token an initial topic by cycling through the topics in
+            corpus order, and builds the count matrices to match. The topics of a
+            corpus held in a token store are written to the store.
+
+        """
+        if self.tokenStore is not None:
+            self.tokenStore.initializeTopics(self)
+            return
+        # build the initial topic assignments by going through each topic in a loop
+        self.tokenTopics = ((np.arange(len(self.tokenIds)) + 1) % self.numTopics).astype(np.int32)
+        self.countTopics()
+
+    def withStopwords(self, stopLowerBound, stopUpperBound, stopWhitelist, stopBlacklist):
+        """Returns a copy of this corpus with other stopword options, built from the
+            encoded tokens without reading the text again. The copy matches a
+            corpus loaded afresh with those options if this one was loaded with
+            no stopwords; otherwise its vocabulary lists this corpus' words first.
+
+        Args:
+            stopLowerBound (float): As in loadData.
+            stopUpperBound (float): As in loadData.
+            stopWhitelist (list): As in loadData.
+            stopBlacklist (list): As in loadData.
+
+        """
+        corpus = CorpusData(self.file, self.numTopics)
+        corpus.docTotalWordCounts = self.docTotalWordCounts
+        corpus.staticDocOffsets = self.staticDocOffsets
+        corpus.filterStopwords(self.staticVocab, self.staticTokenIds, self.postings, stopLowerBound, stopUpperBound,
+                               stopWhitelist, stopBlacklist)
+        return corpus
+
+    def withTopics(self, numTopics):
+        """Returns a copy of this corpus that starts sampling afresh with numTopics
+            topics. The copy shares the vocabulary and token arrays, which sampling
+            does not change, so one loaded corpus can seed many runs.
+
+        Args:
+            numTopics (int): The number of topics of the copy.
+
+        """
+        corpus = copy.copy(self)
+        corpus.numTopics = numTopics
+        corpus.staticTopics = None
+        corpus.initializeTopics()
+        return corpus
+
+    def countTopics(self):
+        """Rebuilds n_wt, n_dt and n_t from tokenIds and tokenTopics."""
+        docs = np.repeat(np.arange(self.numDocs), np.diff(self.docOffsets))
+        self.n_wt = np.zeros((len(self.vocab), self.numTopics), dtype=np.int32)
+        np.add.at(self.n_wt, (self.tokenIds, self.tokenTopics), 1)
+        self.n_dt = np.zeros((self.numDocs, self.numTopics), dtype=np.int32)
+        np.add.at(self.n_dt, (docs, self.tokenTopics), 1)
+        self.n_t = np.bincount(self.tokenTopics, minlength=self.numTopics).astype(np.int64)
+
+    def topWords(self, numWords):
+        """Finds the words with the highest counts in each topic, without sorting
+            whole topics.
+
+        Args:
+            numWords (int): The most words to return for each topic.
+
+        Returns:
+            [[(str, int)]]: For each topic, up to numWords (word, count) pairs of the
+            words assigned to it, from highest count to lowest. Words with equal
+            counts are in the order they first appear in the corpus.
+
+        """
+        vocab = self.vocab
+        return [[(vocab[w], self.n_wt[w, topic].item()) for w in wordIds]
+                for topic, wordIds in enumerate(topWordIds(self.n_wt, numWords))]
+
+    def printTopics(self, numWords=PRINTED_TOPIC_WORDS):
+        """Prints each topic on a new line in the format "Topic 1: word1, word2,
             word3, ..." The words are sorted from highest to lowest incidence in the topic.
 
+        Args:
+            numWords (int): The number of words printed for each topic. None prints
+                every word in the topic.
+
         """
-        for topic in self.topicWordInstancesDict:
-            print("Topic " + str(self.topicWordInstancesDict.index(topic) + 1) + ": "),
-            print(", ".join(sorted(topic, key=topic.get, reverse=True)))
+        if numWords is None:
+            numWords = len(self.vocab)
+        for topic, words in enumerate(self.topWords(numWords)):
+            print("Topic " + str(topic + 1) + ": " + ", ".join(word for word, count in words))
 
     def encodeData(self, readfile, topics, iterations, alpha, beta, outputname, puncData):
         """Encodes information about the LDA output in a .json file. Stores the
@@ -280,12 +726,6 @@ class CorpusData:
             puncData ([[str]]): Catalogue of tokens in the file that include punctuation or capitalization
 
         """
-        for doc in self.topicAssignByLocStatic:
-            for location in range(len(doc)):
-                doc[location] = int(doc[location])
-        for i in range(len(self.topicWordInstancesDict)):
-            self.topicWordInstancesDict[i] = {k:v for k,v in self.topicWordInstancesDict[i].items() if v}
-
         dumpDict = {'dataset': readfile[:-4],
                     'topics': topics,
                     'iterations': iterations,
@@ -304,6 +744,31 @@ class CorpusData:
         with open(outputfile, 'w') as outfile:
             json.dump(dumpDict, outfile, indent=4)
 
+    def encodeBinary(self, readfile, topics, iterations, alpha, beta, outputname, puncData):
+        """Saves the same information as encodeData in the binary model format
+            (see modelStore.py): a vocabulary table, int32 arrays of the word and
+            topic at every location, document offsets and the topic-word count
+            matrix. The model is written to the directory [outputname].model.
+
+        Args:
+            readfile (str): Name of the file given as input to LDA (with file extension).
+            topics (int): Number of topics generated by this run of LDA.
+            iterations (int): Number of iterations of this run of LDA.
+            alpha (float): Alpha constant used in this run of LDA.
+            beta (float): Beta constant used in this run of LDA.
+            outputname (str): Name of the model (without file extension).
+            puncData ([[str]]): Catalogue of tokens in the file that include punctuation or capitalization
+
+        """
+        arrays, vocab = modelStore.corpusArrays(self)
+        meta = {'dataset': readfile[:-4],
+                'topics': topics,
+                'iterations': iterations,
+                'alpha': alpha,
+                'beta': beta,
+                'stopwords': list(self.stopwords)}
+        modelStore.saveModel(modelStore.modelDirectory(outputname), meta, arrays, vocab, puncData)
+
     def removeWordFromDataStructures(self, word, doc, oldTopic):
         """Removes an instance of a word from a topic and updates the
             appropriate data structures accordingly.
@@ -315,10 +780,10 @@ class CorpusData:
                 question is being removed.
 
         """
-        wordString = self.wordLocationArray[doc][word]
-        self.topicWordInstancesDict[oldTopic][wordString] -= 1
-        self.topicTotalWordCount[oldTopic] -= 1
-        self.docTopicalWordDist[doc][oldTopic] -= 1
+        wordId = self.tokenIds[self.docOffsets[doc] + word]
+        self.n_wt[wordId, oldTopic] -= 1
+        self.n_t[oldTopic] -= 1
+        self.n_dt[doc, oldTopic] -= 1
 
     def addWordToDataStructures(self, word, doc, newTopic):
         """Adds an instance of a word to a topic and updates the approrpriate
@@ -330,11 +795,12 @@ class CorpusData:
             newTopic (int): The index of the topic to which the word in
                 question is being added.
         """
-        wordString = self.wordLocationArray[doc][word]
-        self.topicAssignmentByLoc[doc][word] = newTopic
-        self.topicWordInstancesDict[newTopic][wordString] += 1
-        self.topicTotalWordCount[newTopic] += 1
-        self.docTopicalWordDist[doc][newTopic] += 1
+        location = self.docOffsets[doc] + word
+        wordId = self.tokenIds[location]
+        self.tokenTopics[location] = newTopic
+        self.n_wt[wordId, newTopic] += 1
+        self.n_t[newTopic] += 1
+        self.n_dt[doc, newTopic] += 1
 
     def calculateProbabilities(self, docCoord, wordCoord, alpha, beta):
         """Given an instance of a word and two smoothing constants, returns
@@ -347,34 +813,24 @@ class CorpusData:
             beta (float): A constant default value for the P(t|d) calculation.
 
         Returns:
-            [float]: A list of normalized probabilities that the given word
+            numpy.ndarray: An array of normalized probabilities that the given word
             will appear in each topic. Each index in this list corresponds to a
             topic, and the probability associated with the topic is used in
             runLDA to determine to which topic a word should be assigned.
 
         """
-        word = self.wordLocationArray[docCoord][wordCoord]
-        newWordProbs = []
-        for i in range(len(self.topicWordInstancesDict)):
-            # pwt = P(w|t)
-            topicDict = self.topicWordInstancesDict[i]
-            wordCount = topicDict[word]
-            pwt = (wordCount + beta) / (self.topicTotalWordCount[i] + beta)
-            # ptd = P(t|d)
-            wordsInTopicInDoc = self.docTopicalWordDist[docCoord][i]
-            ptd = (wordsInTopicInDoc + alpha) / (self.docTotalWordCounts[docCoord] + alpha)
-            # ptw = P(t|w)
-            ptw = pwt * ptd
-            newWordProbs.append(ptw)
+        wordId = self.tokenIds[self.docOffsets[docCoord] + wordCoord]
+        # pwt = P(w|t)
+        pwt = (self.n_wt[wordId] + beta) / (self.n_t + beta)
+        # ptd = P(t|d)
+        ptd = (self.n_dt[docCoord] + alpha) / (self.docTotalWordCounts[docCoord] + alpha)
+        # ptw = P(t|w)
+        newWordProbs = pwt * ptd
         # normalize probabilities
-        normalizedProbabilities = []
-        rawsum = sum(newWordProbs)
-        for probability in newWordProbs:
-            if rawsum == 0:
-                normalizedProbabilities.append(0.0)
-            else:
-                normalizedProbabilities.append(probability / rawsum)
-        return normalizedProbabilities
+        rawsum = newWordProbs.sum()
+        if rawsum == 0:
+            return np.zeros(self.numTopics)
+        return newWordProbs / rawsum
 
     def outputAsCSV(self, outputname):
         """Creates a .csv file containing readable results from the LDA run.
@@ -387,65 +843,136 @@ class CorpusData:
                 .csv output file.
 
         """
-        loadData = []
-        largestTopic = max(self.topicTotalWordCount)
-        for i in range(largestTopic + 2):
-            new = []
-            for j in range(self.numTopics * 3):
-                new.append(0)
-            loadData.append(new)
-
-        # formatting
-        for i in range(self.numTopics):
-            loadData[0][3 * i] = ''
-            loadData[0][3 * i + 1] = 'Topic' + str(i + 1)
-            loadData[0][3 * i + 2] = ''
-            loadData[1][3 * i] = 'Word'
-            loadData[1][3 * i + 1] = 'Count'
-            loadData[1][3 * i + 2] = 'Percentage'
-
+        topicTotalWordCount = self.topicTotalWordCount
+        # the file has a row for each word of the largest topic, cut off at CSV_ROWS
+        numRows = min(max(topicTotalWordCount) + 2, CSV_ROWS)
+        topWords = self.topWords(numRows - 2)
+        titles = []
+        columnNames = []
         for i in range(self.numTopics):
-            topicAsList = []
-            for k, v in self.topicWordInstancesDict[i].items():
-                percent = (v / self.topicTotalWordCount[i]) * 100
-                topicAsList.append([k, v, percent])
-            topicAsList.sort(key=itemgetter(1), reverse=True)
-            for j in range(len(topicAsList)):
-                loadData[j + 2][3 * i] = topicAsList[j][0]
-                loadData[j + 2][3 * i + 1] = topicAsList[j][1]
-                loadData[j + 2][3 * i + 2] = topicAsList[j][2]
+            titles.extend(['', 'Topic' + str(i + 1), ''])
+            columnNames.extend(['Word', 'Count', 'Percentage'])
         outputfile = outputname + ".csv"
         with open(outputfile, 'w', newline='') as csvfile:
             filewriter = csv.writer(csvfile, delimiter=',')
-            count = 0
-            for row in loadData:
-                if count < 200:
-                    filewriter.writerow(row)
-                    count += 1
-                else:
-                    break
+            filewriter.writerow(titles)
+            filewriter.writerow(columnNames)
+            for j in range(numRows - 2):
+                row = []
+                for i in range(self.numTopics):
+                    if j < len(topWords[i]):
+                        word, count = topWords[i][j]
+                        row.extend([word, count, (count / topicTotalWordCount[i]) * 100])
+                    else:
+                        row.extend([0, 0, 0])
+                filewriter.writerow(row)
+
+    def outputSummary(self, outputname, numWords):
+        """Creates a .json file summarizing each topic by its most common words.
+            Each topic lists its total word count and, for each of its top words,
+            the Count and Percentage found in the .csv output.
+
+        Args:
+            outputname (str): The name of the run's output (with no file extension).
+                The summary is written to [outputname]-summary.json.
+            numWords (int): The number of words listed for each topic.
+
+        """
+        topicTotalWordCount = self.topicTotalWordCount
+        summary = []
+        for topic, words in enumerate(self.topWords(numWords)):
+            summary.append({'topic': topic + 1,
+                            'words': topicTotalWordCount[topic],
+                            'top words': [{'word': word, 'count': count,
+                                           'percentage': (count / topicTotalWordCount[topic]) * 100}
+                                          for word, count in words]})
+        with open(outputname + "-summary.json", 'w') as outfile:
+            json.dump({'topics': summary}, outfile, indent=4)
 
     def createAnnoTextDataStructure(self):
         """Creates "static" versions of several data structures such that they
             contain stop words. Used in the creation of the annotated text.
 
         """
+        if self.tokenStore is not None:
+            self.staticTopics = self.tokenStore.staticTopics(self)
+            return
         stopwordTopic = -1
-        for document in range(len(self.wordLocationArray)):
-            docTopicList = []
-            counter = 0
-            for word in range(len(self.wordLocArrayStatic[document])):
-                if len(self.wordLocationArray[document]) > counter:
-                    if self.wordLocArrayStatic[document][word] == self.wordLocationArray[document][counter]:
-                        docTopicList.append(self.topicAssignmentByLoc[document][counter])
-                        # self.topicAssignByLocStatic.append(int(self.topicAssignmentByLoc[document][counter])) <--potential restructure
-                        counter += 1
-                    else:
-                        docTopicList.append(stopwordTopic)
-                        #self.topicAssignByLocStatic(int(stopwordTopic)) <--potential restructure
-                else:
-                    docTopicList.append(stopwordTopic)
-            self.topicAssignByLocStatic.append(docTopicList)
+        self.staticTopics = np.full(len(self.staticTokenIds), stopwordTopic, dtype=np.int32)
+        self.staticTopics[self.keepMask] = self.tokenTopics
+
+def topWordIds(topicWordCounts, numWords):
+    """Selects the ids of the words with the highest counts in each topic. Each
+        topic is partitioned around its numWords-th highest count, so only the
+        selected words are sorted.
+
+    Args:
+        topicWordCounts (numpy.ndarray): A (words x topics) count matrix such as n_wt.
+        numWords (int): The most word ids to return for each topic.
+
+    Returns:
+        [numpy.ndarray]: For each topic, the ids of up to numWords words with a
+        nonzero count, from highest count to lowest, with ties in order of id.
+
+    """
+    vocabSize = len(topicWordCounts)
+    # reversed ids break ties in the count, so that every key is distinct
+    tieBreak = np.arange(vocabSize - 1, -1, -1, dtype=np.int64)
+    topics = []
+    for topic in range(topicWordCounts.shape[1]):
+        column = topicWordCounts[:, topic]
+        selected = min(numWords, np.count_nonzero(column))
+        if selected == 0:
+            topics.append(np.zeros(0, dtype=np.int64))
+            continue
+        keys = column.astype(np.int64) * vocabSize + tieBreak
+        candidates = np.argpartition(keys, vocabSize - selected)[vocabSize - selected:]
+        topics.append(candidates[np.argsort(keys[candidates])[::-1]])
+    return topics
+
+
+def findStopwords(words, wordDocCounts, numDocs, stopLowerBound, stopUpperBound, stopWhitelist, stopBlacklist):
+    """Applies the stopword options to a vocabulary.
+
+    Args:
+        words ([str]): Every distinct word in the corpus.
+        wordDocCounts (numpy.ndarray): The number of documents each word appears in.
+        numDocs (int): The number of documents in the corpus.
+        stopLowerBound (float): The minimum percentage of documents a word must appear in
+            to be included in the algorithm, or "off".
+        stopUpperBound (float): The maximum percentage of documents a word can appear in
+            to be included in the algorithm, or "off".
+        stopWhitelist (list): A list of words that should never be filtered out of the algorithm.
+        stopBlacklist (list): A list of words that should always be filtered out of the algorithm.
+
+    Returns:
+        (set, numpy.ndarray): The set of stopwords, which also holds blacklisted words
+            that are not in the corpus, and a boolean array that is True for the
+            words that are kept.
+
+    """
+    if stopLowerBound == "off":
+        stopLowerBound = 0
+    if stopUpperBound == "off":
+        stopUpperBound = 2
+
+    lowerBound = math.ceil(numDocs * float(stopLowerBound))
+    upperBound = math.ceil(numDocs * float(stopUpperBound))
+
+    # create the set of stopwords
+    isStopword = (wordDocCounts <= lowerBound) | (wordDocCounts >= upperBound)
+    stopwords = set(words[i] for i in np.flatnonzero(isStopword))
+    stopwords.update(stopBlacklist)
+    stopwords.difference_update(stopWhitelist)
+    keepWord = np.array([word not in stopwords for word in words], dtype=bool)
+    return stopwords, keepWord
+
+# characters that mark a word as carrying punctuation in grabPuncAndCap
+PUNCTUATION = '.,!?"():;“”‘’\''
+PUNCTUATION_PATTERN = re.compile('[' + re.escape(PUNCTUATION) + ']')
+# a word of the annotated text, whose words are separated by spaces, tabs and newlines
+ANNOTATION_WORD_PATTERN = re.compile('[^ \t\n]+')
+
 
 def grabPuncAndCap(fileName):
     """Given .txt file, iterates through to create data structures containing all words
@@ -466,53 +993,31 @@ def grabPuncAndCap(fileName):
             character belongs in the Annotated Text.
 
         """
-    fileString = open(fileName, 'r').read().split()
-    unsplitFile = open(fileName, 'r').read()
-    newlineLocations = []
-    count = 0
-    trackToken = ''
-    ##remove starting white space from file
-    removeStartWhitespace = False
-    while not removeStartWhitespace:
-        if unsplitFile[0] == ' ' or unsplitFile[0] == '\t' or unsplitFile[0] == '\n':
-            unsplitFile = unsplitFile[1:]
-        else:
-            removeStartWhitespace = True
-    ##get locations of new line characters
-    for i in range(len(unsplitFile)):
-        if unsplitFile[i] == "\n":
-            if trackToken != '':
-                newlineLocations.append(count)
-                trackToken = ''
-                count += 1
-            else:
-                newlineLocations.append(newlineLocations[len(newlineLocations)-1])
-        elif unsplitFile[i] == '\t' or unsplitFile[i] == ' ':
-            if unsplitFile[i+1] != '\t' and unsplitFile[i+1] != ' ' and unsplitFile[i+1] != "\n":
-                if trackToken != '':
-                    trackToken = ''
-                    count += 1
-        else:
-            trackToken += unsplitFile[i]
-
-    ##get punctuation and capitalization info
     puncAndCap = []
     puncCapLocations = []
-    count = 0
-    for token in fileString:
-        allPunc = False
-        if '.' in token or ',' in token or '!' in token or '?' in token or '"' in token or '(' in token or ')' in token or ':' in token or ';' in token or '“' in token or '”' in token or '‘' in token or '’' in token or "'" in token or any(ltr for ltr in token if ltr.isupper()):
-            allPunc = True
-            for char in token:
-                if char != "." and char != "," and char != "!" and char != "?" and char != '"' and char != "(" and char != ")" and char != ":" and char != ';' and char != '“' and char != '”' and char != '‘' and char != '’' and char != "'":
-                    allPunc = False
-            puncAndCap.append(token)
-            if allPunc:
-                puncCapLocations.append(count - 0.5)
-            else:
-                puncCapLocations.append(count)
-        if not allPunc:
-            count += 1
+    newlineLocations = []
+    # words are counted two ways: split on any whitespace for puncAndCap, and
+    # split on spaces, tabs and newlines for newlineLocations. neither kind of
+    # word can span a line, so the file is read one line at a time
+    wordCount = 0
+    annotationWordCount = 0
+    with open(fileName, 'r') as infile:
+        for line in infile:
+            ##get punctuation and capitalization info
+            for token in line.split():
+                if PUNCTUATION_PATTERN.search(token) or (not token.islower() and any(ltr.isupper() for ltr in token)):
+                    puncAndCap.append(token)
+                    # tokens made only of punctuation sit between words
+                    if token.strip(PUNCTUATION) == '':
+                        puncCapLocations.append(wordCount - 0.5)
+                        continue
+                    puncCapLocations.append(wordCount)
+                wordCount += 1
+            ##get locations of new line characters: each one follows the last word so far.
+            ##newlines before the first word are skipped
+            annotationWordCount += len(ANNOTATION_WORD_PATTERN.findall(line))
+            if line[-1] == "\n" and annotationWordCount > 0:
+                newlineLocations.append(annotationWordCount - 1)
     return puncAndCap, puncCapLocations, newlineLocations
     #return fileString, newlineLocations <--potential restructure
 
@@ -522,6 +1027,7 @@ def txtToCsv(fileName, splitString):
         corpus based on splitString. The .csv file has two columns: the first contains
         words in the order they appear in the corpus, and the second contains the
         document (denoted by an integer starting from 1) that contains the word.
+        The text is streamed through chunking.chunkText rather than read whole.
 
     Args:
         fileName (str): The name of the .txt file being read and converted.
@@ -529,37 +1035,10 @@ def txtToCsv(fileName, splitString):
             gives instructions on how to split up the txt file into documents.
 
     """
-    fileString = open(fileName, 'r').read().lower()
-    wordList = fileString.split()
-    if splitString[:3] == 'num':
-        numDocs = int(splitString[3:])
-        docLength = len(wordList) // numDocs
-        docStringsArray = getDocsOfLength(docLength, wordList, True)
-    #to have a fixed length document, input "lengthXX" for documents of length XX
-    elif splitString[:6] == 'length':
-        docLength = int(splitString[6:])
-        docStringsArray = getDocsOfLength(docLength, wordList, False)
-    else: 
-        docStringsArray = fileString.split(splitString.lower())
-        temp = [docStringsArray[0]]
-        for i in range(1, len(docStringsArray)):
-            temp.append(splitString + docStringsArray[i])
-
-        docStringsArray = temp
-    print("Number of documents: " + str(len(docStringsArray)))
-    for i in range(len(docStringsArray)):
-        docStringsArray[i] = docStringsArray[i].replace("\n", " ")
     csvfilename = fileName[:-4]+".csv"
     with open(csvfilename, 'w', newline='') as csvfile:
         filewriter = csv.writer(csvfile, delimiter=',')
-        currentDoc = 1
-        for docString in docStringsArray:
-            wordsArray = docString.split(' ')
-            for word in wordsArray:
-                word = word.strip('.,!?"“”‘’():;\n\t\'')
-                if word != '':
-                    filewriter.writerow([word,str(currentDoc)])
-            currentDoc += 1
+        filewriter.writerows(chunking.chunkText(fileName, splitString))
 
 def getDocsOfLength(docLen, wordList, numCap):
     """Divides a list of words up by documents with a desired length. If the words
@@ -584,11 +1063,7 @@ def getDocsOfLength(docLen, wordList, numCap):
 
     """
     print("Length of each document: " + str(docLen))
-    docStringsArray = []
-    while wordList:
-        doc = " ".join(str(wordList[i]) for i in range(min(docLen, len(wordList))))
-        wordList = wordList[docLen:]
-        docStringsArray.append(doc)
+    docStringsArray = [" ".join(wordList[start:start + docLen]) for start in range(0, len(wordList), docLen)]
     lastDocLen = len(docStringsArray[-1].split())
     #if we have a fixed number of documents, we want to stick a "stub" document onto the last one
     #otherwise, we will do it if it is under half the desired document length
@@ -659,6 +1134,262 @@ def printProgressBar(iteration, total, prefix='', suffix='', decimals=1, length=
     if iteration == total:
         sys.stdout.write('\n')
     sys.stdout.flush()
+def chunkOption(chunkingoptions):
+    """Returns the first chunking option in config.json that is not "off", and its value."""
+    for option in chunkingoptions.keys():
+        if chunkingoptions[option] != "off":
+            return option, chunkingoptions[option]
+    return "", 0
+
+
+def summaryOption(config):
+    """Returns the number of words per topic in the .json topic summary, read from
+        the output options of config.json, or None if the summary is "off".
+
+    """
+    summaryWords = config.get("output options", {}).get("summary words", "off")
+    if summaryWords == "off":
+        return None
+    if not isinstance(summaryWords, int) or isinstance(summaryWords, bool) or summaryWords < 1:
+        print("Invalid summary words given.\n")
+        exit()
+    return summaryWords
+
+
+def prepareSource(source, chunkType, chunkParam):
+    """Turns a .txt source into a .csv of words and documents, and catalogues its
+        punctuation and capitalization. A .csv source is used as it is.
+
+    Args:
+        source (str): The file name of the source text.
+        chunkType (str): The chunking option in use, as read from config.json.
+        chunkParam: The value of that chunking option.
+
+    Returns:
+        (str, [[str], [float], [int]]): The name of the .csv to load and the
+            punctuation data for the output files.
+
+    """
+    if source[-3:] == 'txt':
+        with instrumentation.phase('punctuation'):
+            puncData = grabPuncAndCap(source)
+        with instrumentation.phase('chunking'):
+            txtToCsv(source, makeChunkString(chunkType, chunkParam))
+        return source[:-4] + ".csv", puncData
+    return source, [[], [], []]
+
+
+def loadCorpus(source, topics, chunkType, chunkParam, stopLowerBound, stopUpperBound, stopWhitelist,
+               stopBlacklist, writeCsv=True, cache=None, store=None):
+    """Loads the source text into a CorpusData. A .txt source is chunked as it is
+        read and its punctuation and capitalization are catalogued; a .csv source
+        is read as it is. With a cache, a corpus loaded before from the same
+        source and options is read from the cache instead.
+
+    Args:
+        source (str): The file name of the source text.
+        topics (int): The number of topics to be output.
+        chunkType (str): The chunking option in use, as read from config.json.
+        chunkParam: The value of that chunking option.
+        stopLowerBound (float): As in CorpusData.loadData.
+        stopUpperBound (float): As in CorpusData.loadData.
+        stopWhitelist (list): As in CorpusData.loadData.
+        stopBlacklist (list): As in CorpusData.loadData.
+        writeCsv (bool): Also write the chunked words of a .txt source to a .csv
+            next to it, as txtToCsv does. Corpora read from the cache are not written.
+        cache (corpusCache.CorpusCache): The cache of loaded corpora, or None.
+        store (tokenStore.TokenStore): The token store to load the corpus into, or
+            None to keep it in memory. A corpus read from the cache is moved into
+            the store after it is read.
+
+    Returns:
+        (CorpusData, str, [[str], [float], [int]]): The loaded corpus, the name of
+            the source as a .csv and the punctuation data for the output files.
+
+    """
+    csvName = source[:-4] + ".csv" if source[-3:] == 'txt' else source
+    corpus = CorpusData(csvName, topics)
+    if cache is not None:
+        with instrumentation.phase('corpus cache'):
+            key = cache.key(source, chunkType, chunkParam, stopLowerBound, stopUpperBound, stopWhitelist,
+                            stopBlacklist)
+            puncData = cache.load(key, corpus)
+        if puncData is not None:
+            print("Loaded the corpus from the cache")
+            if store is not None:
+                with instrumentation.phase('token store', tokens=len(corpus.tokenIds)):
+                    store.hold(corpus)
+            return corpus, csvName, puncData
+
+    if source[-3:] == 'txt':
+        with instrumentation.phase('punctuation'):
+            puncData = grabPuncAndCap(source)
+        corpus.loadText(source, makeChunkString(chunkType, chunkParam), stopLowerBound, stopUpperBound,
+                        stopWhitelist, stopBlacklist, csvName if writeCsv else None, store)
+    else:
+        puncData = [[], [], []]
+        corpus.loadData(stopLowerBound, stopUpperBound, stopWhitelist, stopBlacklist, store)
+    if cache is not None:
+        with instrumentation.phase('corpus cache store'):
+            cache.store(key, corpus, puncData)
+    return corpus, csvName, puncData
+
+
+def writeOutputs(corpus, source, topics, iterations, alpha, beta, outputname, puncData, outputFormat,
+                 summaryWords=None):
+    """Writes the output files of a finished run: the model in the chosen format,
+        the readable .csv of topics and, if asked for, the .json topic summary.
+
+    Args:
+        corpus (CorpusData): The sampled corpus.
+        source (str): Name of the file given as input to LDA (with file extension).
+        topics (int): Number of topics generated by the run.
+        iterations (int): Number of iterations of the run.
+        alpha (float): Alpha constant used in the run.
+        beta (float): Beta constant used in the run.
+        outputname (str): Name of the output files (without file extension).
+        puncData ([[str]]): Catalogue of tokens in the file that include punctuation or capitalization
+        outputFormat (str): "json", "binary" or "both".
+        summaryWords (int): The number of words per topic in [outputname]-summary.json,
+            or None to not write the summary.
+
+    """
+    with instrumentation.phase('annotation'):
+        corpus.createAnnoTextDataStructure()
+    with instrumentation.phase('encoding', format=outputFormat):
+        if outputFormat != "binary":
+            corpus.encodeData(source, topics, iterations, alpha, beta, outputname, puncData)
+        if outputFormat != "json":
+            corpus.encodeBinary(source, topics, iterations, alpha, beta, outputname, puncData)
+    with instrumentation.phase('topic csv'):
+        corpus.outputAsCSV(outputname)
+    if summaryWords is not None:
+        with instrumentation.phase('topic summary'):
+            corpus.outputSummary(outputname, summaryWords)
+
+
+def writeOnlineOutputs(model, source, topics, iterations, alpha, beta, outputname, puncData, outputFormat,
+                       summaryWords=None):
+    """Writes the same output files as writeOutputs for a model trained by
+        runOnlineLDA, in one more pass over the csv. Each document is given topics
+        by the model and written out before the next one is read, so only the
+        model, one document and the count matrix are held in memory. The topics of
+        the .json and the arrays of the binary format go through temporary files
+        next to the output, which are removed at the end. The binary model is
+        saved without its inverted index, which is built when it is first used.
+
+    Args:
+        model (OnlineLDA): The trained model.
+        source (str): The csv the model was trained on.
+        topics (int): Number of topics generated by the run.
+        iterations (int): Number of iterations of the run.
+        alpha (float): Alpha constant used in the run.
+        beta (float): Beta constant used in the run.
+        outputname (str): Name of the output files (without file extension).
+        puncData ([[str]]): Catalogue of tokens in the file that include punctuation or capitalization
+        outputFormat (str): "json", "binary" or "both".
+        summaryWords (int): The number of words per topic in [outputname]-summary.json,
+            or None to not write the summary.
+
+    Returns:
+        (int, int): The number of (non-stopword) tokens and of documents.
+
+    """
+    vocab = model.vocab
+    # the vocabulary followed by the stopwords, which are numbered as they first appear
+    staticVocab = list(vocab)
+    staticIds = {word: i for i, word in enumerate(staticVocab)}
+    corpus = CorpusData(source, topics)
+    corpus.vocab = vocab
+    corpus.n_wt = np.zeros((len(vocab), topics), dtype=np.int32)
+    writeJson = outputFormat != "binary"
+    writeBinary = outputFormat != "json"
+    tempNames = {name: outputname + "-" + name + ".tmp" for name in ('topics', 'tokenIds', 'topicIds')}
+    # the .json is written as encodeData's json.dump writes it, with the lists of
+    # the documents' words and topics spliced in where these markers are
+    wordsMarker, topicsMarker = json.dumps('\0words'), json.dumps('\0topics')
+    dumpDict = {'dataset': source[:-4],
+                'topics': topics,
+                'iterations': iterations,
+                'alpha': alpha,
+                'beta': beta,
+                'wordsByLocationWithStopwords': '\0words',
+                'topicsByLocationWithStopwords': '\0topics',
+                'topicWordInstancesDict': [],
+                'stopwords': list(model.stopwords),
+                'puncAndCap': puncData[0],
+                'puncCapLocations': puncData[1],
+                'newlineLocations': puncData[2]}
+
+    def documentText(doc):
+        # a document's list as json.dump(..., indent=4) writes it inside another list
+        return json.dumps(doc, indent=4).replace("\n", "\n        ")
+
+    docOffsets = [0]
+    numTokens = 0
+    with instrumentation.phase('encoding', format=outputFormat), contextlib.ExitStack() as files:
+        if writeJson:
+            jsonFile = files.enter_context(open(outputname + ".json", 'w'))
+            topicsFile = files.enter_context(open(tempNames['topics'], 'w+'))
+            jsonFile.write(json.dumps(dumpDict, indent=4).split(wordsMarker)[0])
+        if writeBinary:
+            tokenIdsFile = files.enter_context(open(tempNames['tokenIds'], 'wb'))
+            topicIdsFile = files.enter_context(open(tempNames['topicIds'], 'wb'))
+        for docLabel, docWords in readDocuments(source):
+            for word in docWords:
+                if word not in staticIds:
+                    staticIds[word] = len(staticVocab)
+                    staticVocab.append(word)
+            staticTokenIds = np.array([staticIds[word] for word in docWords], dtype=np.int32)
+            keep = staticTokenIds < len(vocab)
+            staticTopics = np.full(len(staticTokenIds), -1, dtype=np.int32)
+            if keep.any():
+                staticTopics[keep] = model.documentTopics(staticTokenIds[keep])
+                np.add.at(corpus.n_wt, (staticTokenIds[keep], staticTopics[keep]), 1)
+            numTokens += int(keep.sum())
+            if writeJson:
+                separator = "[\n        " if len(docOffsets) == 1 else ",\n        "
+                jsonFile.write(separator + documentText(docWords))
+                topicsFile.write(separator + documentText(staticTopics.tolist()))
+            if writeBinary:
+                staticTokenIds.tofile(tokenIdsFile)
+                staticTopics.tofile(topicIdsFile)
+            docOffsets.append(docOffsets[-1] + len(staticTokenIds))
+        corpus.n_t = corpus.n_wt.sum(axis=0, dtype=np.int64)
+        if writeJson:
+            closing = "[]" if len(docOffsets) == 1 else "\n    ]"
+            dumpDict['topicWordInstancesDict'] = corpus.topicWordInstancesDict
+            middle, tail = json.dumps(dumpDict, indent=4).split(wordsMarker)[1].split(topicsMarker)
+            jsonFile.write(closing + middle)
+            topicsFile.write(closing)
+            topicsFile.seek(0)
+            shutil.copyfileobj(topicsFile, jsonFile)
+            jsonFile.write(tail)
+        if writeBinary:
+            arrays = {'docOffsets': np.array(docOffsets, dtype=np.int64), 'topicWordCounts': corpus.n_wt}
+            for name, outfile in (('tokenIds', tokenIdsFile), ('topicIds', topicIdsFile)):
+                outfile.flush()
+                arrays[name] = (np.memmap(tempNames[name], dtype=np.int32, mode='r') if outfile.tell()
+                                else np.zeros(0, dtype=np.int32))
+            meta = {'dataset': source[:-4],
+                    'topics': topics,
+                    'iterations': iterations,
+                    'alpha': alpha,
+                    'beta': beta,
+                    'stopwords': list(model.stopwords)}
+            modelStore.saveModel(modelStore.modelDirectory(outputname), meta, arrays, staticVocab, puncData)
+            del arrays
+    for name in tempNames.values():
+        if os.path.exists(name):
+            os.remove(name)
+    with instrumentation.phase('topic csv'):
+        corpus.outputAsCSV(outputname)
+    if summaryWords is not None:
+        with instrumentation.phase('topic summary'):
+            corpus.outputSummary(outputname, summaryWords)
+    return numTokens, len(docOffsets) - 1
+
+
 def main():
     """ Uses config.json to be run straight from the shell with no
         arguments: "python3 LDA.py [name of config file].json". Calls virtually every other
@@ -669,9 +1400,10 @@ def main():
 
     """
     if len(sys.argv) < 2:
-        print("Usage: python3 LDA.py [config file name].json")
+        print("Usage: python3 LDA.py [config file name].json [--resume]")
         exit()
     configFile = sys.argv[1]
+    resume = "--resume" in sys.argv[2:]
     configString = open(configFile, 'r').read()
     config = json.loads(configString)
     source = config["required parameters"]["source"]
@@ -682,36 +1414,151 @@ def main():
     lowerlimit = config["stopword options"]["lower limit"]
     whitelist = config["stopword options"]["whitelist"]
     blacklist = config["stopword options"]["blacklist"]
-    chunkingoptions = config["chunking options"]
-    chunkType = ""
-    chunkParam = 0
-    for option in chunkingoptions.keys():
-        if chunkingoptions[option] != "off":
-            chunkType = option
-            chunkParam = chunkingoptions[option]
-            break
+    chunkType, chunkParam = chunkOption(config["chunking options"])
     alpha = config["hyperparameters"]["alpha"]
     beta = config["hyperparameters"]["beta"]
-    chunkString = makeChunkString(chunkType, chunkParam)
-    if source[-3:] == 'txt':
-        puncData = grabPuncAndCap(source)
-        txtToCsv(source, chunkString)
-        source = source[:-4] + ".csv"
-    else:
-        puncData = [[], [], []]
-
-    corpus = CorpusData(source, topics)
-    corpus.loadData(lowerlimit, upperlimit, whitelist, blacklist)
-    runLDA(corpus, iterations, alpha, beta)
-    corpus.createAnnoTextDataStructure()
-    corpus.encodeData(source, topics, iterations, alpha, beta, outputname, puncData)
-
-    # clean up words from topics that have value 0 (i.e. are not assigned to that topic)
-    for topic in corpus.topicWordInstancesDict:
-        for key in list(topic.keys()):
-            if topic[key] == 0:
-                del topic[key]
-    corpus.outputAsCSV(outputname)
+    samplerOptions = config.get("sampler options", {})
+    seed = samplerOptions.get("seed", "off")
+    if seed == "off":
+        seed = None
+    blockSize = samplerOptions.get("block size", samplers.DEFAULT_BLOCK_SIZE)
+    sampler = samplerOptions.get("sampler", "gibbs")
+    workers = samplerOptions.get("workers", 1)
+    checkpointEvery = samplerOptions.get("checkpoint every", "off")
+    if checkpointEvery == "off":
+        checkpointEvery = 0
+    if sampler not in samplers.SWEEPS and sampler != "online":
+        print("Invalid sampler given.\n")
+        exit()
+    numChains = samplerOptions.get("chains", "off")
+    if numChains == "off":
+        numChains = 1
+    if (not isinstance(numChains, int) or isinstance(numChains, bool) or numChains < 1
+            or (numChains > 1 and (sampler == "online" or workers > 1))):
+        print("Invalid chains given.\n")
+        exit()
+    outputFormat = config.get("output options", {}).get("format", "json")
+    if outputFormat not in ("json", "binary", "both"):
+        print("Invalid output format given.\n")
+        exit()
+    writeCsv = config.get("output options", {}).get("chunked csv", "on") != "off"
+    cacheOptions = config.get("cache options", {})
+    cacheDirectory = cacheOptions.get("directory", "off")
+    cacheMegabytes = cacheOptions.get("max megabytes", corpusCache.DEFAULT_MAX_MEGABYTES)
+    if not isinstance(cacheMegabytes, (int, float)) or isinstance(cacheMegabytes, bool) or cacheMegabytes <= 0:
+        print("Invalid max megabytes given.\n")
+        exit()
+    storeOptions = config.get("token store options", {})
+    storeDirectory = storeOptions.get("directory", "off")
+    storeBlockTokens = storeOptions.get("block tokens", tokenStore.DEFAULT_BLOCK_TOKENS)
+    if not isinstance(storeBlockTokens, int) or isinstance(storeBlockTokens, bool) or storeBlockTokens < 1:
+        print("Invalid block tokens given.\n")
+        exit()
+    if storeDirectory != "off" and (sampler == "online" or workers > 1 or numChains > 1):
+        print("Invalid token store options given.\n")
+        exit()
+    updateOptions = config.get("update options", {})
+    updateModel = updateOptions.get("model", "off")
+    foldInSweeps = updateOptions.get("fold in sweeps", incremental.DEFAULT_FOLD_IN_SWEEPS)
+    updateSweeps = updateOptions.get("sweeps", incremental.DEFAULT_SWEEPS)
+    oldSample = updateOptions.get("old document sample", incremental.DEFAULT_OLD_DOCUMENT_SAMPLE)
+    for option, value in (("fold in sweeps", foldInSweeps), ("sweeps", updateSweeps)):
+        if not isinstance(value, int) or isinstance(value, bool) or value < 0:
+            print("Invalid " + option + " given.\n")
+            exit()
+    if not isinstance(oldSample, (int, float)) or isinstance(oldSample, bool) or not 0 <= oldSample <= 1:
+        print("Invalid old document sample given.\n")
+        exit()
+    if updateModel != "off" and (sampler == "online" or workers > 1 or numChains > 1 or storeDirectory != "off"):
+        print("Invalid update options given.\n")
+        exit()
+    summaryWords = summaryOption(config)
+    convergenceOptions = config.get("convergence options", {})
+    measureEvery = convergenceOptions.get("log likelihood every", "off")
+    tolerance = convergenceOptions.get("tolerance", "off")
+    heldOutSource = convergenceOptions.get("held out source", "off")
+    if measureEvery == "off" and (tolerance != "off" or heldOutSource != "off"):
+        measureEvery = 10
+    # independent chains are compared after sampling, so they are not checkpointed or monitored
+    if numChains > 1 and (checkpointEvery or resume or measureEvery != "off"):
+        print("Invalid chains given.\n")
+        exit()
+    if updateModel != "off" and (checkpointEvery or resume or measureEvery != "off"):
+        print("Invalid update options given.\n")
+        exit()
+    monitor = None
+    if measureEvery != "off":
+        heldOutDocs = None
+        if heldOutSource != "off":
+            heldOutDocs = [docWords for docLabel, docWords in readDocuments(heldOutSource)]
+        monitor = convergence.ConvergenceMonitor(measureEvery, None if tolerance == "off" else tolerance,
+                                                 heldOutDocs, outputname + "-trace.csv")
+    instrumentationOptions = config.get("instrumentation options", {})
+    metricsFile = instrumentationOptions.get("metrics file", "off")
+    profileMode = instrumentationOptions.get("profile", "off")
+    if profileMode not in ("cprofile", "tracemalloc", "off"):
+        print("Invalid profile given.\n")
+        exit()
+    try:
+        instrumentation.setProgressMode(instrumentationOptions.get("progress", "auto"))
+    except ValueError:
+        print("Invalid progress given.\n")
+        exit()
+    if not instrumentation.useProgressBar():
+        instrumentation.addHook(instrumentation.logEvent)
+    recorder = instrumentation.MetricsRecorder()
+    if metricsFile != "off":
+        instrumentation.addHook(recorder)
+
+    with instrumentation.profiling(profileMode, outputname):
+        if sampler == "online":
+            # the online sampler streams the .csv once per iteration, and once more to write the output
+            source, puncData = prepareSource(source, chunkType, chunkParam)
+            onlineOptions = config.get("online options", {})
+            model = runOnlineLDA(source, topics, iterations, alpha, beta, lowerlimit, upperlimit, whitelist,
+                                 blacklist, seed, onlineOptions.get("batch size", onlineLDA.DEFAULT_BATCH_SIZE),
+                                 onlineOptions.get("tau0", onlineLDA.DEFAULT_TAU0),
+                                 onlineOptions.get("kappa", onlineLDA.DEFAULT_KAPPA))
+            numTokens, numDocs = writeOnlineOutputs(model, source, topics, iterations, alpha, beta, outputname,
+                                                    puncData, outputFormat, summaryWords)
+        elif updateModel != "off":
+            # the source holds only the new documents, which are added to the model
+            model = modelStore.loadModel(updateModel)
+            topics, alpha, beta = model.numTopics, model.meta['alpha'], model.meta['beta']
+            newCorpus, source, puncData = loadCorpus(source, topics, chunkType, chunkParam, "off", "off", [], [],
+                                                     writeCsv)
+            corpus = incremental.updateModel(model, newCorpus, source, lowerlimit, upperlimit, whitelist, blacklist,
+                                             foldInSweeps, updateSweeps, oldSample, seed, blockSize, sampler)
+            puncData = incremental.extendPuncData(model, puncData)
+            iterations = model.meta['iterations'] + updateSweeps
+            source = model.meta['dataset'] + source[-4:]
+        else:
+            cache = None if cacheDirectory == "off" else corpusCache.CorpusCache(cacheDirectory, cacheMegabytes)
+            store = None
+            if storeDirectory != "off":
+                store = tokenStore.TokenStore(os.path.join(storeDirectory, os.path.basename(outputname)),
+                                              storeBlockTokens)
+            corpus, source, puncData = loadCorpus(source, topics, chunkType, chunkParam, lowerlimit, upperlimit,
+                                                  whitelist, blacklist, writeCsv, cache, store)
+            if numChains > 1:
+                with instrumentation.phase('chains', chains=numChains):
+                    corpus, chainReport = chains.runChains(corpus, numChains, iterations, alpha, beta, seed,
+                                                           blockSize, sampler, reportFile=outputname + "-chains.json")
+            else:
+                try:
+                    iterations = runLDA(corpus, iterations, alpha, beta, seed, blockSize, sampler, workers,
+                                        outputname + "-checkpoint.npz", checkpointEvery, resume, monitor)
+                except checkpoint.CheckpointMismatchError as error:
+                    print("Invalid checkpoint given: " + str(error) + ".\n")
+                    exit()
+        if sampler != "online":
+            writeOutputs(corpus, source, topics, iterations, alpha, beta, outputname, puncData, outputFormat,
+                         summaryWords)
+            numTokens, numDocs = len(corpus.tokenIds), corpus.numDocs
+    if metricsFile != "off":
+        recorder.write(metricsFile, {'source': source, 'topics': topics, 'iterations': iterations, 'alpha': alpha,
+                                     'beta': beta, 'sampler': sampler, 'workers': workers,
+                                     'tokens': numTokens, 'documents': numDocs})
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,193 @@
+"""
+Independent sampling chains. The same loaded corpus is sampled by several
+chains in parallel processes, each seeded from its own child of one
+numpy SeedSequence, so the whole set of chains is reproduced by a single
+seed. The topics of every chain are then aligned to those of the chain
+with the highest log-likelihood by matching topic-word distributions, and
+each topic of that best chain gets a stability score: how closely the
+other chains reproduce it, from 1 for identical distributions down to 0.
+Topics that score low are likely to be noise. The best chain is returned
+for the usual output files.
+"""
+
+import contextlib
+import json
+import os
+import time
+from multiprocessing import Pool
+import numpy as np
+import convergence
+import samplers
+
+# the loaded corpus shared with the worker processes, set by _setCorpus
+_corpus = None
+
+
+def _setCorpus(corpus):
+    """Pool initializer: keeps one copy of the loaded corpus in this worker."""
+    global _corpus
+    _corpus = corpus
+
+
+def _runChain(task):
+    """Samples one chain, silencing its progress bar, and returns its final state."""
+    import LDA
+    index, numTopics, iterations, alpha, beta, seed, blockSize, sampler = task
+    startTime = time.perf_counter()
+    corpus = _corpus.withTopics(numTopics)
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        LDA.runLDA(corpus, iterations, alpha, beta, seed, blockSize, sampler)
+    logLikelihood = convergence.JointLogLikelihood(corpus, alpha, beta).value()
+    return index, corpus.tokenTopics, corpus.n_wt, logLikelihood, time.perf_counter() - startTime
+
+
+def matchTopics(similarity):
+    """Pairs the rows of a square similarity matrix with its columns so that the
+        total similarity of the pairs is as high as possible (the Hungarian
+        algorithm, in O(n^3)).
+
+    Args:
+        similarity (numpy.ndarray): An (n x n) matrix of similarities.
+
+    Returns:
+        numpy.ndarray: The column paired with each row.
+
+    """
+    cost = -np.asarray(similarity, dtype=np.float64)
+    n = len(cost)
+    # potentials of the rows (u) and columns (v), and the row matched to each
+    # column (p). index 0 is a dummy column that holds the row being added
+    u = np.zeros(n + 1)
+    v = np.zeros(n + 1)
+    p = np.zeros(n + 1, dtype=np.int64)
+    way = np.zeros(n + 1, dtype=np.int64)
+    for row in range(1, n + 1):
+        p[0] = row
+        column = 0
+        minSlack = np.full(n + 1, np.inf)
+        used = np.zeros(n + 1, dtype=bool)
+        while p[column] != 0:
+            used[column] = True
+            current = p[column]
+            free = np.flatnonzero(~used)
+            slack = cost[current - 1, free - 1] - u[current] - v[free]
+            better = slack < minSlack[free]
+            minSlack[free[better]] = slack[better]
+            way[free[better]] = column
+            nextColumn = free[np.argmin(minSlack[free])]
+            delta = minSlack[nextColumn]
+            u[p[used]] += delta
+            v[used] -= delta
+            minSlack[~used] -= delta
+            column = nextColumn
+        # follow the augmenting path back to the dummy column
+        while column != 0:
+            previous = way[column]
+            p[column] = p[previous]
+            column = previous
+    match = np.empty(n, dtype=np.int64)
+    match[p[1:] - 1] = np.arange(n)
+    return match
+
+
+def topicSimilarity(first, second):
+    """Returns the similarity of every topic of one chain to every topic of
+        another: 1 minus the Jensen-Shannon divergence (in bits) of their
+        topic-word distributions.
+
+    Args:
+        first (numpy.ndarray): The (words x topics) n_wt matrix of one chain.
+        second (numpy.ndarray): The n_wt matrix of the other.
+
+    Returns:
+        numpy.ndarray: A (topics x topics) matrix of similarities between 0 and 1.
+
+    """
+    def distributions(counts):
+        totals = counts.sum(axis=0, dtype=np.float64)
+        return (counts / np.maximum(totals, 1)).T
+
+    p, q = distributions(first), distributions(second)
+    similarity = np.empty((len(p), len(q)))
+    for topic in range(len(p)):
+        mean = (p[topic] + q) / 2
+        # entries where a distribution is zero add nothing to its divergence from the mean
+        left = np.where(p[topic] > 0, p[topic] * np.log2(np.where(p[topic] > 0, p[topic], 1) / np.where(mean > 0, mean, 1)), 0)
+        right = np.where(q > 0, q * np.log2(np.where(q > 0, q, 1) / np.where(mean > 0, mean, 1)), 0)
+        similarity[topic] = 1 - (left.sum(axis=1) + right.sum(axis=1)) / 2
+    return similarity
+
+
+def runChains(corpus, numChains, iterations, alpha, beta, seed=None, blockSize=samplers.DEFAULT_BLOCK_SIZE,
+              sampler='gibbs', processes=None, reportFile=None):
+    """Samples a corpus with several independent chains in parallel, aligns their
+        topics and scores the stability of each topic of the best chain.
+
+    Args:
+        corpus (CorpusData): A data structure that has already called "loadData"
+            on a text. It is not changed.
+        numChains (int): The number of chains.
+        iterations (int): The number of iterations of each chain.
+        alpha (float): Smoothing constant for the P(t|d) term.
+        beta (float): Smoothing constant for the P(w|t) term.
+        seed (int): Seed from which every chain's seed is drawn. None draws a fresh
+            seed, which is written to the report so the chains can be rerun.
+        blockSize (int): As in runLDA.
+        sampler (str): As in runLDA.
+        processes (int): The number of chains sampled at once. Defaults to the
+            number of chains, or of CPUs if there are fewer.
+        reportFile (str): The .json file the report is written to, or None.
+
+    Returns:
+        (CorpusData, dict): A copy of the corpus holding the chain with the highest
+            log-likelihood, and the report: each chain's log-likelihood and
+            runtime, and each topic's stability.
+
+    """
+    seedSequence = np.random.SeedSequence(seed)
+    chainSeeds = seedSequence.spawn(numChains)
+    if processes is None:
+        processes = min(numChains, os.cpu_count() or 1)
+    tasks = [(index, corpus.numTopics, iterations, alpha, beta, chainSeed, blockSize, sampler)
+             for index, chainSeed in enumerate(chainSeeds)]
+    results = [None] * numChains
+    startTime = time.perf_counter()
+    with Pool(processes, initializer=_setCorpus, initargs=(corpus,)) as pool:
+        for index, tokenTopics, n_wt, logLikelihood, seconds in pool.imap_unordered(_runChain, tasks):
+            results[index] = (tokenTopics, n_wt, logLikelihood, seconds)
+            print("Chain " + str(index + 1) + " of " + str(numChains) + " finished in " + str(round(seconds, 1))
+                  + "s with log likelihood " + str(round(logLikelihood, 1)))
+    wallSeconds = time.perf_counter() - startTime
+
+    best = max(range(numChains), key=lambda index: results[index][2])
+    bestCounts = results[best][1]
+    matches = []
+    similarities = []
+    for index, (tokenTopics, n_wt, logLikelihood, seconds) in enumerate(results):
+        similarity = topicSimilarity(bestCounts, n_wt)
+        match = matchTopics(similarity)
+        matches.append(match)
+        similarities.append(similarity[np.arange(len(match)), match])
+    others = [similarity for index, similarity in enumerate(similarities) if index != best]
+    stability = np.mean(others, axis=0) if others else np.ones(corpus.numTopics)
+    lowest = np.min(others, axis=0) if others else np.ones(corpus.numTopics)
+
+    bestCorpus = corpus.withTopics(corpus.numTopics)
+    bestCorpus.tokenTopics = results[best][0]
+    bestCorpus.countTopics()
+    topWords = bestCorpus.topWords(10)
+    report = {'seed': seed if seed is not None else seedSequence.entropy,
+              'chains': [{'chain': index + 1, 'log likelihood': result[2], 'seconds': result[3],
+                          'topic matches': (matches[index] + 1).tolist()}
+                         for index, result in enumerate(results)],
+              'best chain': best + 1,
+              'wall seconds': wallSeconds,
+              'topics': [{'topic': topic + 1, 'stability': float(stability[topic]),
+                          'lowest similarity': float(lowest[topic]),
+                          'top words': [word for word, count in topWords[topic]]}
+                         for topic in range(corpus.numTopics)]}
+    print("Best chain: " + str(best + 1) + ", mean topic stability " + str(round(float(stability.mean()), 3)))
+    if reportFile is not None:
+        with open(reportFile, 'w') as outfile:
+            json.dump(report, outfile, indent=4)
+    return bestCorpus, report
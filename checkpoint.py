@@ -0,0 +1,121 @@
+"""
+Checkpoints for long sampling runs. A checkpoint is a .npz file holding the
+topic assignments, the count matrices, the random number generator state
+and the number of iterations completed, so that an interrupted run can be
+resumed and finish exactly as it would have without the interruption.
+"""
+
+import json
+import os
+import zlib
+import numpy as np
+
+# tokens checksummed at once by corpusFingerprint
+FINGERPRINT_BLOCK_SIZE = 1 << 20
+# topics read from a checkpoint at once by loadCheckpoint
+LOAD_BLOCK_SIZE = 1 << 20
+
+
+class CheckpointMismatchError(ValueError):
+    """Raised when a checkpoint was taken from another corpus or with other settings."""
+
+
+def corpusFingerprint(corpus):
+    """Returns a string identifying the tokens of a corpus, used to check that a
+        checkpoint belongs to the corpus it is being loaded into.
+
+    """
+    # the checksum is taken a block at a time, so tokens held in a token store stay on disk
+    checksum = 0
+    for start in range(0, len(corpus.tokenIds), FINGERPRINT_BLOCK_SIZE):
+        checksum = zlib.crc32(np.ascontiguousarray(corpus.tokenIds[start:start + FINGERPRINT_BLOCK_SIZE]).tobytes(),
+                              checksum)
+    return '%d-%d-%d-%08x' % (len(corpus.tokenIds), len(corpus.vocab), corpus.numDocs, checksum)
+
+
+def saveCheckpoint(fileName, corpus, iteration, rng, settings):
+    """Writes the state of a sampling run to fileName. The file is written next
+        to its destination first and then renamed over it, so a run killed
+        mid-write leaves the previous checkpoint intact.
+
+    Args:
+        fileName (str): The path of the checkpoint (.npz) file.
+        corpus (CorpusData): The corpus being sampled.
+        iteration (int): The number of iterations completed.
+        rng (numpy.random.Generator): The generator driving the run.
+        settings (dict): The sampler settings of the run; a resumed run must use
+            the same ones to reproduce the uninterrupted run.
+
+    """
+    tempName = fileName + '.tmp'
+    with open(tempName, 'wb') as outfile:
+        np.savez(outfile,
+                 tokenTopics=corpus.tokenTopics,
+                 n_wt=corpus.n_wt,
+                 n_dt=corpus.n_dt,
+                 n_t=corpus.n_t,
+                 iteration=iteration,
+                 rngState=json.dumps(rng.bit_generator.state),
+                 settings=json.dumps(settings, sort_keys=True),
+                 fingerprint=corpusFingerprint(corpus))
+    os.replace(tempName, fileName)
+
+
+def removeCheckpoint(fileName):
+    """Deletes the checkpoint of a finished run, so a later run resumed from
+        fileName trains from the first iteration instead of from the finished
+        run's last checkpoint.
+
+    """
+    for name in (fileName, fileName + '.tmp'):
+        if os.path.exists(name):
+            os.remove(name)
+
+
+def copyTopics(saved, tokenTopics):
+    """Copies the topic assignments of an open checkpoint into tokenTopics,
+        reading them from the file a block at a time.
+
+    Args:
+        saved (numpy.lib.npyio.NpzFile): The checkpoint, opened with numpy.load.
+        tokenTopics (numpy.ndarray): The topics of the corpus, of the same length.
+
+    """
+    with saved.zip.open('tokenTopics.npy') as member:
+        version = np.lib.format.read_magic(member)
+        if version == (1, 0):
+            shape, fortranOrder, dtype = np.lib.format.read_array_header_1_0(member)
+        else:
+            shape, fortranOrder, dtype = np.lib.format.read_array_header_2_0(member)
+        for start in range(0, shape[0], LOAD_BLOCK_SIZE):
+            count = min(LOAD_BLOCK_SIZE, shape[0] - start)
+            tokenTopics[start:start + count] = np.frombuffer(member.read(count * dtype.itemsize), dtype=dtype)
+
+
+def loadCheckpoint(fileName, corpus, rng, settings):
+    """Restores the state of a sampling run from a checkpoint written by saveCheckpoint.
+
+    Args:
+        fileName (str): The path of the checkpoint (.npz) file.
+        corpus (CorpusData): The corpus to restore the assignments and counts into.
+            It must hold the same tokens as the corpus the checkpoint was taken from.
+        rng (numpy.random.Generator): The generator whose state is restored.
+        settings (dict): The sampler settings of the resumed run.
+
+    Returns:
+        int: The number of iterations the checkpointed run had completed.
+
+    """
+    with np.load(fileName) as saved:
+        if str(saved['fingerprint']) != corpusFingerprint(corpus):
+            raise CheckpointMismatchError(fileName + " was not taken from this corpus")
+        if json.loads(str(saved['settings'])) != json.loads(json.dumps(settings)):
+            raise CheckpointMismatchError(fileName + " was taken with different sampler settings: "
+                                          + str(saved['settings']))
+        # copied into place a block at a time, so topics held in a token store stay on disk
+        copyTopics(saved, corpus.tokenTopics)
+        corpus.n_wt = saved['n_wt']
+        corpus.n_dt = saved['n_dt']
+        corpus.n_t = saved['n_t']
+        rng.bit_generator.state = json.loads(str(saved['rngState']))
+        return int(saved['iteration'])
@@ -0,0 +1,154 @@
+"""
+Streaming conversion of a .txt corpus into (word, document) rows. The text is
+read in blocks and split into documents in a single pass (two for the
+"number of documents" option, which needs the word count first), so the
+time taken grows linearly with the size of the text and only a block and a
+document or two are held in memory. The rows are the ones txtToCsv writes;
+they can be written to a .csv or passed straight to CorpusData.loadRows.
+"""
+
+import csv
+
+# characters stripped from both ends of every word
+STRIP_CHARACTERS = '.,!?"“”‘’():;\n\t\''
+# number of characters read from the text at a time
+DEFAULT_READ_SIZE = 1 << 20
+
+
+def readBlocks(fileName, readSize=DEFAULT_READ_SIZE):
+    """Yields the lowercased text of a file in blocks of readSize characters."""
+    with open(fileName, 'r') as infile:
+        block = infile.read(readSize)
+        while block:
+            yield block.lower()
+            block = infile.read(readSize)
+
+
+def wordBlocks(fileName, readSize=DEFAULT_READ_SIZE):
+    """Yields the whitespace-separated words of a file, lowercased, as one list
+        per block read. A word cut in two by the end of a block is held back and
+        joined to the start of the next one.
+
+    """
+    carry = ''
+    for block in readBlocks(fileName, readSize):
+        block = carry + block
+        words = block.split()
+        carry = words.pop() if words and not block[-1].isspace() else ''
+        yield words
+    if carry:
+        yield [carry]
+
+
+def documentsOfLength(fileName, docLen, numCap, readSize=DEFAULT_READ_SIZE):
+    """Splits a text into documents of docLen words, as getDocsOfLength does: the
+        final, shorter document is joined onto the one before it if numCap is
+        True, or if it has fewer than docLen // 2 words.
+
+    Yields:
+        [str]: The words of each document.
+
+    """
+    pending = []
+    previous = None
+    for words in wordBlocks(fileName, readSize):
+        pending.extend(words)
+        fullDocs = len(pending) // docLen
+        for i in range(fullDocs):
+            if previous is not None:
+                yield previous
+            previous = pending[i * docLen:(i + 1) * docLen]
+        del pending[:fullDocs * docLen]
+    if pending and previous is not None and (numCap or len(pending) < docLen // 2):
+        previous.extend(pending)
+        pending = []
+    if previous is not None:
+        yield previous
+    if pending:
+        yield pending
+
+
+def textRows(text, docNumber):
+    """Yields the (word, document) rows of a piece of a document's text. Words are
+        separated by spaces and newlines, punctuation is stripped from their ends
+        and words left empty are dropped.
+
+    """
+    docLabel = str(docNumber)
+    for word in text.replace("\n", " ").split(' '):
+        word = word.strip(STRIP_CHARACTERS)
+        if word != '':
+            yield word, docLabel
+
+
+def splitStringDocuments(fileName, splitString, readSize=DEFAULT_READ_SIZE):
+    """Splits a text into documents wherever splitString appears, as txtToCsv does.
+        Every document after the first starts with splitString.
+
+    Yields:
+        (int, str): The number of a document, counting from 1, and a piece of its
+            text. Pieces end between words, and every document yields at least one.
+
+    """
+    separator = splitString.lower()
+    keep = len(separator) - 1
+    docNumber = 1
+    buffer = ''
+    carry = ''
+    for block in readBlocks(fileName, readSize):
+        parts = (buffer + block).split(separator)
+        for part in parts[:-1]:
+            yield docNumber, carry + part
+            docNumber += 1
+            carry = splitString
+        # a separator may begin in the last keep characters, so they wait for the next block
+        last = parts[-1]
+        cut = max(len(last) - keep, 0)
+        buffer = last[cut:]
+        # the last word may continue in the next block
+        text = carry + last[:cut]
+        wordEnd = max(text.rfind(' '), text.rfind("\n")) + 1
+        yield docNumber, text[:wordEnd]
+        carry = text[wordEnd:]
+    yield docNumber, carry + buffer
+
+
+def chunkText(fileName, splitString, readSize=DEFAULT_READ_SIZE):
+    """Streams the (word, document) rows of a .txt corpus, chunked into documents
+        the same way txtToCsv chunks it.
+
+    Args:
+        fileName (str): The name of the .txt file.
+        splitString (str): The string generated by makeChunkString that gives
+            instructions on how to split up the txt file into documents.
+        readSize (int): The number of characters read at a time.
+
+    Yields:
+        (str, str): A word and the number of its document, as a string.
+
+    """
+    numDocs = 0
+    if splitString[:3] == 'num' or splitString[:6] == 'length':
+        if splitString[:3] == 'num':
+            numWords = sum(len(words) for words in wordBlocks(fileName, readSize))
+            docLength = numWords // int(splitString[3:])
+        else:
+            docLength = int(splitString[6:])
+        print("Length of each document: " + str(docLength))
+        docs = documentsOfLength(fileName, docLength, splitString[:3] == 'num', readSize)
+        for numDocs, docWords in enumerate(docs, 1):
+            # the words hold no whitespace, so the document's text is just the words
+            yield from textRows(" ".join(docWords), numDocs)
+    else:
+        for numDocs, text in splitStringDocuments(fileName, splitString, readSize):
+            yield from textRows(text, numDocs)
+    print("Number of documents: " + str(numDocs))
+
+
+def writeRows(rows, csvFile):
+    """Writes rows to a .csv file as they pass through, and yields them on."""
+    with open(csvFile, 'w', newline='') as csvfile:
+        filewriter = csv.writer(csvfile, delimiter=',')
+        for row in rows:
+            filewriter.writerow(row)
+            yield row
@@ -0,0 +1,207 @@
+"""
+Convergence tracking for runLDA. The collapsed joint log-likelihood
+log p(w, z) of the corpus is kept up to date as the sampler moves tokens
+between topics and recorded every few iterations, optionally along with the
+perplexity of a held-out set of documents, and the run can be stopped early
+once the log-likelihood stops changing. Each measurement is appended to a trace .csv file.
+"""
+
+import csv
+import math
+import os
+import time
+import numpy as np
+import inference
+
+
+def lgammaTable(offset, size):
+    """Returns lgamma(offset + n) for n = 0 ... size, built from
+        lgamma(x + 1) = lgamma(x) + log(x) so only one lgamma is evaluated.
+
+    """
+    table = np.empty(size + 1)
+    table[0] = math.lgamma(offset)
+    np.cumsum(np.log(offset + np.arange(size)), out=table[1:])
+    table[1:] += table[0]
+    return table
+
+
+def changedCells(rows, fromTopics, toTopics, numTopics):
+    """Finds the cells of a (rows x topics) count matrix changed by moving tokens
+        from one topic to another, and the net change in each.
+
+    Args:
+        rows (numpy.ndarray): The row (word or document) of each moved token.
+        fromTopics (numpy.ndarray): The topic each token was moved from.
+        toTopics (numpy.ndarray): The topic each token was moved to.
+        numTopics (int): The number of columns of the matrix.
+
+    Returns:
+        (numpy.ndarray, numpy.ndarray, numpy.ndarray): The row, topic and net change
+            of every changed cell, each cell once.
+
+    """
+    rows = rows.astype(np.int64) * numTopics
+    keys = np.concatenate((rows + fromTopics, rows + toTopics))
+    cells, inverse = np.unique(keys, return_inverse=True)
+    changes = np.bincount(inverse, minlength=len(cells)) - 2 * np.bincount(inverse[:len(rows)], minlength=len(cells))
+    return cells // numTopics, cells % numTopics, changes
+
+
+class JointLogLikelihood:
+    """The collapsed joint log-likelihood of a corpus being sampled,
+
+        log p(w, z) = sum_t [sum_w lgamma(n_wt + beta) - lgamma(n_t + V beta)]
+                      + sum_d [sum_t lgamma(n_dt + alpha) - lgamma(n_d + K alpha)] + constants.
+
+        The sums over n_wt and n_dt are computed in full once, and then kept up
+        to date by moved, which samplers.moveTokens calls with every change to
+        the counts once the tracker is attached to the corpus: only the changed
+        cells are looked up again. Their lgamma terms come from tables that run
+        up to the largest count a cell can hold, the most frequent word's count
+        for n_wt and the longest document's length for n_dt. The K terms of n_t
+        are computed afresh for every measurement.
+
+    """
+
+    def __init__(self, corpus, alpha, beta):
+        """Builds the lgamma tables for a corpus and sums its current counts.
+
+        Args:
+            corpus (CorpusData): A data structure that has already called "loadData"
+                on a text.
+            alpha (float): Smoothing constant for the P(t|d) term.
+            beta (float): Smoothing constant for the P(w|t) term.
+
+        """
+        self.corpus = corpus
+        numTopics = corpus.numTopics
+        vocabSize = len(corpus.vocab)
+        self.topicOffset = vocabSize * beta
+        docLengths = np.diff(corpus.docOffsets)
+        maxDocLength = int(docLengths.max(initial=0))
+        self.wordTable = lgammaTable(beta, int(corpus.n_wt.sum(axis=1).max(initial=0)))
+        self.docTable = lgammaTable(alpha, maxDocLength)
+        self.constant = (numTopics * (math.lgamma(vocabSize * beta) - vocabSize * math.lgamma(beta))
+                         + corpus.numDocs * (math.lgamma(numTopics * alpha) - numTopics * math.lgamma(alpha))
+                         - lgammaTable(numTopics * alpha, maxDocLength)[docLengths].sum())
+        self.wordSum = float(self.wordTable[corpus.n_wt].sum())
+        self.docSum = float(self.docTable[corpus.n_dt].sum())
+
+    def attach(self):
+        """Has samplers.moveTokens report every change to the corpus' counts to moved."""
+        self.corpus.moveListener = self.moved
+
+    def detach(self):
+        """Stops tracking changes to the counts; value is then only right until they change."""
+        self.corpus.moveListener = None
+
+    def moved(self, counts, words, docs, fromTopics, toTopics):
+        """Updates the sums after tokens have been moved and the counts updated.
+
+        Args:
+            counts: The CorpusData, or the stand-in for part of it, whose n_wt and
+                n_dt hold the updated counts.
+            words (numpy.ndarray): The word id of each moved token.
+            docs (numpy.ndarray): The document of each moved token, as a row of counts.n_dt.
+            fromTopics (numpy.ndarray): The topic each token was moved from.
+            toTopics (numpy.ndarray): The topic each token was moved to.
+
+        """
+        numTopics = counts.n_wt.shape[1]
+        rows, topics, changes = changedCells(words, fromTopics, toTopics, numTopics)
+        after = counts.n_wt[rows, topics]
+        self.wordSum += float((self.wordTable[after] - self.wordTable[after - changes]).sum())
+        rows, topics, changes = changedCells(docs, fromTopics, toTopics, numTopics)
+        after = counts.n_dt[rows, topics]
+        self.docSum += float((self.docTable[after] - self.docTable[after - changes]).sum())
+
+    def value(self):
+        """Returns the log-likelihood of the corpus' current topic assignments."""
+        topicSum = sum(math.lgamma(count + self.topicOffset) for count in self.corpus.n_t.tolist())
+        return self.constant + self.wordSum + self.docSum - topicSum
+
+
+class ConvergenceMonitor:
+    """Measures a run every few iterations, writes the measurements to a trace
+        file and decides when the run has converged.
+
+    """
+
+    def __init__(self, every, tolerance=None, heldOutDocs=None, traceFile=None):
+        """Sets up the monitor. It is attached to a corpus by start.
+
+        Args:
+            every (int): Measure after every every iterations.
+            tolerance (float): Stop the run once the relative change in the
+                log-likelihood between two measurements is below this. None never stops.
+            heldOutDocs ([[str]]): Documents to report the perplexity of, or None.
+            traceFile (str): The .csv file the measurements are written to, or None.
+
+        """
+        self.every = every
+        self.tolerance = tolerance
+        self.heldOutDocs = heldOutDocs
+        self.traceFile = traceFile
+        self.trace = []
+
+    def start(self, corpus, alpha, beta, startIteration=0):
+        """Attaches the monitor to the corpus of a run that is about to start.
+
+        Args:
+            corpus (CorpusData): The corpus of the run.
+            alpha (float): Smoothing constant for the P(t|d) term.
+            beta (float): Smoothing constant for the P(w|t) term.
+            startIteration (int): The iteration the run starts after, above 0 if it
+                resumed from a checkpoint. The measurements up to it are read back
+                from the trace file, so the trace continues and the tolerance is
+                checked against the last of them.
+
+        """
+        self.corpus = corpus
+        self.alpha = alpha
+        self.beta = beta
+        self.logLikelihood = JointLogLikelihood(corpus, alpha, beta)
+        self.logLikelihood.attach()
+        self.trace = []
+        if startIteration > 0 and self.traceFile is not None and os.path.exists(self.traceFile):
+            with open(self.traceFile, newline='') as csvfile:
+                rows = list(csv.reader(csvfile))[1:]
+            # measurements taken after the checkpoint are taken again by the resumed run
+            self.trace = [[int(row[0]), float(row[1]), float(row[2]) if row[2] else '', float(row[3])]
+                          for row in rows if int(row[0]) <= startIteration]
+        # the seconds of a resumed run go on from those of the last measurement
+        self.startTime = time.perf_counter() - (self.trace[-1][3] if self.trace else 0)
+        if self.traceFile is not None:
+            with open(self.traceFile, 'w', newline='') as csvfile:
+                writer = csv.writer(csvfile)
+                writer.writerow(['Iteration', 'Log Likelihood', 'Perplexity', 'Seconds'])
+                writer.writerows(self.trace)
+
+    def finish(self):
+        """Detaches the monitor from the corpus of a run that has finished."""
+        self.logLikelihood.detach()
+
+    def measure(self, iteration):
+        """Records a measurement if one is due after iteration.
+
+        Returns:
+            bool: True if the run has converged and should stop.
+
+        """
+        if iteration % self.every != 0:
+            return False
+        logLikelihood = self.logLikelihood.value()
+        perplexity = ''
+        if self.heldOutDocs:
+            inferencer = inference.TopicInferencer.fromCorpus(self.corpus, self.alpha, self.beta)
+            perplexity = inferencer.perplexity(self.heldOutDocs, seed=iteration)
+        row = [iteration, logLikelihood, perplexity, time.perf_counter() - self.startTime]
+        self.trace.append(row)
+        if self.traceFile is not None:
+            with open(self.traceFile, 'a', newline='') as csvfile:
+                csv.writer(csvfile).writerow(row)
+        if self.tolerance is None or len(self.trace) < 2:
+            return False
+        previous = self.trace[-2][1]
+        return abs(logLikelihood - previous) < self.tolerance * abs(previous)
@@ -0,0 +1,178 @@
+"""
+A content-addressed on-disk cache of loaded corpora. A corpus is stored
+under a hash of the contents of its source file, its chunking options and
+its stopword options, so a run that changes only the hyperparameters, the
+number of topics or the sampler loads the corpus from the cache instead of
+cataloguing punctuation, chunking and filtering stopwords again. Each entry
+is one uncompressed .npz file holding the encoded text (stopwords included,
+from which the stopword mask follows), the inverted index and the
+punctuation data. Editing the source changes its hash, so stale entries
+are never used, and the least recently used entries are deleted once the
+cache grows past its size limit.
+"""
+
+import hashlib
+import json
+import os
+import zipfile
+import numpy as np
+import postings
+
+# changed whenever the layout of an entry changes, so older entries are not read
+CACHE_VERSION = 1
+DEFAULT_MAX_MEGABYTES = 1024
+# bytes of a source file hashed at a time
+HASH_BLOCK_SIZE = 1 << 20
+# remembers the hash of each source file along with its size and modification time
+SOURCES_FILE = "sources.json"
+
+
+def wordArray(words):
+    """Packs a list of words, which hold no newlines, into a uint8 array."""
+    return np.frombuffer("\n".join(words).encode('utf-8'), dtype=np.uint8)
+
+
+def arrayWords(array):
+    """Unpacks a list of words packed by wordArray."""
+    text = array.tobytes().decode('utf-8')
+    return text.split("\n") if text else []
+
+
+class CorpusCache:
+    """A directory of cached corpora, bounded in size."""
+
+    def __init__(self, directory, maxMegabytes=DEFAULT_MAX_MEGABYTES):
+        """Opens a cache directory, creating it if needed.
+
+        Args:
+            directory (str): The directory the entries are kept in.
+            maxMegabytes (float): The most space the entries may take up together.
+
+        """
+        self.directory = directory
+        self.maxBytes = int(maxMegabytes * 2 ** 20)
+        os.makedirs(directory, exist_ok=True)
+
+    def sourceHash(self, source):
+        """Returns the SHA-256 hash of the contents of a source file. The hash is
+            remembered with the file's size and modification time, and only
+            recomputed once either changes.
+
+        """
+        stat = os.stat(source)
+        sourcesFile = os.path.join(self.directory, SOURCES_FILE)
+        try:
+            with open(sourcesFile, 'r') as infile:
+                sources = json.load(infile)
+        except (OSError, ValueError):
+            sources = {}
+        path = os.path.abspath(source)
+        known = sources.get(path)
+        if known is not None and known[:2] == [stat.st_size, stat.st_mtime_ns]:
+            return known[2]
+        digest = hashlib.sha256()
+        with open(source, 'rb') as infile:
+            for block in iter(lambda: infile.read(HASH_BLOCK_SIZE), b''):
+                digest.update(block)
+        sources[path] = [stat.st_size, stat.st_mtime_ns, digest.hexdigest()]
+        self._replace(sourcesFile, lambda outfile: outfile.write(json.dumps(sources).encode('utf-8')))
+        return digest.hexdigest()
+
+    def key(self, source, chunkType, chunkParam, stopLowerBound, stopUpperBound, stopWhitelist, stopBlacklist):
+        """Returns the key of a corpus: a hash of its source's contents and of the
+            options it is loaded with. Chunking options only count for .txt sources.
+
+        """
+        settings = {'version': CACHE_VERSION,
+                    'source': self.sourceHash(source),
+                    'stopwords': [stopLowerBound, stopUpperBound, sorted(stopWhitelist), sorted(stopBlacklist)]}
+        if source[-3:] == 'txt':
+            settings['chunking'] = [chunkType, chunkParam]
+        return hashlib.sha256(json.dumps(settings, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def entryFile(self, key):
+        """Returns the file an entry is stored in."""
+        return os.path.join(self.directory, key + ".npz")
+
+    def load(self, key, corpus):
+        """Fills a new CorpusData from the cache, if the entry exists.
+
+        Args:
+            key (str): The key of the corpus, from key.
+            corpus (CorpusData): A corpus that has not loaded any data.
+
+        Returns:
+            [[str], [float], [int]]: The punctuation data of the corpus, or None if it
+                is not in the cache. The corpus is only filled if it is.
+
+        """
+        entryFile = self.entryFile(key)
+        try:
+            with np.load(entryFile) as entry:
+                arrays = {name: entry[name] for name in entry.files}
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, zipfile.BadZipFile):
+            # a damaged entry is treated as missing and stored again
+            os.remove(entryFile)
+            return None
+        # mark the entry as recently used
+        os.utime(entryFile)
+
+        index = postings.Postings(arrays['postingsOffsets'], arrays['postingsDocs'], arrays['postingsPositions'],
+                                  len(arrays['staticDocOffsets']) - 1)
+        corpus.setTokens(arrayWords(arrays['staticVocab']), int(arrays['numWords']), arrays['staticTokenIds'],
+                         arrays['staticDocOffsets'], index)
+        corpus.stopwords = set(arrayWords(arrays['stopwords']))
+        corpus.docTotalWordCounts = arrays['docTotalWordCounts'].tolist()
+        corpus.initializeTopics()
+        return [arrayWords(arrays['puncAndCap']), arrays['puncCapLocations'].tolist(),
+                arrays['newlineLocations'].tolist()]
+
+    def store(self, key, corpus, puncData):
+        """Stores a loaded corpus and its punctuation data, then deletes the least
+            recently used entries until the cache fits in its size limit. The
+            entry just stored is kept even if it alone is larger than the limit.
+
+        """
+        arrays = {'staticVocab': wordArray(corpus.staticVocab),
+                  'numWords': np.array(len(corpus.vocab)),
+                  'staticTokenIds': corpus.staticTokenIds,
+                  'staticDocOffsets': corpus.staticDocOffsets,
+                  'postingsOffsets': corpus.postings.offsets,
+                  'postingsDocs': corpus.postings.docs,
+                  'postingsPositions': corpus.postings.positions,
+                  'stopwords': wordArray(sorted(corpus.stopwords)),
+                  'docTotalWordCounts': np.array(corpus.docTotalWordCounts, dtype=np.int64),
+                  'puncAndCap': wordArray(puncData[0]),
+                  'puncCapLocations': np.asarray(puncData[1], dtype=np.float64),
+                  'newlineLocations': np.asarray(puncData[2], dtype=np.int64)}
+        entryFile = self.entryFile(key)
+        self._replace(entryFile, lambda outfile: np.savez(outfile, **arrays))
+        self.evict(keep=entryFile)
+
+    def evict(self, keep=None):
+        """Deletes entries, least recently used first, until the cache fits in its
+            size limit. The entry file keep is never deleted.
+
+        """
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".npz"):
+                stat = os.stat(os.path.join(self.directory, name))
+                entries.append((stat.st_mtime_ns, stat.st_size, os.path.join(self.directory, name)))
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        for _, size, entryFile in entries:
+            if total <= self.maxBytes:
+                break
+            if entryFile != keep:
+                os.remove(entryFile)
+                total -= size
+
+    def _replace(self, fileName, write):
+        """Writes a file through a temporary file, so a reader never sees it half written."""
+        temporary = fileName + "." + str(os.getpid()) + ".tmp"
+        with open(temporary, 'wb') as outfile:
+            write(outfile)
+        os.replace(temporary, fileName)
@@ -0,0 +1,203 @@
+"""
+Incremental updates of a trained model. New documents are added to a model
+saved by encodeData or encodeBinary without sampling the whole corpus
+again: the model's text and topic assignments are read back into a
+CorpusData, the vocabulary and count matrices are extended with the new
+documents, the new words are given topics by folding them in against the
+model's topics, and a few sweeps are run over the new documents together
+with a random sample of the old ones, so the old topics can shift to make
+room for what the new documents hold. Words already in the model keep
+their stopword status; the stopword options decide only about new words.
+"""
+
+import numpy as np
+import instrumentation
+import samplers
+import postings
+
+# number of new tokens whose fold-in topics are drawn in one array operation
+FOLD_IN_BLOCK_SIZE = 1 << 16
+DEFAULT_FOLD_IN_SWEEPS = 5
+DEFAULT_SWEEPS = 20
+# the share of the old documents sampled in each update sweep
+DEFAULT_OLD_DOCUMENT_SAMPLE = 0.1
+
+
+class DocumentSample:
+    """Any set of documents of a corpus, gathered into memory to be sampled. Like
+        tokenStore.DocumentBlock, it has the attributes the sweeps of samplers.py
+        use and shares n_wt and n_t with the corpus; its tokens' topics and its
+        rows of n_dt are copied back into the corpus by writeBack.
+
+    """
+
+    def __init__(self, corpus, docs):
+        """Gathers the tokens of some documents.
+
+        Args:
+            corpus (CorpusData): The corpus the documents belong to.
+            docs (numpy.ndarray): The documents, without repeats.
+
+        """
+        self.docs = docs
+        self.numTopics = corpus.numTopics
+        starts = corpus.docOffsets[docs]
+        lengths = corpus.docOffsets[docs + 1] - starts
+        self.docOffsets = np.zeros(len(docs) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=self.docOffsets[1:])
+        # the location in the corpus of each gathered token
+        self.locations = np.arange(self.docOffsets[-1]) + np.repeat(starts - self.docOffsets[:-1], lengths)
+        self.tokenIds = corpus.tokenIds[self.locations]
+        self.tokenTopics = corpus.tokenTopics[self.locations]
+        self.n_wt = corpus.n_wt
+        self.n_dt = corpus.n_dt[docs]
+        self.n_t = corpus.n_t
+        self.moveListener = None
+
+    def writeBack(self, corpus):
+        """Copies the sampled topics and document counts back into the corpus."""
+        corpus.tokenTopics[self.locations] = self.tokenTopics
+        corpus.n_dt[self.docs] = self.n_dt
+
+
+def extendCorpus(model, newCorpus, fileName, stopLowerBound, stopUpperBound, stopWhitelist, stopBlacklist):
+    """Builds a corpus of a model's text followed by new documents, with the
+        model's topic assignments. The new words are left unassigned.
+
+    Args:
+        model (modelStore.Model): The model to extend.
+        newCorpus (CorpusData): The new documents, loaded with no stopwords.
+        fileName (str): The file name of the extended corpus.
+        stopLowerBound (float): As in CorpusData.loadData, applied to new words only.
+        stopUpperBound (float): As in CorpusData.loadData, applied to new words only.
+        stopWhitelist (list): As in CorpusData.loadData, applied to new words only.
+        stopBlacklist (list): As in CorpusData.loadData, applied to new words only.
+
+    Returns:
+        (CorpusData, numpy.ndarray): The extended corpus and the topics of its old
+            tokens, which come before the new ones in tokenIds.
+
+    """
+    import LDA
+    oldVocab = model.vocab
+    numOldWords = len(model.topicWordCounts)
+    # copies, so the updated model can be written over the files of the old one
+    oldTokenIds = np.array(model.array('tokenIds'), dtype=np.int64)
+    oldTopicIds = np.array(model.array('topicIds'))
+    oldDocOffsets = np.array(model.array('docOffsets'), dtype=np.int64)
+    numDocs = len(oldDocOffsets) - 1 + newCorpus.numDocs
+
+    # words the model has not seen are kept or made stopwords by their document
+    # frequency in the new documents, which is their frequency in the whole corpus
+    oldWordIds = {word: i for i, word in enumerate(oldVocab)}
+    unseen = [i for i, word in enumerate(newCorpus.staticVocab) if word not in oldWordIds]
+    unseenWords = [newCorpus.staticVocab[i] for i in unseen]
+    newStopwords, keepWord = LDA.findStopwords(unseenWords, newCorpus.postings.documentFrequency()[unseen], numDocs,
+                                               stopLowerBound, stopUpperBound, stopWhitelist, stopBlacklist)
+    keptWords = [word for word, keep in zip(unseenWords, keepWord) if keep]
+    stopWords = [word for word, keep in zip(unseenWords, keepWord) if not keep]
+
+    # the model's words, then the new words, then the model's stopwords, then the new stopwords
+    staticVocab = oldVocab[:numOldWords] + keptWords + oldVocab[numOldWords:] + stopWords
+    combinedIds = {word: i for i, word in enumerate(staticVocab)}
+    newIds = np.array([combinedIds[word] for word in newCorpus.staticVocab], dtype=np.int64)
+    oldIds = np.where(oldTokenIds < numOldWords, oldTokenIds, oldTokenIds + len(keptWords))
+    staticTokenIds = np.concatenate((oldIds, newIds[newCorpus.staticTokenIds])).astype(np.int32)
+    staticDocOffsets = np.concatenate((oldDocOffsets, newCorpus.staticDocOffsets[1:] + oldDocOffsets[-1]))
+
+    corpus = LDA.CorpusData(fileName, model.numTopics)
+    with instrumentation.phase('postings', tokens=len(staticTokenIds)):
+        index = postings.Postings.build(staticTokenIds, staticDocOffsets, len(staticVocab))
+    corpus.setTokens(staticVocab, numOldWords + len(keptWords), staticTokenIds, staticDocOffsets, index)
+    # blacklisted words the model has seen keep their status, like every other old word
+    corpus.stopwords = set(model.meta.get('stopwords', [])) | (newStopwords - oldWordIds.keys())
+    corpus.docTotalWordCounts = np.diff(oldDocOffsets).tolist() + newCorpus.docTotalWordCounts
+    return corpus, oldTopicIds[oldTopicIds >= 0].astype(np.int32)
+
+
+def extendPuncData(model, puncData):
+    """Appends the punctuation data of new documents to that of a model, moving
+        the new locations past the end of the model's text.
+
+    """
+    shift = len(model.array('tokenIds'))
+    return [model.wordList('puncAndCap') + puncData[0],
+            model.array('puncCapLocations').tolist() + [location + shift for location in puncData[1]],
+            model.array('newlineLocations').tolist() + [location + shift for location in puncData[2]]]
+
+
+def foldIn(corpus, oldTopics, beta, rng):
+    """Gives the new tokens of an extended corpus their first topics, each drawn
+        from the model's P(t|w), then builds the count matrices.
+
+    Args:
+        corpus (CorpusData): A corpus built by extendCorpus.
+        oldTopics (numpy.ndarray): The topics of its old tokens.
+        beta (float): Smoothing constant for the P(w|t) term.
+        rng (numpy.random.Generator): Source of randomness.
+
+    """
+    numOld = len(oldTopics)
+    oldWords = corpus.tokenIds[:numOld]
+    n_wt = np.zeros((len(corpus.vocab), corpus.numTopics), dtype=np.int64)
+    np.add.at(n_wt, (oldWords, oldTopics), 1)
+    n_t = n_wt.sum(axis=0)
+    newWords = corpus.tokenIds[numOld:]
+    newTopics = np.empty(len(newWords), dtype=np.int32)
+    for start in range(0, len(newWords), FOLD_IN_BLOCK_SIZE):
+        words = newWords[start:start + FOLD_IN_BLOCK_SIZE]
+        newTopics[start:start + FOLD_IN_BLOCK_SIZE] = samplers.drawTopics((n_wt[words] + beta) / (n_t + beta),
+                                                                          rng.random(len(words)))
+    corpus.tokenTopics = np.concatenate((oldTopics, newTopics))
+    corpus.countTopics()
+
+
+def updateModel(model, newCorpus, fileName, stopLowerBound, stopUpperBound, stopWhitelist, stopBlacklist,
+                foldInSweeps=DEFAULT_FOLD_IN_SWEEPS, sweeps=DEFAULT_SWEEPS, oldSample=DEFAULT_OLD_DOCUMENT_SAMPLE,
+                seed=None, blockSize=samplers.DEFAULT_BLOCK_SIZE, sampler='gibbs'):
+    """Adds new documents to a model and samples them into its topics.
+
+    Args:
+        model (modelStore.Model): The model, with the alpha and beta it was trained with.
+        newCorpus (CorpusData): The new documents, loaded with no stopwords.
+        fileName (str): The file name of the updated corpus.
+        stopLowerBound (float): As in extendCorpus.
+        stopUpperBound (float): As in extendCorpus.
+        stopWhitelist (list): As in extendCorpus.
+        stopBlacklist (list): As in extendCorpus.
+        foldInSweeps (int): The number of sweeps over the new documents alone, with
+            the old documents held fixed.
+        sweeps (int): The number of sweeps over the new documents and a sample of
+            the old ones.
+        oldSample (float): The share of the old documents in each of those sweeps,
+            drawn afresh for every sweep.
+        seed (int): Seed for the random number generator. None draws a fresh seed.
+        blockSize (int): As in runLDA.
+        sampler (str): As in runLDA.
+
+    Returns:
+        CorpusData: The updated corpus, ready for writeOutputs.
+
+    """
+    import LDA
+    alpha, beta = model.meta['alpha'], model.meta['beta']
+    rng = np.random.default_rng(seed)
+    corpus, oldTopics = extendCorpus(model, newCorpus, fileName, stopLowerBound, stopUpperBound, stopWhitelist,
+                                     stopBlacklist)
+    with instrumentation.phase('fold in', tokens=len(corpus.tokenIds) - len(oldTopics)):
+        foldIn(corpus, oldTopics, beta, rng)
+    numOldDocs = model.numDocs
+    newDocs = np.arange(numOldDocs, corpus.numDocs)
+    sweep = samplers.SWEEPS[sampler]
+
+    def sampleDocuments(oldShare):
+        docs = np.concatenate((np.flatnonzero(rng.random(numOldDocs) < oldShare), newDocs))
+        sample = DocumentSample(corpus, docs)
+        sweep(sample, alpha, beta, rng, blockSize)
+        sample.writeBack(corpus)
+
+    print("Folding in " + str(len(newDocs)) + " new documents")
+    LDA.sampleIterations(lambda: sampleDocuments(0), foldInSweeps)
+    print("Updating with " + str(round(oldSample * 100)) + "% of the " + str(numOldDocs) + " old documents")
+    LDA.sampleIterations(lambda: sampleDocuments(oldSample), sweeps)
+    return corpus
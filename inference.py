@@ -0,0 +1,221 @@
+"""
+Usage:      python3 inference.py [model].json|[model].model [documents].csv [iterations]
+
+Topic inference for new documents against a trained model. The model's
+topic-word counts are held fixed and only the topics of the new tokens are
+sampled ("folding in"), so a document can be scored without retraining.
+Words the model never gave a topic to (unknown words and stopwords) are
+left out of the new documents.
+
+Running this file scores each document in a .csv file laid out like the
+output of txtToCsv and prints the topic distributions as JSON.
+"""
+
+import json
+import sys
+from multiprocessing import Pool
+import numpy as np
+import modelStore
+import samplers
+
+DEFAULT_FOLD_IN_ITERATIONS = 20
+
+# the inferencer shared with the worker processes, set by _setInferencer
+_inferencer = None
+
+
+def _setInferencer(inferencer):
+    """Pool initializer: keeps one copy of the inferencer in this worker."""
+    global _inferencer
+    _inferencer = inferencer
+
+
+def _inferChunk(task):
+    """Folds in one chunk of documents in a worker process."""
+    docs, iterations, seed, blockSize = task
+    return _inferencer.infer(docs, iterations, seed, blockSize=blockSize)
+
+
+class TopicInferencer:
+    """Folds new documents into a trained model.
+
+    Attributes:
+        topicWordProbs (numpy.ndarray): The fixed (words x topics) P(w|t) term of
+            the model, (n_wt + beta) / (n_t + beta).
+        wordIds (dict): The row of topicWordProbs for each word of the model.
+
+    """
+
+    def __init__(self, model, alpha=None, beta=None):
+        """Precomputes the fixed part of the conditional from a model.
+
+        Args:
+            model (modelStore.Model): The trained model.
+            alpha (float): Smoothing constant for the P(t|d) term. Defaults to the
+                alpha the model was trained with.
+            beta (float): Smoothing constant for the P(w|t) term. Defaults to the
+                beta the model was trained with.
+
+        """
+        self._setCounts(model.topicWordCounts, model.vocab,
+                        model.meta['alpha'] if alpha is None else alpha,
+                        model.meta['beta'] if beta is None else beta)
+
+    @classmethod
+    def fromCorpus(cls, corpus, alpha, beta):
+        """Builds an inferencer from the current counts of a corpus being sampled."""
+        inferencer = cls.__new__(cls)
+        inferencer._setCounts(corpus.n_wt, corpus.vocab, alpha, beta)
+        return inferencer
+
+    def _setCounts(self, topicWordCounts, vocab, alpha, beta):
+        self.alpha = alpha
+        self.beta = beta
+        counts = np.asarray(topicWordCounts, dtype=np.float64)
+        self.numTopics = counts.shape[1]
+        self.topicCounts = counts.sum(axis=0)
+        self.topicWordProbs = (counts + beta) / (self.topicCounts + beta)
+        self.wordIds = {word: i for i, word in enumerate(vocab[:len(counts)])}
+
+    def encode(self, docs):
+        """Turns documents into the flat token layout the sampler works on.
+
+        Args:
+            docs ([[str]]): The words of each document.
+
+        Returns:
+            (numpy.ndarray, numpy.ndarray): The word id of every known token, and the
+                offsets of each document into it.
+
+        """
+        wordIds = self.wordIds
+        tokenIds = []
+        docOffsets = np.zeros(len(docs) + 1, dtype=np.int64)
+        for doc, docWords in enumerate(docs):
+            tokenIds.extend(wordIds[word] for word in map(str.lower, docWords) if word in wordIds)
+            docOffsets[doc + 1] = len(tokenIds)
+        return np.array(tokenIds, dtype=np.int64), docOffsets
+
+    def infer(self, docs, iterations=DEFAULT_FOLD_IN_ITERATIONS, seed=None,
+              workers=1, blockSize=samplers.DEFAULT_BLOCK_SIZE):
+        """Estimates the topic distribution of each new document.
+            Tokens are sampled in the blocks of samplers.blockSchedule, so that no
+            block holds two tokens of the same document. Since the topic-word term
+            is fixed, tokens of different documents do not affect each other and
+            every block is sampled exactly. The counts of the second half of the
+            iterations are averaged for the estimate.
+
+        Args:
+            docs ([[str]]): The words of each document.
+            iterations (int): The number of fold-in sweeps.
+            seed (int): Seed for the random number generator, or None.
+            workers (int): The number of processes to split the documents across.
+                The same seed gives different draws for different numbers of workers.
+            blockSize (int): The most tokens resampled together.
+
+        Returns:
+            numpy.ndarray: A (documents x topics) array whose rows are P(t|d).
+
+        """
+        if workers > 1 and len(docs) > 1:
+            chunks = np.array_split(np.arange(len(docs)), min(workers, len(docs)))
+            seeds = np.random.SeedSequence(seed).spawn(len(chunks))
+            tasks = [([docs[d] for d in chunk], iterations, chunkSeed, blockSize)
+                     for chunk, chunkSeed in zip(chunks, seeds)]
+            with Pool(len(tasks), initializer=_setInferencer, initargs=(self,)) as pool:
+                return np.vstack(pool.map(_inferChunk, tasks))
+
+        rng = np.random.default_rng(seed)
+        alpha, numTopics = self.alpha, self.numTopics
+        tokenIds, docOffsets = self.encode(docs)
+        tokenDocs = samplers.tokenDocIndex(docOffsets)
+        order, blockStarts = samplers.blockSchedule(docOffsets, blockSize, tokenDocs, stripeLength=1)
+        words = tokenIds[order]
+        tokenDocs = tokenDocs[order]
+        topics = rng.integers(0, numTopics, len(words))
+        n_dt = np.zeros((len(docs), numTopics), dtype=np.int64)
+        np.add.at(n_dt, (tokenDocs, topics), 1)
+
+        totals = np.zeros(n_dt.shape)
+        samples = 0
+        for iteration in range(iterations):
+            uniforms = rng.random(len(words))
+            for start, stop in zip(blockStarts[:-1], blockStarts[1:]):
+                blockDocs = tokenDocs[start:stop]
+                oldTopics = topics[start:stop]
+                docCounts = n_dt[blockDocs] + alpha
+                docCounts[np.arange(stop - start), oldTopics] -= 1
+                newTopics = samplers.drawTopics(self.topicWordProbs[words[start:stop]] * docCounts,
+                                                uniforms[start:stop])
+                moved = np.flatnonzero(newTopics != oldTopics)
+                np.subtract.at(n_dt, (blockDocs[moved], oldTopics[moved]), 1)
+                np.add.at(n_dt, (blockDocs[moved], newTopics[moved]), 1)
+                oldTopics[moved] = newTopics[moved]
+            if iteration >= iterations // 2:
+                totals += n_dt
+                samples += 1
+
+        docLengths = np.diff(docOffsets)[:, None]
+        return (totals / max(samples, 1) + alpha) / (docLengths + numTopics * alpha)
+
+    def perplexity(self, docs, iterations=DEFAULT_FOLD_IN_ITERATIONS, seed=None):
+        """Returns the perplexity of the model on held-out documents: the exponent of
+            the negative mean log probability of their words, with each document's
+            topic distribution estimated by infer. Words the model has no topic for
+            are left out.
+
+        Args:
+            docs ([[str]]): The words of each document.
+            iterations (int): The number of fold-in sweeps.
+            seed (int): Seed for the random number generator, or None.
+
+        Returns:
+            float: The perplexity, or nan if none of the words are known.
+
+        """
+        distributions = self.infer(docs, iterations, seed)
+        tokenIds, docOffsets = self.encode(docs)
+        if len(tokenIds) == 0:
+            return float('nan')
+        # a normalized P(w|t), so that the probabilities of the words add up to one
+        vocabSize = len(self.topicWordProbs)
+        wordProbs = self.topicWordProbs * (self.topicCounts + self.beta) / (self.topicCounts + vocabSize * self.beta)
+        tokenDocs = samplers.tokenDocIndex(docOffsets)
+        tokenProbs = np.einsum('ij,ij->i', wordProbs[tokenIds], distributions[tokenDocs])
+        return float(np.exp(-np.log(tokenProbs).mean()))
+
+
+def inferTopics(modelPath, docs, iterations=DEFAULT_FOLD_IN_ITERATIONS, seed=None, workers=1):
+    """Loads a saved model and estimates the topic distribution of each new document.
+
+    Args:
+        modelPath (str): A .json model or a .model directory.
+        docs ([[str]]): The words of each document.
+        iterations (int): The number of fold-in sweeps.
+        seed (int): Seed for the random number generator, or None.
+        workers (int): The number of processes to split the documents across.
+
+    Returns:
+        numpy.ndarray: A (documents x topics) array whose rows are P(t|d).
+
+    """
+    inferencer = TopicInferencer(modelStore.loadModel(modelPath))
+    return inferencer.infer(docs, iterations, seed, workers)
+
+
+def main():
+    """Prints the topic distribution of each document of a .csv file as JSON."""
+    if len(sys.argv) < 3:
+        print("Usage: python3 inference.py [model].json|[model].model [documents].csv [iterations]")
+        exit()
+    import LDA
+    labels, docs = [], []
+    for docLabel, docWords in LDA.readDocuments(sys.argv[2]):
+        labels.append(docLabel)
+        docs.append(docWords)
+    iterations = int(sys.argv[3]) if len(sys.argv) > 3 else DEFAULT_FOLD_IN_ITERATIONS
+    distributions = inferTopics(sys.argv[1], docs, iterations)
+    print(json.dumps(dict(zip(labels, distributions.tolist()))))
+
+if __name__ == "__main__":
+    main()
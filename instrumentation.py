@@ -0,0 +1,180 @@
+"""
+Instrumentation for LDA runs. The phases of a run (loading the corpus,
+filtering stopwords, initializing topics, annotating and encoding the
+output) and every sampling sweep are timed in wall-clock and CPU time, and
+each measurement is passed as an event dictionary to the registered hooks.
+MetricsRecorder collects the events into a JSON metrics file, and logEvent
+prints them as one JSON line each, which replaces the progress bar when
+the output is not a terminal. Runs can also be profiled with cProfile or
+tracemalloc.
+"""
+
+import contextlib
+import cProfile
+import json
+import pstats
+import sys
+import time
+import tracemalloc
+
+# callables that receive every event, registered with addHook
+_hooks = []
+# "bar", "log" or "auto" (a bar on a terminal and log lines otherwise)
+_progressMode = "auto"
+# number of allocation sites reported by a tracemalloc profile
+TOP_ALLOCATIONS = 25
+
+
+def addHook(hook):
+    """Registers a callable that is passed every event as a dictionary."""
+    _hooks.append(hook)
+
+
+def removeHook(hook):
+    """Unregisters a hook added with addHook."""
+    _hooks.remove(hook)
+
+
+def emit(event):
+    """Passes an event to every registered hook."""
+    for hook in list(_hooks):
+        hook(event)
+
+
+@contextlib.contextmanager
+def phase(name, **details):
+    """Times the code run inside the with block as one phase of a run.
+
+    Args:
+        name (str): The name of the phase.
+        **details: Extra values to include in the phase's event, such as a token count.
+
+    """
+    wallStart, cpuStart = time.perf_counter(), time.process_time()
+    yield
+    if _hooks:
+        emit(dict({'event': 'phase', 'name': name}, wall=time.perf_counter() - wallStart,
+                  cpu=time.process_time() - cpuStart, **details))
+
+
+def sweepDone(iteration, iterations, wall, cpu, tokens=None):
+    """Reports a finished sampling sweep.
+
+    Args:
+        iteration (int): The number of sweeps completed.
+        iterations (int): The total number of sweeps in the run.
+        wall (float): Wall-clock seconds the sweep took.
+        cpu (float): CPU seconds the sweep took.
+        tokens (int): The number of tokens sampled, if known.
+
+    """
+    if _hooks:
+        event = {'event': 'sweep', 'iteration': iteration, 'iterations': iterations, 'wall': wall, 'cpu': cpu}
+        if tokens is not None:
+            event['tokens'] = tokens
+            event['tokens per second'] = tokens / wall if wall > 0 else None
+        emit(event)
+
+
+def setProgressMode(mode):
+    """Chooses how sweeps are reported: "bar", "log" or "auto"."""
+    global _progressMode
+    if mode not in ("bar", "log", "auto"):
+        raise ValueError("progress must be \"bar\", \"log\" or \"auto\", not " + str(mode))
+    _progressMode = mode
+
+
+def useProgressBar():
+    """Returns True if sweeps should be shown with the progress bar."""
+    return _progressMode == "bar" or (_progressMode == "auto" and sys.stdout.isatty())
+
+
+def logEvent(event):
+    """A hook that prints each event as one line of JSON, for logs and batch schedulers."""
+    print(json.dumps(dict(event, time=round(time.time(), 3))), flush=True)
+
+
+class MetricsRecorder:
+    """A hook that collects the events of a run and writes them to a JSON file."""
+
+    def __init__(self):
+        self.phases = {}
+        self.sweeps = []
+        self.profiles = []
+
+    def __call__(self, event):
+        if event['event'] == 'phase':
+            totals = self.phases.setdefault(event['name'], {'wall': 0.0, 'cpu': 0.0, 'count': 0})
+            totals['wall'] += event['wall']
+            totals['cpu'] += event['cpu']
+            totals['count'] += 1
+            for key, value in event.items():
+                if key not in ('event', 'name', 'wall', 'cpu'):
+                    totals[key] = value
+        elif event['event'] == 'sweep':
+            self.sweeps.append({key: value for key, value in event.items() if key != 'event'})
+        elif event['event'] == 'profile':
+            self.profiles.append({key: value for key, value in event.items() if key != 'event'})
+
+    def summary(self):
+        """Returns the totals of each phase and of the sampling sweeps."""
+        sweepWall = sum(sweep['wall'] for sweep in self.sweeps)
+        tokens = sum(sweep.get('tokens', 0) for sweep in self.sweeps)
+        return {'phases': self.phases,
+                'sampling': {'sweeps': len(self.sweeps),
+                             'wall': sweepWall,
+                             'cpu': sum(sweep['cpu'] for sweep in self.sweeps),
+                             'tokens per second': tokens / sweepWall if tokens and sweepWall > 0 else None},
+                'sweeps': self.sweeps,
+                'profiles': self.profiles}
+
+    def write(self, fileName, settings=None):
+        """Writes the summary, and the settings of the run if given, to a JSON file."""
+        metrics = self.summary()
+        if settings is not None:
+            metrics = dict(settings=settings, **metrics)
+        with open(fileName, 'w') as outfile:
+            json.dump(metrics, outfile, indent=4)
+
+
+@contextlib.contextmanager
+def profiling(mode, outputname):
+    """Profiles the code run inside the with block.
+
+    Args:
+        mode (str): "cprofile" to record a cProfile profile to outputname.prof,
+            "tracemalloc" to record the peak traced memory and the largest
+            allocation sites to outputname-memory.json, or "off". Either profile
+            is also passed to the hooks as a 'profile' event.
+        outputname (str): Name of the run's output files (without file extension).
+
+    """
+    if mode == "cprofile":
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            profiler.dump_stats(outputname + ".prof")
+            stats = pstats.Stats(profiler)
+            emit({'event': 'profile', 'mode': mode, 'file': outputname + ".prof",
+                  'total seconds': stats.total_tt})
+    elif mode == "tracemalloc":
+        tracemalloc.start()
+        try:
+            yield
+        finally:
+            current, peak = tracemalloc.get_traced_memory()
+            statistics = tracemalloc.take_snapshot().statistics('lineno')[:TOP_ALLOCATIONS]
+            tracemalloc.stop()
+            profile = {'mode': mode, 'file': outputname + "-memory.json", 'peak bytes': peak, 'current bytes': current,
+                       'top allocations': [{'location': str(stat.traceback), 'bytes': stat.size, 'blocks': stat.count}
+                                           for stat in statistics]}
+            with open(outputname + "-memory.json", 'w') as outfile:
+                json.dump(profile, outfile, indent=4)
+            emit(dict({'event': 'profile'}, **profile))
+    elif mode == "off":
+        yield
+    else:
+        raise ValueError("profile must be \"cprofile\", \"tracemalloc\" or \"off\", not " + str(mode))
@@ -0,0 +1,323 @@
+"""
+Usage:      python3 modelStore.py [model file name].json ...
+
+A compact binary format for LDA models, and a loader that memory-maps it.
+A model is saved as a directory holding a vocabulary table, flat int32
+arrays of the word and topic at every location in the text (stopwords
+included), the document offsets into those arrays and the topic-word count
+matrix, along with the inverted index of the text (see postings.py). The
+loader maps each array only when it is first used, so reading the
+topic-word table does not require touching the per-location arrays.
+
+Running this file converts .json models written by encodeData into the
+binary format.
+"""
+
+import json
+import os
+import sys
+import numpy as np
+import postings
+
+FORMAT_VERSION = 1
+
+# arrays saved as .npy files in the model directory
+ARRAYS = ('tokenIds', 'topicIds', 'docOffsets', 'topicWordCounts', 'puncCapLocations', 'newlineLocations')
+# the inverted index, saved as .npy files. models saved before it was added are
+# without them, and build the index when it is first used
+POSTINGS_ARRAYS = ('postingsOffsets', 'postingsDocs', 'postingsPositions')
+# word lists saved as .txt files in the model directory, one word per line
+WORD_LISTS = ('vocab', 'puncAndCap')
+
+
+def modelDirectory(outputname):
+    """Returns the name of the directory a model called outputname is saved in."""
+    return outputname + ".model"
+
+
+def corpusArrays(corpus):
+    """Builds the arrays of the binary format from a corpus that has been sampled
+        and has called createAnnoTextDataStructure.
+
+    Args:
+        corpus (CorpusData): The corpus to save.
+
+    Returns:
+        (dict, [str]): The arrays in ARRAYS that come from the corpus, and the
+            vocabulary. The first len(corpus.vocab) words of the vocabulary are
+            the rows of topicWordCounts, and the stopwords follow them.
+
+    """
+    arrays = {'tokenIds': corpus.staticTokenIds,
+              'topicIds': corpus.staticTopics,
+              'docOffsets': corpus.staticDocOffsets,
+              'topicWordCounts': corpus.n_wt.astype(np.int32)}
+    arrays.update(postingsArrays(corpus.postings))
+    return arrays, list(corpus.staticVocab)
+
+
+def postingsArrays(index):
+    """Returns the arrays in POSTINGS_ARRAYS that save an inverted index."""
+    return {'postingsOffsets': index.offsets, 'postingsDocs': index.docs, 'postingsPositions': index.positions}
+
+
+def saveModel(directory, meta, arrays, vocab, puncData):
+    """Writes a model in the binary format.
+
+    Args:
+        directory (str): The directory to write the model to. It is created if needed.
+        meta (dict): The dataset name, topics, iterations, alpha, beta and stopwords
+            of the model, plus any other values that should be kept with it.
+        arrays (dict): The tokenIds, topicIds, docOffsets and topicWordCounts arrays,
+            and the POSTINGS_ARRAYS if the inverted index should be saved.
+        vocab ([str]): The vocabulary table indexed by tokenIds.
+        puncData ([[str], [float], [int]]): puncAndCap, puncCapLocations and
+            newlineLocations as returned by grabPuncAndCap.
+
+    """
+    os.makedirs(directory, exist_ok=True)
+    arrays = dict(arrays)
+    arrays['puncCapLocations'] = np.asarray(puncData[1], dtype=np.float64)
+    arrays['newlineLocations'] = np.asarray(puncData[2], dtype=np.int64)
+    for name in ARRAYS + tuple(name for name in POSTINGS_ARRAYS if name in arrays):
+        np.save(os.path.join(directory, name + ".npy"), arrays[name])
+    for name, words in (('vocab', vocab), ('puncAndCap', puncData[0])):
+        with open(os.path.join(directory, name + ".txt"), 'w', encoding='utf-8') as outfile:
+            outfile.write("\n".join(words))
+    meta = dict(meta, format=FORMAT_VERSION, numTopicWords=len(arrays['topicWordCounts']))
+    with open(os.path.join(directory, "meta.json"), 'w') as outfile:
+        json.dump(meta, outfile)
+
+
+class Model:
+    """An LDA model read from the binary format or from an encodeData .json file.
+        Arrays are loaded (memory-mapped, for the binary format) the first time
+        they are used, and views in the .json layout are built only on request.
+
+    """
+
+    def __init__(self, directory=None, meta=None, arrays=None, wordLists=None):
+        """Opens a model. Only meta.json is read here.
+
+        Args:
+            directory (str): A model directory written by saveModel.
+            meta (dict): The model's meta data, when it is not read from a directory.
+            arrays (dict): Arrays already in memory, used instead of files.
+            wordLists (dict): The vocab and puncAndCap lists, used instead of files.
+
+        """
+        self.directory = directory
+        if meta is None:
+            with open(os.path.join(directory, "meta.json"), 'r') as metafile:
+                meta = json.load(metafile)
+            if meta.get('format') != FORMAT_VERSION:
+                raise ValueError(directory + " is not a version " + str(FORMAT_VERSION) + " model")
+        self.meta = meta
+        self._arrays = dict(arrays or {})
+        self._wordLists = dict(wordLists or {})
+        self._postings = None
+
+    def array(self, name):
+        """Returns one of the arrays in ARRAYS or POSTINGS_ARRAYS, mapping it into
+            memory on first use.
+
+        """
+        if name not in self._arrays:
+            self._arrays[name] = np.load(os.path.join(self.directory, name + ".npy"), mmap_mode='r')
+        return self._arrays[name]
+
+    def wordList(self, name):
+        """Returns one of the word lists in WORD_LISTS, reading it on first use."""
+        if name not in self._wordLists:
+            with open(os.path.join(self.directory, name + ".txt"), 'r', encoding='utf-8') as infile:
+                text = infile.read()
+            self._wordLists[name] = text.split("\n") if text else []
+        return self._wordLists[name]
+
+    @property
+    def numTopics(self):
+        """int: The number of topics in the model."""
+        return self.meta['topics']
+
+    @property
+    def numDocs(self):
+        """int: The number of documents in the model."""
+        return len(self.array('docOffsets')) - 1
+
+    @property
+    def vocab(self):
+        """[str]: The word for each word id. Ids below numTopicWords are the rows
+            of topicWordCounts; the rest are stopwords.
+
+        """
+        return self.wordList('vocab')
+
+    @property
+    def topicWordCounts(self):
+        """numpy.ndarray: The (numTopicWords x topics) matrix of word counts per topic."""
+        return self.array('topicWordCounts')
+
+    def documentSlice(self, doc):
+        """Returns the slice of the per-location arrays that holds document doc."""
+        docOffsets = self.array('docOffsets')
+        return slice(int(docOffsets[doc]), int(docOffsets[doc + 1]))
+
+    def documentWords(self, doc):
+        """Returns the words of one document, stopwords included."""
+        vocab = self.vocab
+        return [vocab[w] for w in self.array('tokenIds')[self.documentSlice(doc)].tolist()]
+
+    def documentTopics(self, doc):
+        """Returns the topic at each location of one document, -1 for stopwords."""
+        return self.array('topicIds')[self.documentSlice(doc)].tolist()
+
+    def docTopicCounts(self):
+        """Returns the (documents x topics) matrix of how many words of each
+            document are assigned to each topic.
+
+        """
+        topicIds = np.asarray(self.array('topicIds'))
+        docOffsets = np.asarray(self.array('docOffsets'))
+        docs = np.repeat(np.arange(len(docOffsets) - 1), np.diff(docOffsets))
+        assigned = topicIds >= 0
+        counts = np.zeros((len(docOffsets) - 1, self.numTopics), dtype=np.int64)
+        np.add.at(counts, (docs[assigned], topicIds[assigned]), 1)
+        return counts
+
+    def postings(self):
+        """Returns the inverted index of the model's text, keyed by word id. It is
+            mapped from the model directory if it was saved there, and built from
+            tokenIds otherwise.
+
+        """
+        if self._postings is None:
+            if self.directory is not None and os.path.exists(os.path.join(self.directory, "postingsOffsets.npy")):
+                self._postings = postings.Postings(self.array('postingsOffsets'), self.array('postingsDocs'),
+                                                   self.array('postingsPositions'), self.numDocs)
+            else:
+                self._postings = postings.Postings.build(self.array('tokenIds'), self.array('docOffsets'),
+                                                         len(self.vocab))
+        return self._postings
+
+    def topicWordInstancesDict(self):
+        """Returns the topic-word counts as one {word: count} dictionary per topic,
+            leaving out zero counts, as in the .json format.
+
+        """
+        vocab = self.vocab
+        counts = np.asarray(self.topicWordCounts)
+        topics = []
+        for topic in range(self.numTopics):
+            wordIds = np.flatnonzero(counts[:, topic])
+            topics.append(dict(zip([vocab[w] for w in wordIds], counts[wordIds, topic].tolist())))
+        return topics
+
+    def toDict(self):
+        """Returns the whole model as the dictionary encodeData writes to .json."""
+        vocab = self.vocab
+        tokenIds = self.array('tokenIds').tolist()
+        topicIds = self.array('topicIds').tolist()
+        docOffsets = self.array('docOffsets').tolist()
+        dumpDict = {key: value for key, value in self.meta.items() if key not in ('format', 'numTopicWords')}
+        dumpDict.update({
+            'wordsByLocationWithStopwords': [[vocab[w] for w in tokenIds[docOffsets[d]:docOffsets[d + 1]]]
+                                             for d in range(len(docOffsets) - 1)],
+            'topicsByLocationWithStopwords': [topicIds[docOffsets[d]:docOffsets[d + 1]]
+                                              for d in range(len(docOffsets) - 1)],
+            'topicWordInstancesDict': self.topicWordInstancesDict(),
+            'puncAndCap': self.wordList('puncAndCap'),
+            'puncCapLocations': self.array('puncCapLocations').tolist(),
+            'newlineLocations': self.array('newlineLocations').tolist()})
+        return dumpDict
+
+    def save(self, directory):
+        """Writes this model to directory in the binary format."""
+        arrays = {name: self.array(name) for name in ('tokenIds', 'topicIds', 'docOffsets', 'topicWordCounts')}
+        arrays.update(postingsArrays(self.postings()))
+        saveModel(directory, {key: value for key, value in self.meta.items() if key not in ('format', 'numTopicWords')},
+                  arrays, self.vocab,
+                  [self.wordList('puncAndCap'), self.array('puncCapLocations'), self.array('newlineLocations')])
+
+    @classmethod
+    def fromDict(cls, dumpDict):
+        """Builds a model from the dictionary stored in an encodeData .json file."""
+        words = [word for docWords in dumpDict['wordsByLocationWithStopwords'] for word in docWords]
+        topics = np.fromiter((topic for docTopics in dumpDict['topicsByLocationWithStopwords'] for topic in docTopics),
+                             dtype=np.int32, count=len(words))
+        # words that were given topics come first, in the order they first appear
+        wordIds = {}
+        for word, topic in zip(words, topics.tolist()):
+            if topic >= 0 and word not in wordIds:
+                wordIds[word] = len(wordIds)
+        numTopicWords = len(wordIds)
+        for word in words:
+            if word not in wordIds:
+                wordIds[word] = len(wordIds)
+        tokenIds = np.fromiter((wordIds[word] for word in words), dtype=np.int32, count=len(words))
+        docLengths = [len(docWords) for docWords in dumpDict['wordsByLocationWithStopwords']]
+        docOffsets = np.zeros(len(docLengths) + 1, dtype=np.int64)
+        np.cumsum(docLengths, out=docOffsets[1:])
+        assigned = topics >= 0
+        topicWordCounts = np.zeros((numTopicWords, dumpDict['topics']), dtype=np.int32)
+        np.add.at(topicWordCounts, (tokenIds[assigned], topics[assigned]), 1)
+
+        meta = {key: value for key, value in dumpDict.items()
+                if key not in ('wordsByLocationWithStopwords', 'topicsByLocationWithStopwords',
+                               'topicWordInstancesDict', 'puncAndCap', 'puncCapLocations', 'newlineLocations')}
+        meta['numTopicWords'] = numTopicWords
+        arrays = {'tokenIds': tokenIds,
+                  'topicIds': topics,
+                  'docOffsets': docOffsets,
+                  'topicWordCounts': topicWordCounts,
+                  'puncCapLocations': np.asarray(dumpDict['puncCapLocations'], dtype=np.float64),
+                  'newlineLocations': np.asarray(dumpDict['newlineLocations'], dtype=np.int64)}
+        wordLists = {'vocab': list(wordIds), 'puncAndCap': dumpDict['puncAndCap']}
+        return cls(meta=meta, arrays=arrays, wordLists=wordLists)
+
+
+def modelPaths(paths):
+    """Expands directories into the .json models and .model directories they hold.
+        Other paths are kept as they are.
+
+    """
+    models = []
+    for path in paths:
+        if os.path.isdir(path) and not path.rstrip(os.sep).endswith(".model"):
+            models.extend(os.path.join(path, name) for name in sorted(os.listdir(path))
+                          if name.endswith(".json") or name.endswith(".model"))
+        else:
+            models.append(path)
+    return models
+
+
+def loadModel(path):
+    """Opens a model saved in either format.
+
+    Args:
+        path (str): A .json file written by encodeData or a directory written by saveModel.
+
+    Returns:
+        Model: The model.
+
+    """
+    if path.endswith(".json"):
+        with open(path, 'r') as jsonfile:
+            return Model.fromDict(json.load(jsonfile))
+    return Model(path)
+
+
+def main():
+    """Converts each .json model named on the command line into the binary format,
+        saved next to it as [model name].model.
+
+    """
+    if len(sys.argv) < 2:
+        print("Usage: python3 modelStore.py [model file name].json ...")
+        exit()
+    for jsonFile in sys.argv[1:]:
+        directory = modelDirectory(jsonFile[:-5])
+        loadModel(jsonFile).save(directory)
+        print(jsonFile + " -> " + directory)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""
+Online variational Bayes for LDA (Hoffman, Blei and Bach, "Online Learning
+for Latent Dirichlet Allocation", 2010). Documents are read in minibatches;
+each minibatch updates the variational topic-word parameters with a
+learning rate that decays as more minibatches are seen. Only the
+(words x topics) parameters are kept between minibatches, so memory does
+not grow with the size of the corpus.
+"""
+
+import numpy as np
+
+# defaults for the learning rate rho_t = (tau0 + t) ** -kappa
+DEFAULT_TAU0 = 1024.0
+DEFAULT_KAPPA = 0.7
+DEFAULT_BATCH_SIZE = 64
+# the E-step for a document stops when the mean change in its topic weights drops below this
+E_STEP_TOLERANCE = 1e-3
+E_STEP_MAX_ITERATIONS = 100
+
+
+def digamma(x):
+    """The digamma function for positive arguments, computed elementwise.
+        Small arguments are shifted up with psi(x) = psi(x + 1) - 1 / x and the
+        asymptotic series is used once they are at least 6.
+
+    """
+    x = np.array(x, dtype=np.float64)
+    result = np.zeros_like(x)
+    small = x < 6
+    while small.any():
+        result[small] -= 1.0 / x[small]
+        x[small] += 1
+        small = x < 6
+    inv = 1.0 / x
+    inv2 = inv * inv
+    series = inv2 * (1.0 / 12 - inv2 * (1.0 / 120 - inv2 * (1.0 / 252 - inv2 * (1.0 / 240 - inv2 / 132))))
+    return result + np.log(x) - 0.5 * inv - series
+
+
+def expectedLog(parameters):
+    """Returns E[log x] for x ~ Dirichlet(parameters), for each row of parameters."""
+    return digamma(parameters) - digamma(parameters.sum(axis=-1, keepdims=True))
+
+
+class OnlineLDA:
+    """The variational parameters of an online LDA model.
+
+    Attributes:
+        wordTopicWeights (numpy.ndarray): The (words x topics) variational
+            parameters lambda of the topic-word distributions.
+
+    """
+
+    def __init__(self, vocab, numTopics, numDocs, alpha, beta, rng,
+                 tau0=DEFAULT_TAU0, kappa=DEFAULT_KAPPA, stopwords=()):
+        """Starts a model with randomly initialized topics.
+
+        Args:
+            vocab ([str]): The words of the vocabulary, in word id order.
+            numTopics (int): The number of topics.
+            numDocs (int): The number of documents in the corpus, used to scale
+                each minibatch up to the whole corpus.
+            alpha (float): The Dirichlet prior on document-topic distributions.
+            beta (float): The Dirichlet prior on topic-word distributions.
+            rng (numpy.random.Generator): Source of randomness for initialization.
+            tau0 (float): Delay of the learning rate; larger values down-weight
+                the first minibatches.
+            kappa (float): Decay of the learning rate, between 0.5 and 1.
+            stopwords (set): The stopwords the vocabulary was found with, kept for
+                the output files.
+
+        """
+        self.vocab = vocab
+        self.stopwords = stopwords
+        self.wordIds = {word: i for i, word in enumerate(vocab)}
+        self.numTopics = numTopics
+        self.numDocs = numDocs
+        self.alpha = alpha
+        self.beta = beta
+        self.tau0 = tau0
+        self.kappa = kappa
+        self.rng = rng
+        self.updates = 0
+        self.wordTopicWeights = rng.gamma(100.0, 1.0 / 100.0, (len(vocab), numTopics))
+        self._refreshExpectations()
+
+    def _refreshExpectations(self):
+        # exp(E[log beta_kw]), laid out (words x topics)
+        self.expElogBeta = np.exp(expectedLog(self.wordTopicWeights.T)).T
+
+    def inferDocument(self, wordIds, counts):
+        """Runs the E-step for one document.
+
+        Args:
+            wordIds (numpy.ndarray): The distinct word ids in the document.
+            counts (numpy.ndarray): How many times each of those words appears.
+
+        Returns:
+            (numpy.ndarray, numpy.ndarray): The document's topic weights gamma and
+                the (words x topics) responsibilities phi, normalized per word.
+
+        """
+        gamma = self.rng.gamma(100.0, 1.0 / 100.0, self.numTopics)
+        expElogTheta = np.exp(expectedLog(gamma))
+        expElogBeta = self.expElogBeta[wordIds]
+        norms = expElogBeta @ expElogTheta + 1e-100
+        for iteration in range(E_STEP_MAX_ITERATIONS):
+            lastGamma = gamma
+            gamma = self.alpha + expElogTheta * ((counts / norms) @ expElogBeta)
+            expElogTheta = np.exp(expectedLog(gamma))
+            norms = expElogBeta @ expElogTheta + 1e-100
+            if np.mean(np.abs(gamma - lastGamma)) < E_STEP_TOLERANCE:
+                break
+        phi = expElogBeta * expElogTheta / norms[:, None]
+        return gamma, phi
+
+    def update(self, docs):
+        """Runs the E-step on a minibatch and blends the resulting estimate of the
+            topic-word parameters into the model.
+
+        Args:
+            docs ([numpy.ndarray]): The documents of the minibatch as arrays of word ids.
+
+        """
+        wordStats = np.zeros_like(self.wordTopicWeights)
+        for doc in docs:
+            if len(doc) == 0:
+                continue
+            wordIds, counts = np.unique(doc, return_counts=True)
+            gamma, phi = self.inferDocument(wordIds, counts)
+            wordStats[wordIds] += counts[:, None] * phi
+        rho = (self.tau0 + self.updates) ** -self.kappa
+        estimate = self.beta + (self.numDocs / max(len(docs), 1)) * wordStats
+        self.wordTopicWeights *= 1 - rho
+        self.wordTopicWeights += rho * estimate
+        self.updates += 1
+        self._refreshExpectations()
+
+    def documentTopics(self, doc):
+        """Draws a topic for every token of one document from its responsibilities
+            under the trained model.
+
+        Args:
+            doc (numpy.ndarray): The word ids of the document's tokens, at least one.
+
+        Returns:
+            numpy.ndarray: The topic of each token.
+
+        """
+        wordIds, inverse, counts = np.unique(doc, return_inverse=True, return_counts=True)
+        gamma, phi = self.inferDocument(wordIds, counts)
+        cdf = np.cumsum(phi[inverse], axis=1)
+        targets = self.rng.random(len(doc)) * cdf[:, -1]
+        return (cdf < targets[:, None]).sum(axis=1)
+
+    def assignTopics(self, corpus):
+        """Gives every token in a corpus a topic drawn from its responsibilities
+            under the trained model, and rebuilds the corpus' count matrices.
+
+        Args:
+            corpus (CorpusData): A corpus loaded with the same stopwords the model
+                was trained with.
+
+        """
+        modelIds = np.array([self.wordIds[word] for word in corpus.vocab], dtype=np.int64)
+        docOffsets = corpus.docOffsets
+        for doc in range(corpus.numDocs):
+            start, stop = docOffsets[doc], docOffsets[doc + 1]
+            if start < stop:
+                corpus.tokenTopics[start:stop] = self.documentTopics(modelIds[corpus.tokenIds[start:stop]])
+        corpus.countTopics()
+
+
+def minibatches(docs, batchSize):
+    """Groups a stream of documents into lists of batchSize documents."""
+    batch = []
+    for doc in docs:
+        batch.append(doc)
+        if len(batch) == batchSize:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
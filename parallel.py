@@ -0,0 +1,190 @@
+"""
+Approximate distributed LDA (AD-LDA, Newman et al.) across a pool of
+processes. The documents are split into one partition per worker. Every
+iteration each worker sweeps its partition against its own copy of the rows
+of the word-topic counts for the words in its partition, and sends back the
+tokens that changed topic, which are applied to the global counts once all
+of the workers have finished.
+"""
+
+from multiprocessing import Pool
+from multiprocessing import shared_memory
+import numpy as np
+import samplers
+
+# arrays shared with the worker processes, attached by _attachSharedArrays
+_shared = {}
+
+
+class Partition:
+    """The slice of a corpus that one worker sweeps. It has the attributes the
+        sweeps in samplers.py read, so it can be passed to them in place of a
+        CorpusData. Its words are renumbered to index the rows of n_wt the
+        worker copied, which are only the rows of the words in the partition.
+
+    """
+
+    def __init__(self, tokenIds, tokenTopics, docOffsets, n_wt, n_dt, n_t):
+        self.tokenIds = tokenIds
+        self.tokenTopics = tokenTopics
+        self.docOffsets = docOffsets
+        self.n_wt = n_wt
+        self.n_dt = n_dt
+        self.n_t = n_t
+        self.numTopics = n_wt.shape[1]
+        # the parent reports the moves once the counts are merged
+        self.moveListener = None
+
+
+class SharedArray:
+    """A NumPy array stored in a named shared memory block."""
+
+    def __init__(self, array):
+        self.memory = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        self.shape = array.shape
+        self.dtype = array.dtype.str
+        self.array = np.ndarray(self.shape, dtype=self.dtype, buffer=self.memory.buf)
+        self.array[...] = array
+
+    def spec(self):
+        """Returns what a worker needs to attach to this array."""
+        return self.memory.name, self.shape, self.dtype
+
+    def release(self):
+        """Frees the shared memory block. Views of the array must be dropped first."""
+        del self.array
+        self.memory.close()
+        self.memory.unlink()
+
+
+def _attachSharedArrays(specs):
+    """Pool initializer: maps the shared arrays into this worker."""
+    for key, (name, shape, dtype) in specs.items():
+        memory = shared_memory.SharedMemory(name=name)
+        _shared[key] = (memory, np.ndarray(shape, dtype=dtype, buffer=memory.buf))
+
+
+def _sweepPartition(task):
+    """Sweeps the documents in one partition against a local copy of the rows of
+        the global word-topic counts for the words in the partition. Topic
+        assignments and the partition's rows of n_dt are written straight into
+        shared memory; each partition owns its documents, so no other worker
+        touches them. The tokens that changed topic are returned as (words,
+        documents, old topics, new topics) arrays, from which the global counts
+        are updated.
+
+    """
+    firstDoc, lastDoc, sampler, alpha, beta, blockSize, seed = task
+    docOffsets = _shared['docOffsets'][1]
+    start, stop = docOffsets[firstDoc], docOffsets[lastDoc]
+    tokenTopics = _shared['tokenTopics'][1][start:stop]
+    oldTopics = tokenTopics.copy()
+    words, localIds = np.unique(_shared['tokenIds'][1][start:stop], return_inverse=True)
+    partition = Partition(localIds.astype(np.int32),
+                          tokenTopics,
+                          docOffsets[firstDoc:lastDoc + 1] - start,
+                          _shared['n_wt'][1][words],
+                          _shared['n_dt'][1][firstDoc:lastDoc],
+                          _shared['n_t'][1].copy())
+    samplers.SWEEPS[sampler](partition, alpha, beta, np.random.default_rng(seed), blockSize)
+    moved = np.flatnonzero(tokenTopics != oldTopics)
+    docs = samplers.tokenDocIndex(partition.docOffsets)[moved] + firstDoc
+    return words[localIds[moved]], docs, oldTopics[moved], tokenTopics[moved]
+
+
+def partitionDocs(docOffsets, numPartitions):
+    """Splits the documents into contiguous ranges holding roughly equal numbers of tokens.
+
+    Args:
+        docOffsets (numpy.ndarray): The corpus' document offsets.
+        numPartitions (int): The number of ranges wanted.
+
+    Returns:
+        [(int, int)]: The first and one-past-last document of each non-empty range.
+
+    """
+    numDocs = len(docOffsets) - 1
+    targets = np.linspace(0, docOffsets[-1], numPartitions + 1)[1:-1]
+    bounds = [0] + np.searchsorted(docOffsets, targets).tolist() + [numDocs]
+    return [(bounds[i], bounds[i + 1]) for i in range(numPartitions) if bounds[i] < bounds[i + 1]]
+
+
+class ParallelSampler:
+    """Runs AD-LDA sweeps over a corpus with a pool of worker processes. Use it
+        as a context manager. While the pool is open the corpus' tokenTopics and
+        count matrices are views of the shared arrays, so they are current after
+        every sweep; closing the pool copies them back into ordinary arrays.
+
+    """
+
+    def __init__(self, corpus, workers, sampler='gibbs', blockSize=samplers.DEFAULT_BLOCK_SIZE):
+        """Copies the corpus into shared memory and starts the worker pool.
+
+        Args:
+            corpus (CorpusData): A data structure that has already called "loadData"
+                on a text.
+            workers (int): The number of worker processes.
+            sampler (str): The name of the sampling engine each worker runs.
+            blockSize (int): The block size passed to the sampling engine.
+
+        """
+        self.corpus = corpus
+        self.sampler = sampler
+        self.blockSize = blockSize
+        self.partitions = partitionDocs(corpus.docOffsets, workers)
+        self.arrays = {'tokenIds': SharedArray(corpus.tokenIds),
+                       'tokenTopics': SharedArray(corpus.tokenTopics),
+                       'docOffsets': SharedArray(corpus.docOffsets),
+                       'n_wt': SharedArray(corpus.n_wt),
+                       'n_dt': SharedArray(corpus.n_dt),
+                       'n_t': SharedArray(corpus.n_t)}
+        corpus.tokenTopics = self.arrays['tokenTopics'].array
+        corpus.n_wt = self.arrays['n_wt'].array
+        corpus.n_dt = self.arrays['n_dt'].array
+        corpus.n_t = self.arrays['n_t'].array
+        specs = {key: array.spec() for key, array in self.arrays.items()}
+        self.pool = Pool(len(self.partitions), initializer=_attachSharedArrays, initargs=(specs,))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def sweep(self, alpha, beta, rng):
+        """Runs one AD-LDA iteration: every worker sweeps its partition, then the
+            word-topic counts are merged.
+
+        Args:
+            alpha (float): Smoothing constant for the P(t|d) term.
+            beta (float): Smoothing constant for the P(w|t) term.
+            rng (numpy.random.Generator): Source of the seed for each worker.
+
+        """
+        seeds = rng.integers(0, 2 ** 63, size=len(self.partitions))
+        tasks = [(first, last, self.sampler, alpha, beta, self.blockSize, int(seed))
+                 for (first, last), seed in zip(self.partitions, seeds)]
+        corpus = self.corpus
+        for words, docs, oldTopics, newTopics in self.pool.map(_sweepPartition, tasks):
+            ones = np.ones(len(words), dtype=corpus.n_wt.dtype)
+            np.subtract.at(corpus.n_wt, (words, oldTopics), ones)
+            np.add.at(corpus.n_wt, (words, newTopics), ones)
+            corpus.n_t -= np.bincount(oldTopics, minlength=corpus.numTopics)
+            corpus.n_t += np.bincount(newTopics, minlength=corpus.numTopics)
+            # the workers have already moved the tokens in n_dt
+            if corpus.moveListener is not None:
+                corpus.moveListener(corpus, words, docs, oldTopics, newTopics)
+
+    def close(self):
+        """Stops the pool and copies the results back into the corpus."""
+        if self.pool is None:
+            return
+        self.pool.close()
+        self.pool.join()
+        self.pool = None
+        self.corpus.tokenTopics = self.corpus.tokenTopics.copy()
+        self.corpus.n_wt = self.corpus.n_wt.copy()
+        self.corpus.n_dt = self.corpus.n_dt.copy()
+        self.corpus.n_t = self.corpus.n_t.copy()
+        for array in self.arrays.values():
+            array.release()
@@ -0,0 +1,127 @@
+"""
+An inverted index of a corpus: for every word id, the documents it appears
+in and its position within each of them, stored CSR-style as three flat
+arrays. Entries for word w are offsets[w]:offsets[w + 1] of docs and
+positions, in corpus order, so finding where a word appears, how many
+documents hold it, or how often words share a document takes no scan of
+the corpus. CorpusData builds the index of its text (stopwords included)
+when it loads, and it is saved with binary models.
+"""
+
+import numpy as np
+
+# documents whose co-occurrences are counted in one matrix product
+COOCCURRENCE_BLOCK_SIZE = 4096
+
+
+class Postings:
+    """The postings of every word of a corpus.
+
+    Attributes:
+        offsets (numpy.ndarray): The postings of word w are entries offsets[w]:offsets[w + 1].
+        docs (numpy.ndarray): The document of each entry.
+        positions (numpy.ndarray): The position of each entry within its document.
+        numDocs (int): The number of documents in the corpus.
+
+    """
+
+    def __init__(self, offsets, docs, positions, numDocs):
+        self.offsets = offsets
+        self.docs = docs
+        self.positions = positions
+        self.numDocs = numDocs
+
+    @classmethod
+    def build(cls, tokenIds, docOffsets, vocabSize):
+        """Builds the index of a corpus with one stable sort of its tokens by word id.
+
+        Args:
+            tokenIds (numpy.ndarray): The word id of every token, in corpus order.
+            docOffsets (numpy.ndarray): Document d owns tokenIds[docOffsets[d]:docOffsets[d + 1]].
+            vocabSize (int): The number of word ids.
+
+        """
+        tokenIds = np.asarray(tokenIds)
+        docOffsets = np.asarray(docOffsets, dtype=np.int64)
+        numDocs = len(docOffsets) - 1
+        order = np.argsort(tokenIds, kind='stable')
+        docs = np.repeat(np.arange(numDocs, dtype=np.int32), np.diff(docOffsets))[order]
+        positions = (order - docOffsets[docs]).astype(np.int32)
+        offsets = np.zeros(vocabSize + 1, dtype=np.int64)
+        np.cumsum(np.bincount(tokenIds, minlength=vocabSize), out=offsets[1:])
+        return cls(offsets, docs, positions, numDocs)
+
+    @property
+    def vocabSize(self):
+        """int: The number of word ids."""
+        return len(self.offsets) - 1
+
+    def renumber(self, newIds):
+        """Returns the index with its words renumbered.
+
+        Args:
+            newIds (numpy.ndarray): The new id of each word id, a permutation.
+
+        """
+        lengths = np.diff(self.offsets)
+        oldIds = np.argsort(newIds)
+        newOffsets = np.zeros(len(self.offsets), dtype=np.int64)
+        np.cumsum(lengths[oldIds], out=newOffsets[1:])
+        # entry i of the new index is entry i - newOffsets[w] + offsets[oldIds[w]] of this one
+        source = np.arange(newOffsets[-1]) + np.repeat(self.offsets[oldIds] - newOffsets[:-1], lengths[oldIds])
+        return Postings(newOffsets, self.docs[source], self.positions[source], self.numDocs)
+
+    def locations(self, wordId):
+        """Returns the documents and in-document positions of every occurrence of a word."""
+        entries = slice(int(self.offsets[wordId]), int(self.offsets[wordId + 1]))
+        return self.docs[entries], self.positions[entries]
+
+    def wordDocuments(self, wordId):
+        """Returns the documents a word appears in, in order."""
+        docs = self.docs[int(self.offsets[wordId]):int(self.offsets[wordId + 1])]
+        return docs[np.concatenate(([True], docs[1:] != docs[:-1]))] if len(docs) else docs
+
+    def documentFrequency(self):
+        """Returns the number of documents each word appears in."""
+        firstInDoc = np.ones(len(self.docs), dtype=bool)
+        firstInDoc[1:] = self.docs[1:] != self.docs[:-1]
+        firstInDoc[self.offsets[:-1][self.offsets[:-1] < len(self.docs)]] = True
+        counts = np.zeros(len(self.docs) + 1, dtype=np.int64)
+        np.cumsum(firstInDoc, out=counts[1:])
+        return counts[self.offsets[1:]] - counts[self.offsets[:-1]]
+
+    def cooccurrences(self, wordIds):
+        """Counts the documents that words appear in, alone and in pairs.
+
+        Args:
+            wordIds ([int]): Distinct word ids. Ids of -1 appear in no documents.
+
+        Returns:
+            numpy.ndarray: A (words x words) matrix whose [i, j] entry is the number of
+            documents holding both wordIds[i] and wordIds[j]. The diagonal holds
+            the number of documents each word appears in.
+
+        """
+        docs = [np.zeros(0, dtype=np.int32)]
+        columns = [np.zeros(0, dtype=np.int64)]
+        for column, wordId in enumerate(wordIds):
+            if wordId >= 0:
+                wordDocs = self.wordDocuments(wordId)
+                docs.append(wordDocs)
+                columns.append(np.full(len(wordDocs), column, dtype=np.int64))
+        docs = np.concatenate(docs)
+        order = np.argsort(docs, kind='stable')
+        docs = docs[order]
+        columns = np.concatenate(columns)[order]
+
+        cooccurrences = np.zeros((len(wordIds), len(wordIds)))
+        blockStarts = np.searchsorted(docs, np.arange(0, self.numDocs + COOCCURRENCE_BLOCK_SIZE,
+                                                      COOCCURRENCE_BLOCK_SIZE))
+        for block in range(len(blockStarts) - 1):
+            start, stop = blockStarts[block], blockStarts[block + 1]
+            if start == stop:
+                continue
+            incidence = np.zeros((COOCCURRENCE_BLOCK_SIZE, len(wordIds)))
+            incidence[docs[start:stop] - block * COOCCURRENCE_BLOCK_SIZE, columns[start:stop]] = 1
+            cooccurrences += incidence.T @ incidence
+        return cooccurrences
@@ -0,0 +1,283 @@
+"""
+Usage:      python3 queryServer.py [model].json|[model].model|[directory] ... [--port 8000] [--cache-size 1024]
+
+A query service for the annotated-text UI. Models are loaded once, into the
+arrays of modelStore.Model, and answer the small queries a page needs
+without re-reading the whole model: the top words of a topic, the topic mix
+of a document, the word and topic at each location of a passage, and where
+a word appears. Answers are kept in a bounded LRU cache.
+
+ModelServer answers queries in-process. Running this file serves them as
+JSON over HTTP on localhost:
+
+    GET /models
+    GET /models/[name]/topics/[topic]?words=20
+    GET /models/[name]/documents/[document]
+    GET /models/[name]/documents/[document]/passage?start=0&stop=100
+    GET /models/[name]/words/[word]
+
+Topics and documents are numbered from 0, and a model's name is its file
+name without the extension.
+"""
+
+import argparse
+import json
+import os
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+import numpy as np
+import LDA
+import modelStore
+
+DEFAULT_PORT = 8000
+# number of answers kept in the cache
+DEFAULT_CACHE_SIZE = 1024
+# number of words returned for a topic when no number is asked for
+DEFAULT_TOPIC_WORDS = 20
+
+
+class NotFoundError(ValueError):
+    """Raised for a query about a model, topic, document or word that does not exist."""
+
+
+class LRUCache:
+    """A dictionary of at most maxSize entries that drops the least recently used
+        entry when it is full. Safe to use from several threads.
+
+    """
+
+    def __init__(self, maxSize=DEFAULT_CACHE_SIZE):
+        self.maxSize = maxSize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key, compute):
+        """Returns the entry for key, calling compute() to make it if it is missing."""
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key]
+            self.misses += 1
+        value = compute()
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxSize:
+                self.entries.popitem(last=False)
+        return value
+
+
+class ServedModel:
+    """A loaded model and the per-model tables its queries share."""
+
+    def __init__(self, model):
+        self.model = model
+        self.vocab = model.vocab
+        self.wordIds = {word: i for i, word in enumerate(self.vocab)}
+        self.topicWordCounts = np.asarray(model.topicWordCounts)
+        self.topicCounts = self.topicWordCounts.sum(axis=0)
+        self.docTopicCounts = model.docTopicCounts()
+        self.docOffsets = np.asarray(model.array('docOffsets'))
+
+
+class ModelServer:
+    """Answers queries about several models at once. Every answer is a dictionary
+        that can be written as JSON. Queries about unknown models, topics,
+        documents or words raise NotFoundError, and queries with other invalid
+        arguments raise ValueError.
+
+    """
+
+    def __init__(self, cacheSize=DEFAULT_CACHE_SIZE):
+        self.models = {}
+        self.cache = LRUCache(cacheSize)
+
+    def addModel(self, path, name=None):
+        """Loads a .json model or .model directory, to be queried by name.
+
+        Args:
+            path (str): The model to load.
+            name (str): The name to query it by. Defaults to the file name without
+                its extension.
+
+        Returns:
+            str: The model's name.
+
+        """
+        if name is None:
+            name = os.path.splitext(os.path.basename(path.rstrip(os.sep)))[0]
+        self.models[name] = ServedModel(modelStore.loadModel(path))
+        return name
+
+    def _served(self, name):
+        if name not in self.models:
+            raise NotFoundError("no model named " + str(name))
+        return self.models[name]
+
+    def _cached(self, name, query, args, compute):
+        return self.cache.get((name, query) + args, compute)
+
+    def listModels(self):
+        """Returns the name, settings and size of every model."""
+        return {'models': [dict({key: value for key, value in served.model.meta.items()
+                                 if key in ('dataset', 'topics', 'iterations', 'alpha', 'beta')},
+                                name=name, documents=served.model.numDocs)
+                           for name, served in self.models.items()]}
+
+    def topicWords(self, name, topic, numWords=DEFAULT_TOPIC_WORDS):
+        """Returns the most common words of a topic, with the count and percentage
+            of the topic each makes up, most common first.
+
+        """
+        served = self._served(name)
+        if not 0 <= topic < len(served.topicCounts):
+            raise NotFoundError("model " + name + " has no topic " + str(topic))
+        if numWords < 1:
+            raise ValueError("the number of words must be at least 1, not " + str(numWords))
+
+        def compute():
+            counts = served.topicWordCounts[:, topic:topic + 1]
+            wordIds = LDA.topWordIds(counts, numWords)[0]
+            total = int(served.topicCounts[topic])
+            return {'topic': topic,
+                    'words': total,
+                    'top words': [{'word': served.vocab[w], 'count': int(counts[w, 0]),
+                                   'percentage': int(counts[w, 0]) / total * 100} for w in wordIds]}
+        return self._cached(name, 'topic', (topic, numWords), compute)
+
+    def documentTopics(self, name, doc):
+        """Returns how many of a document's words are in each topic, and its topic
+            distribution smoothed by the model's alpha.
+
+        """
+        served = self._served(name)
+        if not 0 <= doc < len(served.docTopicCounts):
+            raise NotFoundError("model " + name + " has no document " + str(doc))
+
+        def compute():
+            counts = served.docTopicCounts[doc]
+            alpha = served.model.meta['alpha']
+            distribution = (counts + alpha) / (counts.sum() + len(counts) * alpha)
+            return {'document': doc, 'counts': counts.tolist(), 'distribution': distribution.tolist()}
+        return self._cached(name, 'document', (doc,), compute)
+
+    def passageTopics(self, name, doc, start=0, stop=None):
+        """Returns the word and topic at each location of a passage of a document,
+            stopwords included. Stopwords have topic -1.
+
+        Args:
+            name (str): The model's name.
+            doc (int): The document.
+            start (int): The first location of the passage within the document.
+            stop (int): The location after the passage. None runs to the end of the document.
+
+        """
+        served = self._served(name)
+        if not 0 <= doc < len(served.docTopicCounts):
+            raise NotFoundError("model " + name + " has no document " + str(doc))
+        docStart, docStop = int(served.docOffsets[doc]), int(served.docOffsets[doc + 1])
+        start, stop, _ = slice(start, stop).indices(docStop - docStart)
+
+        def compute():
+            locations = slice(docStart + start, docStart + max(start, stop))
+            vocab = served.vocab
+            return {'document': doc, 'start': start,
+                    'words': [vocab[w] for w in served.model.array('tokenIds')[locations].tolist()],
+                    'topics': served.model.array('topicIds')[locations].tolist()}
+        return self._cached(name, 'passage', (doc, start, stop), compute)
+
+    def wordLocations(self, name, word):
+        """Returns every document a word appears in, with its locations in each."""
+        served = self._served(name)
+        wordId = served.wordIds.get(word.lower())
+        if wordId is None:
+            raise NotFoundError("model " + name + " has no word " + str(word))
+
+        def compute():
+            docs, positions = served.model.postings().locations(wordId)
+            docs = np.asarray(docs)
+            positions = np.asarray(positions).tolist()
+            starts = np.flatnonzero(np.concatenate(([True], docs[1:] != docs[:-1]))).tolist() if len(docs) else []
+            return {'word': served.vocab[wordId],
+                    'documents': [{'document': int(docs[first]), 'locations': positions[first:last]}
+                                  for first, last in zip(starts, starts[1:] + [len(docs)])]}
+        return self._cached(name, 'word', (wordId,), compute)
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+    """Serves the queries of a ModelServer, given as the server's modelServer, over HTTP."""
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        parts = [unquote(part) for part in url.path.strip('/').split('/')]
+        options = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        server = self.server.modelServer
+        try:
+            if parts == ['models']:
+                answer = server.listModels()
+            elif len(parts) == 4 and parts[0] == 'models' and parts[2] == 'topics':
+                answer = server.topicWords(parts[1], int(parts[3]), int(options.get('words', DEFAULT_TOPIC_WORDS)))
+            elif len(parts) == 4 and parts[0] == 'models' and parts[2] == 'documents':
+                answer = server.documentTopics(parts[1], int(parts[3]))
+            elif len(parts) == 5 and parts[0] == 'models' and parts[2] == 'documents' and parts[4] == 'passage':
+                stop = options.get('stop')
+                answer = server.passageTopics(parts[1], int(parts[3]), int(options.get('start', 0)),
+                                              None if stop is None else int(stop))
+            elif len(parts) == 4 and parts[0] == 'models' and parts[2] == 'words':
+                answer = server.wordLocations(parts[1], parts[3])
+            else:
+                self.reply(404, {'error': "unknown query " + url.path})
+                return
+        except NotFoundError as error:
+            self.reply(404, {'error': str(error)})
+            return
+        except ValueError as error:
+            # a number that does not parse or is out of range
+            self.reply(400, {'error': str(error)})
+            return
+        self.reply(200, answer)
+
+    def reply(self, status, answer):
+        body = json.dumps(answer).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(modelServer, port=DEFAULT_PORT):
+    """Serves a ModelServer's queries on localhost until interrupted."""
+    httpServer = ThreadingHTTPServer(('127.0.0.1', port), QueryHandler)
+    httpServer.modelServer = modelServer
+    print("Serving " + ", ".join(modelServer.models) + " on http://127.0.0.1:" + str(httpServer.server_port))
+    try:
+        httpServer.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpServer.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serves queries about trained LDA models on localhost.")
+    parser.add_argument('paths', nargs='+', help=".json models, .model directories or directories holding them")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help="port to listen on")
+    parser.add_argument('--cache-size', type=int, default=DEFAULT_CACHE_SIZE, help="number of answers to cache")
+    args = parser.parse_args()
+
+    modelServer = ModelServer(args.cache_size)
+    for path in modelStore.modelPaths(args.paths):
+        modelServer.addModel(path)
+    serve(modelServer, args.port)
+
+if __name__ == "__main__":
+    main()
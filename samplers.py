@@ -0,0 +1,348 @@
+"""
+Sampling engines used by runLDA. Each engine resamples the topic of every
+token in a CorpusData once per sweep and keeps tokenTopics, n_wt, n_dt and
+n_t consistent with each other.
+"""
+
+import numpy as np
+
+# most tokens whose conditionals are computed together in one array operation
+DEFAULT_BLOCK_SIZE = 256
+
+
+def tokenDocIndex(docOffsets):
+    """Expands document offsets into the index of the document owning each token.
+
+    Args:
+        docOffsets (numpy.ndarray): Offsets such that document d owns tokens
+            docOffsets[d] to docOffsets[d + 1].
+
+    Returns:
+        numpy.ndarray: An int32 array with one document index per token.
+
+    """
+    return np.repeat(np.arange(len(docOffsets) - 1, dtype=np.int32), np.diff(docOffsets))
+
+
+def blockSchedule(docOffsets, blockSize=DEFAULT_BLOCK_SIZE, tokenDocs=None, stripeLength=None):
+    """Orders the tokens of a corpus into blocks that are resampled together. Each
+        document is cut into stripes of consecutive tokens, and a block takes the
+        next stripe of every document in turn, so a block holds at most one
+        stripe of each document. By default every document is cut into the same
+        number of stripes, the fewest for which one stripe of every document
+        fits in blockSize tokens, so the blocks stay close to blockSize tokens
+        whatever the lengths of the documents. A corpus of blockSize or more
+        documents gets stripes of one token: its blocks hold one token of each
+        of blockSize documents.
+
+    Args:
+        docOffsets (numpy.ndarray): Offsets such that document d owns tokens
+            docOffsets[d] to docOffsets[d + 1].
+        blockSize (int): The most tokens in a block. 1 keeps the corpus order.
+        tokenDocs (numpy.ndarray): The result of tokenDocIndex for these offsets, if
+            the caller has already computed it.
+        stripeLength (int): The length of every stripe, or None to cut every
+            document into the same number of stripes.
+
+    Returns:
+        (numpy.ndarray, [int]): The tokens in the order they are sampled, and the
+            start of each block in that order followed by the number of tokens.
+
+    """
+    numTokens = int(docOffsets[-1])
+    positions = np.arange(numTokens)
+    if blockSize <= 1:
+        return positions, list(range(numTokens + 1))
+    if tokenDocs is None:
+        tokenDocs = tokenDocIndex(docOffsets)
+    docLengths = np.diff(docOffsets)
+    numDocs = np.count_nonzero(docLengths)
+    if stripeLength is None and numDocs < blockSize:
+        # rounding each stripe up adds less than a token per document to a block
+        numStripes = -(-numTokens // (blockSize - numDocs))
+        stripeLength = (-(-docLengths // numStripes))[tokenDocs]
+    elif stripeLength is None:
+        stripeLength = 1
+    ranks = positions - docOffsets[tokenDocs]
+    rounds = ranks // stripeLength
+    order = np.lexsort((ranks, tokenDocs, rounds))
+    # a block starts with every round of stripes and after every blockSize tokens of a round
+    roundStarts = np.ones(numTokens, dtype=bool)
+    roundStarts[1:] = np.diff(rounds[order]) != 0
+    roundPositions = positions - np.maximum.accumulate(np.where(roundStarts, positions, 0))
+    return order, np.flatnonzero(roundPositions % blockSize == 0).tolist() + [numTokens]
+
+
+def drawTopics(probabilities, uniforms):
+    """Draws one topic per row of unnormalized probabilities by inverting the
+        cumulative sum of the row.
+
+    Args:
+        probabilities (numpy.ndarray): A (tokens x topics) array of unnormalized
+            probabilities.
+        uniforms (numpy.ndarray): One uniform number in [0, 1) per row.
+
+    Returns:
+        numpy.ndarray: The index of the chosen topic for each row.
+
+    """
+    cdf = np.cumsum(probabilities, axis=1)
+    targets = uniforms * cdf[:, -1]
+    return (cdf < targets[:, None]).sum(axis=1)
+
+
+def moveTokens(corpus, words, docs, oldTopics, newTopics):
+    """Reassigns a block of tokens and updates the count matrices to match, then
+        reports the moves to corpus.moveListener if it is set.
+
+    Args:
+        corpus (CorpusData): The corpus the tokens belong to.
+        words (numpy.ndarray): The word id of each token.
+        docs (numpy.ndarray): The document of each token.
+        oldTopics (numpy.ndarray): The tokens' current topics, which are updated in place.
+        newTopics (numpy.ndarray): The topic each token should be moved to.
+
+    """
+    moved = np.flatnonzero(newTopics != oldTopics)
+    if len(moved):
+        fromTopics = oldTopics[moved]
+        toTopics = newTopics[moved]
+        # ufunc.at is several times faster given an array of the target's type than a scalar
+        ones = np.ones(len(moved), dtype=corpus.n_wt.dtype)
+        np.subtract.at(corpus.n_wt, (words[moved], fromTopics), ones)
+        np.add.at(corpus.n_wt, (words[moved], toTopics), ones)
+        ones = np.ones(len(moved), dtype=corpus.n_dt.dtype)
+        np.subtract.at(corpus.n_dt, (docs[moved], fromTopics), ones)
+        np.add.at(corpus.n_dt, (docs[moved], toTopics), ones)
+        corpus.n_t -= np.bincount(fromTopics, minlength=corpus.numTopics)
+        corpus.n_t += np.bincount(toTopics, minlength=corpus.numTopics)
+        oldTopics[moved] = toTopics
+        if corpus.moveListener is not None:
+            corpus.moveListener(corpus, words[moved], docs[moved], fromTopics, toTopics)
+
+
+def gibbsSweep(corpus, alpha, beta, rng, blockSize=DEFAULT_BLOCK_SIZE, tokenDocs=None, schedule=None):
+    """Performs one sweep of collapsed Gibbs sampling over every token in the corpus.
+        Tokens are taken in the blocks of blockSchedule; every token in a block
+        sees the counts as they were at the start of the block minus its own
+        assignment, and the counts are brought up to date before the next block.
+        The approximation is that a token misses the moves of the other tokens in
+        its block: at most blockSize tokens for the word and topic counts, and at
+        most the stripe length of the schedule for its document's counts. A
+        blockSize of 1 is exact sequential Gibbs sampling, while larger blocks
+        need far fewer Python-level operations.
+
+    Args:
+        corpus (CorpusData): A data structure that has already called "loadData"
+            on a text.
+        alpha (float): Smoothing constant for the P(t|d) term.
+        beta (float): Smoothing constant for the P(w|t) term.
+        rng (numpy.random.Generator): Source of the uniforms for this sweep, which
+            are all drawn up front.
+        blockSize (int): The most tokens resampled together.
+        tokenDocs (numpy.ndarray): The result of tokenDocIndex for this corpus, if
+            the caller has already computed it.
+        schedule ((numpy.ndarray, [int])): The result of blockSchedule for this
+            corpus and blockSize, if the caller has already computed it.
+
+    """
+    if tokenDocs is None:
+        tokenDocs = tokenDocIndex(corpus.docOffsets)
+    if schedule is None:
+        schedule = blockSchedule(corpus.docOffsets, blockSize, tokenDocs)
+    order, blockStarts = schedule
+    n_wt, n_dt, n_t = corpus.n_wt, corpus.n_dt, corpus.n_t
+    uniforms = rng.random(len(order))
+    for start, stop in zip(blockStarts[:-1], blockStarts[1:]):
+        tokens = order[start:stop]
+        words = corpus.tokenIds[tokens]
+        docs = tokenDocs[tokens]
+        oldTopics = corpus.tokenTopics[tokens]
+        rows = np.arange(stop - start)
+
+        # P(t|w,d) up to a constant, then each token taken out of the counts of its own topic
+        probabilities = n_wt[words] + beta
+        probabilities *= n_dt[docs] + alpha
+        probabilities /= n_t + beta
+        probabilities[rows, oldTopics] = ((n_wt[words, oldTopics] - 1 + beta) * (n_dt[docs, oldTopics] - 1 + alpha)
+                                          / (n_t[oldTopics] - 1 + beta))
+
+        newTopics = drawTopics(probabilities, uniforms[start:stop])
+
+        moveTokens(corpus, words, docs, oldTopics, newTopics)
+        corpus.tokenTopics[tokens] = oldTopics
+
+
+# number of word-proposal/doc-proposal cycles mhSweep runs for each token
+DEFAULT_MH_STEPS = 2
+
+
+class WordProposal:
+    """A snapshot of the word-topic counts that mhSweep draws word proposals from.
+        The proposal for word w is q_w(t) ~ (n_wt + beta) / (n_t + beta), split into a
+        sparse bucket over the topics w is currently assigned to and a smoothing
+        bucket shared by every word. The counts are taken from the tokens being
+        sampled rather than from n_wt, so building the tables costs a sort of the
+        tokens instead of a pass over every cell of n_wt. Both buckets are stored
+        as cumulative tables, so a draw is a binary search whose cost does not
+        grow with the number of topics.
+
+    """
+
+    def __init__(self, tokenIds, tokenTopics, n_t, beta):
+        """Builds the proposal tables from the current topics of a run of tokens.
+
+        Args:
+            tokenIds (numpy.ndarray): The word id of each token.
+            tokenTopics (numpy.ndarray): The topic of each token.
+            n_t (numpy.ndarray): The topic count vector.
+            beta (float): Smoothing constant for the P(w|t) term.
+
+        """
+        self.beta = beta
+        self.numTopics = len(n_t)
+        self.topicDenominators = n_t + beta
+        # sparse bucket: the (word, topic) pairs of the tokens, sorted by word and
+        # then topic, with the number of tokens of each
+        keys = tokenIds.astype(np.int64) * self.numTopics + tokenTopics
+        self.keys, self.counts = np.unique(keys, return_counts=True)
+        self.topics = self.keys % self.numTopics
+        numWords = int(tokenIds.max()) + 1 if len(tokenIds) else 0
+        self.rowStarts = np.searchsorted(self.keys, np.arange(numWords + 1, dtype=np.int64) * self.numTopics)
+        weights = self.counts / self.topicDenominators[self.topics]
+        self.sparseCumulative = np.concatenate(([0.0], np.cumsum(weights)))
+        # smoothing bucket
+        self.smoothingCumulative = np.cumsum(beta / self.topicDenominators)
+
+    def draw(self, words, bucketUniforms, topicUniforms):
+        """Draws one proposed topic for each given word.
+
+        Args:
+            words (numpy.ndarray): The word ids to draw proposals for, which must be
+                words of the tokens the proposal was built from.
+            bucketUniforms (numpy.ndarray): Uniforms that choose between the buckets.
+            topicUniforms (numpy.ndarray): Uniforms that choose a topic within the bucket.
+
+        Returns:
+            numpy.ndarray: The proposed topic for each word.
+
+        """
+        starts = self.rowStarts[words]
+        ends = self.rowStarts[words + 1]
+        lower = self.sparseCumulative[starts]
+        sparseMass = self.sparseCumulative[ends] - lower
+        smoothingMass = self.smoothingCumulative[-1]
+        inSparse = bucketUniforms * (sparseMass + smoothingMass) < sparseMass
+
+        entries = np.searchsorted(self.sparseCumulative, lower + topicUniforms * sparseMass, side='right') - 1
+        entries = np.clip(entries, starts, np.maximum(ends - 1, starts))
+        sparseTopics = self.topics[np.minimum(entries, len(self.topics) - 1)]
+        smoothingTopics = np.searchsorted(self.smoothingCumulative, topicUniforms * smoothingMass, side='right')
+        smoothingTopics = np.minimum(smoothingTopics, len(self.smoothingCumulative) - 1)
+        return np.where(inSparse, sparseTopics, smoothingTopics)
+
+    def weight(self, words, topics):
+        """Returns the unnormalized proposal probability of each (word, topic) pair."""
+        keys = words.astype(np.int64) * self.numTopics + topics
+        entries = np.minimum(np.searchsorted(self.keys, keys), len(self.keys) - 1)
+        counts = np.where(self.keys[entries] == keys, self.counts[entries], 0)
+        return (counts + self.beta) / self.topicDenominators[topics]
+
+
+def mhSweep(corpus, alpha, beta, rng, blockSize=DEFAULT_BLOCK_SIZE, tokenDocs=None, schedule=None,
+            steps=DEFAULT_MH_STEPS):
+    """Performs one sweep of Metropolis-Hastings sampling in the style of LightLDA
+        over every token in the corpus. Each step proposes a topic from the word
+        proposal and then from the document proposal, and accepts or rejects each
+        against the same conditional gibbsSweep samples from. The word proposal
+        tables are built once per sweep from the tokens being sampled, and every
+        word proposal of the sweep is drawn from them up front; the document
+        proposal picks the topic of a random token in the same document. No step
+        looks at more than one topic of a token at a time, so the cost per token
+        does not depend on the number of topics. Tokens are taken in the blocks
+        of blockSchedule, as in gibbsSweep.
+
+    Args:
+        corpus (CorpusData): A data structure that has already called "loadData"
+            on a text.
+        alpha (float): Smoothing constant for the P(t|d) term.
+        beta (float): Smoothing constant for the P(w|t) term.
+        rng (numpy.random.Generator): Source of randomness for this sweep.
+        blockSize (int): The most tokens resampled together.
+        tokenDocs (numpy.ndarray): The result of tokenDocIndex for this corpus, if
+            the caller has already computed it.
+        schedule ((numpy.ndarray, [int])): The result of blockSchedule for this
+            corpus and blockSize, if the caller has already computed it.
+        steps (int): The number of word/document proposal cycles per token.
+
+    """
+    if tokenDocs is None:
+        tokenDocs = tokenDocIndex(corpus.docOffsets)
+    if schedule is None:
+        schedule = blockSchedule(corpus.docOffsets, blockSize, tokenDocs)
+    order, blockStarts = schedule
+    numTopics = corpus.numTopics
+    n_wt, n_dt, n_t = corpus.n_wt, corpus.n_dt, corpus.n_t
+    docOffsets = corpus.docOffsets
+    docSmoothing = numTopics * alpha
+
+    # the word proposal is fixed for the sweep, so every word proposal and its
+    # weight are drawn at once, along with the weight of each token's topic
+    allWords = corpus.tokenIds[order]
+    allTopics = corpus.tokenTopics[order]
+    proposal = WordProposal(allWords, allTopics, n_t, beta)
+    uniforms = rng.random((5 * steps, len(order)))
+    wordProposals = [proposal.draw(allWords, uniforms[5 * step], uniforms[5 * step + 1]) for step in range(steps)]
+    proposalWeights = [proposal.weight(allWords, proposed) for proposed in wordProposals]
+    allWeights = proposal.weight(allWords, allTopics)
+    del allTopics
+
+    def conditional(words, docs, topics, oldTopics):
+        # P(t|w,d) up to a constant, with each token taken out of the counts
+        own = topics == oldTopics
+        return ((n_wt[words, topics] - own + beta) * (n_dt[docs, topics] - own + alpha)
+                / (n_t[topics] - own + beta))
+
+    for start, stop in zip(blockStarts[:-1], blockStarts[1:]):
+        tokens = order[start:stop]
+        words = allWords[start:stop]
+        docs = tokenDocs[tokens]
+        oldTopics = corpus.tokenTopics[tokens]
+        docStarts = docOffsets[docs]
+        docStops = docOffsets[docs + 1]
+        docLengths = docStops - docStarts
+
+        topics = oldTopics.copy()
+        current = conditional(words, docs, topics, oldTopics)
+        currentWeights = allWeights[start:stop]
+        for step in range(steps):
+            u = uniforms[5 * step:5 * step + 5, start:stop]
+
+            # word proposal
+            proposed = wordProposals[step][start:stop]
+            proposedWeights = proposalWeights[step][start:stop]
+            target = conditional(words, docs, proposed, oldTopics)
+            accepted = u[2] * current * proposedWeights < target * currentWeights
+            topics = np.where(accepted, proposed, topics)
+            current = np.where(accepted, target, current)
+
+            # document proposal: the topic of a random token in the document, or a
+            # uniformly random topic with probability proportional to numTopics * alpha
+            position = u[3] * (docLengths + docSmoothing)
+            fromDoc = position < docLengths
+            tokenTopics = corpus.tokenTopics[np.minimum(docStarts + position.astype(np.int64), docStops - 1)]
+            uniformTopics = np.minimum(((position - docLengths) / alpha).astype(np.int64), numTopics - 1)
+            proposed = np.where(fromDoc, tokenTopics, np.maximum(uniformTopics, 0))
+            target = conditional(words, docs, proposed, oldTopics)
+            accepted = u[4] * current * (n_dt[docs, proposed] + alpha) < target * (n_dt[docs, topics] + alpha)
+            topics = np.where(accepted, proposed, topics)
+            current = np.where(accepted, target, current)
+            if step + 1 < steps:
+                currentWeights = proposal.weight(words, topics)
+
+        moveTokens(corpus, words, docs, oldTopics, topics)
+        corpus.tokenTopics[tokens] = oldTopics
+
+
+# sampling engines that runLDA can be asked to use, keyed by their name in config.json
+SWEEPS = {'gibbs': gibbsSweep, 'mh': mhSweep}
@@ -0,0 +1,130 @@
+"""
+Usage:      python3 sweep.py [config file name].json
+
+Runs a grid of LDA models over one corpus. The config file is laid out like
+the one LDA.py reads, with an extra "sweep" section listing the values to
+try for any of "iterations", "topics", "alpha", "beta" and "stopword
+options"; settings that are not listed there are taken from the rest of the
+config. The source text is read and chunked once, streamed straight into
+a corpus with no stopwords, and the corpus of each stopword configuration
+is built from that one without reading the text again. The models are then
+sampled in parallel, one per process. Each model is written with the name
+[output name]-[iterations]-[topics]-[alpha]-[beta] (followed by
+-stopwords[n] when several stopword configurations are swept), and
+[output name]-sweep.json lists every model with its settings.
+"""
+
+import contextlib
+import itertools
+import json
+import os
+import sys
+import time
+from multiprocessing import Pool
+import LDA
+import samplers
+
+# the loaded corpora shared with the worker processes, set by _setCorpora
+_corpora = {}
+
+
+def _setCorpora(corpora):
+    """Pool initializer: keeps one copy of the loaded corpora in this worker."""
+    _corpora.update(corpora)
+
+
+def _runModel(task):
+    """Samples and writes one model of the sweep, silencing its progress bar."""
+    index, run, source, puncData, samplerOptions, outputFormat, summaryWords = task
+    startTime = time.perf_counter()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        corpus = _corpora[run['stopword set']].withTopics(run['topics'])
+        LDA.runLDA(corpus, run['iterations'], run['alpha'], run['beta'], samplerOptions['seed'],
+                   samplerOptions['block size'], samplerOptions['sampler'])
+        LDA.writeOutputs(corpus, source, run['topics'], run['iterations'], run['alpha'], run['beta'],
+                         run['output name'], puncData, outputFormat, summaryWords)
+    return index, time.perf_counter() - startTime
+
+
+def gridRuns(config):
+    """Lists the runs of a sweep.
+
+    Args:
+        config (dict): The sweep's config file.
+
+    Returns:
+        ([dict], [dict]): The stopword configurations to load, and one dictionary
+            per run holding its output name, iterations, topics, alpha, beta and
+            the index of its stopword configuration.
+
+    """
+    grid = config["sweep"]
+    required = config["required parameters"]
+    hyperparameters = config["hyperparameters"]
+    stopwordSets = grid.get("stopword options", [config["stopword options"]])
+    runs = []
+    for iterations, topics, alpha, beta, stopwordSet in itertools.product(
+            grid.get("iterations", [required["iterations"]]),
+            grid.get("topics", [required["topics"]]),
+            grid.get("alpha", [hyperparameters["alpha"]]),
+            grid.get("beta", [hyperparameters["beta"]]),
+            range(len(stopwordSets))):
+        outputname = "-".join(str(value) for value in (required["output name"], iterations, topics, alpha, beta))
+        if len(stopwordSets) > 1:
+            outputname += "-stopwords" + str(stopwordSet + 1)
+        runs.append({'output name': outputname, 'iterations': iterations, 'topics': topics,
+                     'alpha': alpha, 'beta': beta, 'stopword set': stopwordSet})
+    return stopwordSets, runs
+
+
+def main():
+    """Runs the sweep described by the config file named on the command line."""
+    if len(sys.argv) < 2:
+        print("Usage: python3 sweep.py [config file name].json")
+        exit()
+    with open(sys.argv[1], 'r') as configFile:
+        config = json.load(configFile)
+    if "sweep" not in config:
+        print("The config file has no sweep section.\n")
+        exit()
+    samplerOptions = config.get("sampler options", {})
+    samplerOptions = {'seed': None if samplerOptions.get("seed", "off") == "off" else samplerOptions["seed"],
+                      'block size': samplerOptions.get("block size", samplers.DEFAULT_BLOCK_SIZE),
+                      'sampler': samplerOptions.get("sampler", "gibbs")}
+    if samplerOptions['sampler'] not in samplers.SWEEPS:
+        print("Invalid sampler given.\n")
+        exit()
+    outputFormat = config.get("output options", {}).get("format", "json")
+    if outputFormat not in ("json", "binary", "both"):
+        print("Invalid output format given.\n")
+        exit()
+    summaryWords = LDA.summaryOption(config)
+    stopwordSets, runs = gridRuns(config)
+    processes = min(config["sweep"].get("processes", os.cpu_count() or 1), len(runs))
+
+    chunkType, chunkParam = LDA.chunkOption(config["chunking options"])
+    writeCsv = config.get("output options", {}).get("chunked csv", "on") != "off"
+    allWords, source, puncData = LDA.loadCorpus(config["required parameters"]["source"], 1, chunkType, chunkParam,
+                                                "off", "off", [], [], writeCsv)
+    corpora = {index: allWords.withStopwords(stopwordOptions["lower limit"], stopwordOptions["upper limit"],
+                                             stopwordOptions["whitelist"], stopwordOptions["blacklist"])
+               for index, stopwordOptions in enumerate(stopwordSets)}
+    del allWords
+
+    print("Running " + str(len(runs)) + " models in " + str(processes) + " processes")
+    startTime = time.perf_counter()
+    tasks = [(index, run, source, puncData, samplerOptions, outputFormat, summaryWords)
+             for index, run in enumerate(runs)]
+    with Pool(processes, initializer=_setCorpora, initargs=(corpora,)) as pool:
+        for index, seconds in pool.imap_unordered(_runModel, tasks):
+            runs[index]['seconds'] = seconds
+            print("Finished " + runs[index]['output name'] + " in " + str(round(seconds, 1)) + "s")
+    print("Sweep finished in " + str(round(time.perf_counter() - startTime, 1)) + "s")
+
+    for run in runs:
+        run['stopword options'] = stopwordSets[run.pop('stopword set')]
+    with open(config["required parameters"]["output name"] + "-sweep.json", 'w') as outfile:
+        json.dump(runs, outfile, indent=4)
+
+if __name__ == "__main__":
+    main()
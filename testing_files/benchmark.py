@@ -0,0 +1,249 @@
+"""
+Usage:      python3 benchmark.py [--sizes 10000 50000 ...] [--topics 10 50 ...] [--iterations N]
+                                 [--output results.json] [--baseline baseline.json] [--threshold 0.1]
+
+Times each stage of LDA.py on synthetic corpora of increasing size and on the
+committed wiki5Docs.csv and tinytest.csv. Every corpus is run in a fresh
+process so that its peak memory is its own. The results are written as
+JSON: wall and CPU time for each stage, tokens sampled per second, peak
+resident memory and, for the synthetic corpora, how each stage scales with
+the number of tokens. Given a baseline (a results file from an earlier
+version), stages that got slower by more than the threshold are reported
+and the script exits with status 1.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import math
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import sys
+import tempfile
+import time
+import numpy as np
+
+TESTING_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(TESTING_DIR))
+import LDA
+
+STAGES = ('txtToCsv', 'grabPuncAndCap', 'loadData', 'runLDA', 'createAnnoTextDataStructure', 'encodeData',
+          'outputAsCSV')
+COMMITTED_CORPORA = ('wiki5Docs.csv', 'tinytest.csv')
+# timings shorter than this are too noisy to count as regressions
+MIN_COMPARED_SECONDS = 0.01
+
+
+def peakMemory():
+    """Returns the peak resident memory of this process so far, in bytes."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def syntheticText(fileName, numTokens, numDocs, vocabSize, numTopics, seed):
+    """Writes a .txt corpus drawn from the LDA generative model, with some
+        capitalized words, punctuation and line breaks so every stage has work to do.
+
+    """
+    rng = np.random.default_rng(seed)
+    letters = np.array(list('abcdefghilmnopqrstuvx'))
+    vocab = np.array([''.join(rng.choice(letters, rng.integers(2, 10))) + str(i) for i in range(vocabSize)])
+    # Zipf-like background so word frequencies look like a natural language
+    background = 1.0 / np.arange(1, vocabSize + 1)
+    topicWords = rng.dirichlet(np.full(vocabSize, 0.05), numTopics) * 0.5 + background / background.sum() * 0.5
+    topicCdfs = np.cumsum(topicWords, axis=1)
+    docTopics = rng.dirichlet(np.full(numTopics, 0.3), numDocs)
+    docs = np.minimum(np.arange(numTokens) * numDocs // numTokens, numDocs - 1)
+    topics = (np.cumsum(docTopics, axis=1)[docs] < rng.random(numTokens)[:, None]).sum(axis=1)
+    topics = np.minimum(topics, numTopics - 1)
+    words = np.empty(numTokens, dtype=np.int64)
+    for topic in range(numTopics):
+        tokens = np.flatnonzero(topics == topic)
+        words[tokens] = np.searchsorted(topicCdfs[topic], rng.random(len(tokens)) * topicCdfs[topic, -1])
+    tokens = vocab[np.minimum(words, vocabSize - 1)].astype(object)
+    capitalized = rng.random(numTokens) < 0.05
+    tokens[capitalized] = [token.capitalize() for token in tokens[capitalized]]
+    punctuated = rng.random(numTokens) < 0.08
+    tokens[punctuated] = [token + '.' for token in tokens[punctuated]]
+    separators = np.where(rng.random(numTokens) < 0.08, '\n', ' ').astype(object)
+    separators[-1] = '\n'
+    with open(fileName, 'w') as outfile:
+        outfile.write(''.join((tokens + separators).tolist()))
+
+
+def timeStage(stages, name, function):
+    """Runs function with its output silenced and records its wall and CPU time in stages."""
+    wallStart, cpuStart = time.perf_counter(), time.process_time()
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = function()
+    stages[name] = {'wall': time.perf_counter() - wallStart,
+                    'cpu': time.process_time() - cpuStart,
+                    'peak memory': peakMemory()}
+    return result
+
+
+def runCase(case):
+    """Runs every stage on one corpus. Called in a fresh worker process.
+
+    Args:
+        case (dict): The corpus file, and the topics, iterations and chunking
+            to run it with.
+
+    Returns:
+        dict: The case with its stage timings, throughput and peak memory added.
+
+    """
+    os.chdir(os.path.dirname(case['file']))
+    source = case['file']
+    stages = {}
+    if source.endswith('.txt'):
+        chunkString = LDA.makeChunkString('length of documents', case['document length'])
+        timeStage(stages, 'txtToCsv', lambda: LDA.txtToCsv(source, chunkString))
+        puncData = timeStage(stages, 'grabPuncAndCap', lambda: LDA.grabPuncAndCap(source))
+        source = source[:-4] + '.csv'
+    else:
+        puncData = [[], [], []]
+    corpus = LDA.CorpusData(source, case['topics'])
+    timeStage(stages, 'loadData', lambda: corpus.loadData('off', 'off', [], []))
+    timeStage(stages, 'runLDA', lambda: LDA.runLDA(corpus, case['iterations'], 0.1, 0.1, seed=0))
+    timeStage(stages, 'createAnnoTextDataStructure', corpus.createAnnoTextDataStructure)
+    outputname = os.path.join(os.path.dirname(source), 'benchmark-output')
+    timeStage(stages, 'encodeData', lambda: corpus.encodeData(source, case['topics'], case['iterations'],
+                                                                0.1, 0.1, outputname, puncData))
+    timeStage(stages, 'outputAsCSV', lambda: corpus.outputAsCSV(outputname))
+
+    sweepSeconds = stages['runLDA']['wall'] / case['iterations']
+    return dict(case,
+                file=os.path.basename(case['file']),
+                tokens=len(corpus.tokenIds),
+                documents=corpus.numDocs,
+                vocabulary=len(corpus.vocab),
+                stages=stages,
+                **{'seconds per sweep': sweepSeconds,
+                   'tokens per second': len(corpus.tokenIds) / sweepSeconds if sweepSeconds else None,
+                   'peak memory': peakMemory()})
+
+
+def runIsolated(case):
+    """Runs one case in a new process so its peak memory is measured on its own."""
+    with multiprocessing.get_context('spawn').Pool(1) as pool:
+        return pool.apply(runCase, (case,))
+
+
+def scalingExponents(results):
+    """Fits time = c * tokens ** k for each stage over each series of synthetic
+        corpora with the same number of topics, and returns k for each stage.
+
+    """
+    series = {}
+    for result in results:
+        if result.get('synthetic'):
+            series.setdefault(result['topics'], []).append(result)
+    scaling = {}
+    for topics, seriesResults in sorted(series.items()):
+        if len(seriesResults) < 2:
+            continue
+        tokens = np.log([result['tokens'] for result in seriesResults])
+        exponents = {}
+        for stage in STAGES:
+            seconds = [result['stages'][stage]['wall'] for result in seriesResults if stage in result['stages']]
+            if len(seconds) == len(seriesResults) and min(seconds) > 0:
+                exponents[stage] = float(np.polyfit(tokens, np.log(seconds), 1)[0])
+        scaling[str(topics) + ' topics'] = {
+            'tokens': [result['tokens'] for result in seriesResults],
+            'tokens per second': [result['tokens per second'] for result in seriesResults],
+            'exponents': exponents}
+    return scaling
+
+
+def compareToBaseline(results, baseline, threshold):
+    """Lists the stages that are slower than in the baseline by more than threshold.
+
+    Returns:
+        [dict]: One entry per regression, with the case, stage and both timings.
+
+    """
+    baselineCases = {case['name']: case for case in baseline['cases']}
+    regressions = []
+    for result in results:
+        old = baselineCases.get(result['name'])
+        if old is None:
+            continue
+        for stage, timing in result['stages'].items():
+            oldTiming = old['stages'].get(stage)
+            if oldTiming is None or max(oldTiming['wall'], timing['wall']) < MIN_COMPARED_SECONDS:
+                continue
+            ratio = timing['wall'] / max(oldTiming['wall'], 1e-9)
+            if ratio > 1 + threshold:
+                regressions.append({'case': result['name'], 'stage': stage, 'baseline': oldTiming['wall'],
+                                    'current': timing['wall'], 'ratio': ratio})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Times each stage of LDA.py.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 50000, 200000],
+                        help="numbers of tokens in the synthetic corpora")
+    parser.add_argument('--topics', type=int, nargs='+', default=[10, 50], help="numbers of topics to run with")
+    parser.add_argument('--iterations', type=int, default=20, help="sweeps per run")
+    parser.add_argument('--output', default='benchmark_results.json', help="file to write the results to")
+    parser.add_argument('--baseline', help="results file of an earlier version to compare against")
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help="fraction a stage may slow down by before it counts as a regression")
+    args = parser.parse_args()
+
+    workDir = tempfile.mkdtemp(prefix='lda-benchmark-')
+    try:
+        cases = []
+        for numTokens in args.sizes:
+            # documents, vocabulary and document length grow more slowly than the corpus
+            numDocs = max(5, numTokens // 500)
+            vocabSize = int(40 * math.sqrt(numTokens))
+            fileName = os.path.join(workDir, 'synthetic-' + str(numTokens) + '.txt')
+            syntheticText(fileName, numTokens, numDocs, vocabSize, max(args.topics), seed=numTokens)
+            for topics in args.topics:
+                cases.append({'name': 'synthetic-' + str(numTokens) + '-' + str(topics), 'file': fileName,
+                              'synthetic': True, 'topics': topics, 'iterations': args.iterations,
+                              'document length': numTokens // numDocs})
+        for corpusName in COMMITTED_CORPORA:
+            fileName = os.path.join(workDir, corpusName)
+            shutil.copy(os.path.join(TESTING_DIR, corpusName), fileName)
+            for topics in args.topics:
+                cases.append({'name': corpusName[:-4] + '-' + str(topics), 'file': fileName, 'synthetic': False,
+                              'topics': topics, 'iterations': args.iterations})
+
+        results = []
+        for case in cases:
+            result = runIsolated(case)
+            results.append(result)
+            print(result['name'] + ": " + str(result['tokens']) + " tokens, "
+                  + str(round(result['tokens per second'] or 0)) + " tokens/s, "
+                  + str(round(result['peak memory'] / 2 ** 20, 1)) + " MB peak")
+    finally:
+        shutil.rmtree(workDir)
+
+    report = {'python': platform.python_version(),
+              'numpy': np.__version__,
+              'machine': platform.platform(),
+              'cases': results,
+              'scaling': scalingExponents(results)}
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, 'r') as baselineFile:
+            regressions = compareToBaseline(results, json.load(baselineFile), args.threshold)
+        report['regressions'] = regressions
+        for regression in regressions:
+            print("Regression: " + regression['case'] + " " + regression['stage'] + " took "
+                  + str(round(regression['current'], 3)) + "s, baseline " + str(round(regression['baseline'], 3)) + "s")
+    with open(args.output, 'w') as outfile:
+        json.dump(report, outfile, indent=4)
+    print("Results written to " + args.output)
+    if regressions:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
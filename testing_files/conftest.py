@@ -0,0 +1,53 @@
+"""
+Shared fixtures for the tests in this folder, which run on small random
+corpora built in memory. Run them from the repository root with
+"python3 -m pytest testing_files".
+"""
+
+import os
+import sys
+import numpy as np
+import pytest
+
+TESTING_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(TESTING_DIR))
+import LDA
+
+
+def corpusRows(numDocs, vocabSize, seed):
+    """Returns (word, document) rows of a random corpus, as txtToCsv writes them.
+        Documents have different lengths and repeat their common words, so blocks
+        and partitions are uneven.
+
+    """
+    rng = np.random.default_rng(seed)
+    rows = []
+    for doc in range(numDocs):
+        words = rng.zipf(1.5, int(rng.integers(5, 60))) % vocabSize
+        rows.extend(("w" + str(word), "doc" + str(doc)) for word in words)
+    return rows
+
+
+@pytest.fixture
+def makeCorpus():
+    """Returns a function that loads a new random corpus into a CorpusData."""
+    def make(numTopics=4, numDocs=30, vocabSize=50, seed=0, stopBlacklist=()):
+        corpus = LDA.CorpusData("random.csv", numTopics)
+        corpus.loadRows(corpusRows(numDocs, vocabSize, seed), "off", "off", [], list(stopBlacklist))
+        return corpus
+    return make
+
+
+@pytest.fixture
+def checkCounts():
+    """Returns a function that checks a corpus' count matrices against a full
+        recount of its topic assignments.
+
+    """
+    def check(corpus):
+        n_wt, n_dt, n_t = corpus.n_wt.copy(), corpus.n_dt.copy(), corpus.n_t.copy()
+        corpus.countTopics()
+        assert np.array_equal(n_wt, corpus.n_wt)
+        assert np.array_equal(n_dt, corpus.n_dt)
+        assert np.array_equal(n_t, corpus.n_t)
+    return check
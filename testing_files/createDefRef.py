@@ -1,43 +1,199 @@
-##short python script to create a Latin-to-English definition reference sheet
-##takes a CSV of Latin words as input and outputs a CSV with corresponding definitions
+"""
+Usage:      python3 createDefRef.py [topics].csv [--definitions latinDefinitions.xlsx] [--words 20] [--output defRefs.csv]
 
+Creates a Latin-to-English definition reference sheet for the top words of
+every topic in a .csv written by outputAsCSV.
+
+The definitions spreadsheet (Sheet1: a header row, then a word and its
+definition in each row) is compiled once into an indexed SQLite store
+next to it, [spreadsheet name].sqlite, which is rebuilt only when the
+spreadsheet changes. Later sheets look their words up in the store, so
+no spreadsheet is read and no cells are scanned. Words are matched as they
+are, then in a normal form (lower case, u written v and j written i), and
+then without a lemma suffix, so "qvam/1" finds the entry for "quam".
+"""
+
+import argparse
 import csv
-import xlrd
-
-workbook = xlrd.open_workbook('latinDefinitions.xlsx', on_demand = True)
-worksheet = workbook.sheet_by_name('Sheet1')
-#print(worksheet.cell(1, 0))
-
-#dictionaryDict holds the location of the definitions in the latinDefinitions spreadsheet for each word
-
-def makeDefRefs(numTopics):
-    dictionaryDict = {}
-    numRows = worksheet.nrows
-    for i in range(numRows-1):
-        dictionaryDict[worksheet.cell(i+1, 0).value] = i+1
-
-    defsForCSV = []
-    with open('output.csv', newline='') as csvfile:
-        reader = csv.reader(csvfile, delimiter=' ', quotechar='|')
-        for i in range(numTopics):
-            count = 0
-            for row in reader:
-                if count < 2:
-                    count += 1
-                #get location in spreadsheet
-                else:
-                    key = row[3*i]
-                    key = key.split(',')
-                    key = key[0]
-                    print(key)
-                    defLocation = dictionaryDict[key]
-                    definition = worksheet.cell(defLocation, 1)
-                    defsForCSV.append([key, definition])
-            count = 0
-
-    with open('defRefs.csv', 'w', newline='') as csvfile:
-        filewriter = csv.writer(csvfile, delimiter=',', quotechar='|', quoting=csv.QUOTE_MINIMAL)
-        for row in defsForCSV:
-            filewriter.writerow(row)
-
-makeDefRefs(2)
\ No newline at end of file
+import os
+import sqlite3
+
+DEFAULT_DEFINITIONS = 'latinDefinitions.xlsx'
+DEFAULT_OUTPUT = 'defRefs.csv'
+# number of top words per topic given definitions
+DEFAULT_WORDS = 20
+# words looked up in one query, below SQLite's limit on query parameters
+LOOKUP_BATCH_SIZE = 500
+
+
+def normalForm(word):
+    """Returns the form words are matched in: lower case, with u written v and j written i."""
+    return word.strip().lower().replace('u', 'v').replace('j', 'i')
+
+
+def lemmaForm(word):
+    """Returns a word without its lemma suffix, such as the "/1" of "qvam/1"."""
+    return word.split('/')[0]
+
+
+def readSpreadsheet(fileName):
+    """Reads the (word, definition) rows of the definitions spreadsheet."""
+    import xlrd
+    workbook = xlrd.open_workbook(fileName, on_demand=True)
+    worksheet = workbook.sheet_by_name('Sheet1')
+    return [(str(worksheet.cell_value(row, 0)), str(worksheet.cell_value(row, 1)))
+            for row in range(1, worksheet.nrows)]
+
+
+def writeStore(storeFile, rows, sourceTime=0):
+    """Writes (word, definition) rows to a new SQLite store, indexed by word and
+        by normal form. It is written next to storeFile and renamed over it, so a
+        reader never sees it half written.
+
+    Args:
+        storeFile (str): The store to write.
+        rows ([(str, str)]): The words and their definitions.
+        sourceTime (int): The modification time of the spreadsheet, in nanoseconds,
+            kept so the store can tell when it is out of date.
+
+    """
+    temporary = storeFile + "." + str(os.getpid()) + ".tmp"
+    if os.path.exists(temporary):
+        os.remove(temporary)
+    connection = sqlite3.connect(temporary)
+    with connection:
+        connection.execute("CREATE TABLE definitions (word TEXT, normal TEXT, definition TEXT)")
+        connection.execute("CREATE TABLE source (modified INTEGER)")
+        connection.executemany("INSERT INTO definitions VALUES (?, ?, ?)",
+                               ((word, normalForm(word), definition) for word, definition in rows if word))
+        connection.execute("INSERT INTO source VALUES (?)", (sourceTime,))
+        connection.execute("CREATE INDEX wordIndex ON definitions (word)")
+        connection.execute("CREATE INDEX normalIndex ON definitions (normal)")
+    connection.close()
+    os.replace(temporary, storeFile)
+
+
+def openDefinitions(definitionsFile=DEFAULT_DEFINITIONS):
+    """Opens the store compiled from a definitions spreadsheet, compiling it
+        first if it is missing or older than the spreadsheet.
+
+    Returns:
+        DefinitionStore: The store.
+
+    """
+    storeFile = os.path.splitext(definitionsFile)[0] + ".sqlite"
+    sourceTime = os.stat(definitionsFile).st_mtime_ns if os.path.exists(definitionsFile) else None
+    if os.path.exists(storeFile):
+        store = DefinitionStore(storeFile)
+        if sourceTime is None or store.sourceTime() == sourceTime:
+            return store
+        store.close()
+    if sourceTime is None:
+        raise FileNotFoundError(definitionsFile + " not found, and it has not been compiled")
+    print("Compiling " + definitionsFile + " to " + storeFile)
+    writeStore(storeFile, readSpreadsheet(definitionsFile), sourceTime)
+    return DefinitionStore(storeFile)
+
+
+class DefinitionStore:
+    """A compiled definitions store, opened for lookups."""
+
+    def __init__(self, storeFile):
+        self.connection = sqlite3.connect(storeFile)
+
+    def close(self):
+        self.connection.close()
+
+    def sourceTime(self):
+        """Returns the modification time of the spreadsheet the store was compiled from."""
+        return self.connection.execute("SELECT modified FROM source").fetchone()[0]
+
+    def _select(self, column, keys):
+        """Returns the first definition of each key found in a column, by key."""
+        found = {}
+        keys = list(dict.fromkeys(keys))
+        for start in range(0, len(keys), LOOKUP_BATCH_SIZE):
+            batch = keys[start:start + LOOKUP_BATCH_SIZE]
+            query = ("SELECT " + column + ", definition FROM definitions WHERE " + column + " IN ("
+                     + ", ".join("?" * len(batch)) + ") ORDER BY rowid")
+            for key, definition in self.connection.execute(query, batch):
+                found.setdefault(key, definition)
+        return found
+
+    def lookup(self, words):
+        """Finds the definition of each word: as it is, then in normal form, then in
+            normal form without its lemma suffix.
+
+        Args:
+            words ([str]): The words to look up.
+
+        Returns:
+            dict: The definition of each word that was found.
+
+        """
+        definitions = self._select('word', words)
+        missing = [word for word in words if word not in definitions]
+        normal = self._select('normal', [normalForm(word) for word in missing] +
+                                        [normalForm(lemmaForm(word)) for word in missing])
+        for word in missing:
+            definition = normal.get(normalForm(word), normal.get(normalForm(lemmaForm(word))))
+            if definition is not None:
+                definitions[word] = definition
+        return definitions
+
+
+def readTopicWords(topicsFile, numWords=DEFAULT_WORDS):
+    """Reads the top words of every topic from a .csv written by outputAsCSV.
+
+    Returns:
+        [[str]]: Up to numWords words of each topic, most common first.
+
+    """
+    with open(topicsFile, newline='') as csvfile:
+        rows = list(csv.reader(csvfile))
+    numTopics = len(rows[0]) // 3 if rows else 0
+    topics = [[] for _ in range(numTopics)]
+    # the first two rows hold the titles and column names, and topics with fewer
+    # words than the largest are padded with zeros
+    for row in rows[2:2 + numWords]:
+        for topic in range(numTopics):
+            word = row[3 * topic]
+            if word != '0' or row[3 * topic + 1] != '0':
+                topics[topic].append(word)
+    return topics
+
+
+def makeDefRefs(topicsFile, definitionsFile=DEFAULT_DEFINITIONS, outputFile=DEFAULT_OUTPUT, numWords=DEFAULT_WORDS):
+    """Writes the definition of the top words of every topic to a .csv of
+        (topic, word, definition) rows. Words without a definition are left blank.
+
+    Returns:
+        (int, int): The number of words written and the number with a definition.
+
+    """
+    topics = readTopicWords(topicsFile, numWords)
+    store = openDefinitions(definitionsFile)
+    definitions = store.lookup([word for words in topics for word in words])
+    store.close()
+    with open(outputFile, 'w', newline='') as csvfile:
+        filewriter = csv.writer(csvfile)
+        filewriter.writerow(['Topic', 'Word', 'Definition'])
+        for topic, words in enumerate(topics):
+            for word in words:
+                filewriter.writerow(['Topic' + str(topic + 1), word, definitions.get(word, '')])
+    return sum(len(words) for words in topics), sum(word in definitions for words in topics for word in words)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Creates a definition reference sheet for the top words of each topic.")
+    parser.add_argument('topics', help=".csv of topics written by outputAsCSV")
+    parser.add_argument('--definitions', default=DEFAULT_DEFINITIONS, help="spreadsheet of Latin definitions")
+    parser.add_argument('--words', type=int, default=DEFAULT_WORDS, help="number of top words per topic")
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help=".csv to write the reference sheet to")
+    args = parser.parse_args()
+
+    written, defined = makeDefRefs(args.topics, args.definitions, args.output, args.words)
+    print(str(defined) + " of " + str(written) + " words defined; reference sheet written to " + args.output)
+
+if __name__ == "__main__":
+    main()
@@ -1,61 +1,296 @@
+"""
+Usage:      python3 evaluation.py [model].json|[model].model|[directory] ... [--top N] [--output results.json]
+
+Evaluation metrics for trained models. The topic-word (phi) and
+document-topic (theta) distributions of a model are computed once, and the
+metrics are computed from them with array operations:
+
+- the variance in topic size,
+- how far each document's topic distribution is from that of the whole corpus,
+- each topic's specificity: the share of documents it appears in, and its
+  average share of a document,
+- how distinct each topic is from the others,
+- the UMass and NPMI coherence of each topic's top words, counted from the
+  inverted index of the model's text.
+
+A directory is expanded to the models it holds, so
+"python3 evaluation.py ../bede_model_jsons" scores every model in one run.
+Models of the same text share one co-occurrence index.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
 import numpy as np
 
-#Determine the variance in topic size for the whole document
-#(Are topics all similarly sized i.e. contain similar total quantities of words?)
-def compareTopicSize(LDAModel):
-    with open('eval.txt', 'a') as eval:
-        #print the variance of the word distribution into topics list
-        # eval.write("Topic size variance: " + np.var(LDAModel.topicTotalWordCount) + "\n")
-        print("Topic size variance: " , np.var(LDAModel.topicTotalWordCount) , "\n")
-
-#Compare the distribution of topics in the entire corpus to that of indivdual documents
-#(Do the documents have distinctive distributions, or just mirror the whole?)
-def compareDistributions(LDAModel):
-    with open('eval.txt', 'a') as eval:
-        # eval.write("Whole corpus distribution: "+ list(map(lambda x: x/sum(LDAModel.topicTotalWordCount), LDAModel.topicTotalWordCount)))
-        print("Whole corpus distribution: ", list(map(lambda x: x/sum(LDAModel.topicTotalWordCount), LDAModel.topicTotalWordCount)))
-        i = 0
-        #print topic distributions for each document as percentage lists
-        for document in LDAModel.docTopicalWordDist:
-            if sum(document) != 0:
-                document = list(map(lambda x: x/sum(document), document))
-            # eval.write("Document " + i + " distribution: " + document + "\n")
-            print("Document " ,i , " distribution: " , document , "\n")
-            i += 1
-        eval.write("\n")
-
-#Compare a topic's size to its prevalence
-#(More specific topics should appear in larger proportions of a few documents)
-def topicSpecificity(LDAModel):
-    #tracks what percent of documents contain the ith topic
-    topicPercents = []
-    #check to see whether a given topic appears in a document
-    for j in range(len(LDAModel.docTopicalWordDist)):
-        document = LDAModel.docTopicalWordDist[j]
-        #check each doc's topic distribution for given ropic
-        for k in range(len(document)):
-            #if kth topic appears in document, increment kth topic document presence count
-            if document[k] > 0:
-                topicPercents[k] += 1
-
-
-    topicPercents = list(map(lambda x: x/len(LDAModel.docTopicalWordDist), topicPercents))
-
-
-    avgPercentOfDoc = []
-    for m in range(len(LDAModel.topicTotalWordCount)):
-        docPercents = []
-        for document in LDAModel.docTopicalWordDist:
-            document = list(map(lambda x: x / sum(document), document))
-            docPercents.append(document[m])
-        avgPercentOfDoc[m] = np.mean(docPercents)
-
-
-
-    with open('eval.txt', 'a') as eval:
-        for t in range(len(LDAModel.topicTotalWordCount)):
-            # eval.write("Topic "+str(t)+ ": "+ topicPercents[t] , avgPercentOfDoc[t]+ "\n")
-            print("Topic " , t , ": " , "present in" , topicPercents[t] , "% of documents" , avgPercentOfDoc[t], "\n")
-        eval.write("\n")
+TESTING_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(TESTING_DIR))
+import LDA
+import modelStore
+
+# number of top words per topic that coherence is measured over
+DEFAULT_TOP_WORDS = 10
+
+
+def klDivergence(p, q):
+    """Returns the KL divergence of each row of p from q, in nats. Entries where
+        p is zero add nothing.
+
+    """
+    ratio = np.divide(p, q, out=np.ones(np.broadcast(p, q).shape), where=p > 0)
+    return (p * np.log(ratio)).sum(axis=-1)
+
+
+def jensenShannon(p, q):
+    """Returns the Jensen-Shannon divergence of each row of p from q, in nats."""
+    mean = (p + q) / 2
+    return (klDivergence(p, mean) + klDivergence(q, mean)) / 2
+
+
+class CooccurrenceIndex:
+    """Counts of the documents of a text that words appear in, alone and in
+        pairs, read from the text's inverted index (see postings.py).
+
+    """
+
+    def __init__(self, vocab, index):
+        """Looks words up in an inverted index.
+
+        Args:
+            vocab ([str]): The word for each word id of the index.
+            index (postings.Postings): The inverted index of the text.
+
+        """
+        self.wordIds = {word: i for i, word in enumerate(vocab)}
+        self.postings = index
+        self.numDocs = index.numDocs
+
+    @classmethod
+    def fromModel(cls, model):
+        """Uses the inverted index of the text a model was trained on, stopwords included."""
+        return cls(model.vocab, model.postings())
+
+    def counts(self, words):
+        """Counts the documents that words appear in, alone and in pairs.
+
+        Args:
+            words ([str]): Distinct words. Words not in the text appear in no documents.
+
+        Returns:
+            numpy.ndarray: A (words x words) matrix whose [i, j] entry is the number of
+            documents holding both words[i] and words[j]. The diagonal holds
+            the number of documents each word appears in.
+
+        """
+        return self.postings.cooccurrences([self.wordIds.get(word, -1) for word in words])
+
+
+class ModelEvaluation:
+    """The metrics of one model, computed from its count matrices.
+
+    Attributes:
+        phi (numpy.ndarray): The (topics x words) matrix of P(w|t).
+        theta (numpy.ndarray): The (documents x topics) matrix of P(t|d).
+
+    """
+
+    def __init__(self, topicWordCounts, docTopicCounts, vocab, alpha, beta):
+        """Computes phi and theta from a model's counts.
+
+        Args:
+            topicWordCounts (numpy.ndarray): The (words x topics) count matrix n_wt.
+            docTopicCounts (numpy.ndarray): The (documents x topics) count matrix n_dt.
+            vocab ([str]): The word for each row of topicWordCounts.
+            alpha (float): Smoothing constant for the P(t|d) term.
+            beta (float): Smoothing constant for the P(w|t) term.
+
+        """
+        self.topicWordCounts = np.asarray(topicWordCounts)
+        self.docTopicCounts = np.asarray(docTopicCounts, dtype=np.float64)
+        self.vocab = vocab
+        self.numTopics = self.topicWordCounts.shape[1]
+        self.topicCounts = self.topicWordCounts.sum(axis=0, dtype=np.float64)
+        self.phi = ((self.topicWordCounts + beta) / (self.topicCounts + len(vocab) * beta)).T
+        docLengths = self.docTopicCounts.sum(axis=1, keepdims=True)
+        self.theta = (self.docTopicCounts + alpha) / (docLengths + self.numTopics * alpha)
+        # the share of each document's words in each topic, without smoothing. empty documents are left out
+        nonempty = docLengths[:, 0] > 0
+        self.docProportions = self.docTopicCounts[nonempty] / docLengths[nonempty]
+
+    @classmethod
+    def fromModel(cls, model):
+        """Evaluates a model opened with modelStore.loadModel."""
+        return cls(model.topicWordCounts, model.docTopicCounts(), model.vocab[:len(model.topicWordCounts)],
+                   model.meta['alpha'], model.meta['beta'])
+
+    @classmethod
+    def fromCorpus(cls, corpus, alpha, beta):
+        """Evaluates the current counts of a CorpusData."""
+        return cls(corpus.n_wt, corpus.n_dt, corpus.vocab, alpha, beta)
+
+    def topicSizeVariance(self):
+        """Returns the variance in the number of words in each topic.
+            (Are topics all similarly sized i.e. contain similar total quantities of words?)
+
+        """
+        return float(np.var(self.topicCounts))
+
+    def corpusDistribution(self):
+        """Returns the share of the corpus' words in each topic."""
+        return self.topicCounts / self.topicCounts.sum()
+
+    def documentDivergence(self):
+        """Returns the Jensen-Shannon divergence of each document's topic distribution
+            from that of the whole corpus.
+            (Do the documents have distinctive distributions, or just mirror the whole?)
+
+        """
+        return jensenShannon(self.theta, self.corpusDistribution())
+
+    def topicSpecificity(self):
+        """Compares each topic's prevalence across documents to its share of them.
+            (More specific topics should appear in larger proportions of a few documents)
+
+        Returns:
+            (numpy.ndarray, numpy.ndarray): The fraction of documents each topic appears
+            in, and each topic's average share of a (non-empty) document's words.
+
+        """
+        presence = (self.docTopicCounts > 0).mean(axis=0)
+        return presence, self.docProportions.mean(axis=0)
+
+    def topicDistinctness(self):
+        """Returns each topic's mean Jensen-Shannon divergence from the other topics."""
+        if self.numTopics < 2:
+            return np.zeros(self.numTopics)
+        return np.array([jensenShannon(self.phi, self.phi[topic]).sum() / (self.numTopics - 1)
+                         for topic in range(self.numTopics)])
+
+    def topWords(self, numWords=DEFAULT_TOP_WORDS):
+        """Returns the numWords most common words of each topic, most common first."""
+        vocab = self.vocab
+        return [[vocab[w] for w in wordIds] for wordIds in LDA.topWordIds(self.topicWordCounts, numWords)]
+
+    def coherence(self, index, numWords=DEFAULT_TOP_WORDS):
+        """Measures the coherence of each topic's top words over the documents of a
+            text. For each pair of top words wi and wj, with wi ranked below wj,
+            UMass scores log((D(wi, wj) + 1) / D(wj)) and NPMI scores
+            log(P(wi, wj) / (P(wi) P(wj))) / -log(P(wi, wj)), where D counts
+            documents and P is the fraction of documents. NPMI is -1 for words that
+            never appear together. Each topic's score is the mean over its pairs.
+
+        Args:
+            index (CooccurrenceIndex): The index of the text.
+            numWords (int): The number of top words in each topic to score.
+
+        Returns:
+            dict: The 'umass' and 'npmi' score of each topic, as arrays. Topics with
+            fewer than two words score nan.
+
+        """
+        topWords = self.topWords(numWords)
+        words = list(dict.fromkeys(word for topic in topWords for word in topic))
+        columns = {word: i for i, word in enumerate(words)}
+        cooccurrences = index.counts(words)
+        umass = np.full(self.numTopics, np.nan)
+        npmi = np.full(self.numTopics, np.nan)
+        for topic, topicWords in enumerate(topWords):
+            if len(topicWords) < 2:
+                continue
+            topicColumns = [columns[word] for word in topicWords]
+            counts = cooccurrences[np.ix_(topicColumns, topicColumns)]
+            lower, higher = np.tril_indices(len(topicWords), -1)
+            together = counts[lower, higher]
+            alone = np.diag(counts)
+            umass[topic] = np.mean(np.log((together + 1) / np.maximum(alone[higher], 1)))
+            jointProbs = together / index.numDocs
+            probs = alone / index.numDocs
+            with np.errstate(divide='ignore', invalid='ignore'):
+                pmi = np.log(jointProbs / (probs[lower] * probs[higher]))
+                scores = np.where(jointProbs >= 1, 1.0, pmi / -np.log(jointProbs))
+            npmi[topic] = np.mean(np.where(together > 0, scores, -1.0))
+        return {'umass': umass, 'npmi': npmi}
+
+    def report(self, index=None, numWords=DEFAULT_TOP_WORDS):
+        """Returns every metric of the model as a dictionary that can be written as
+            JSON. Coherence is included if an index is given.
+
+        """
+        presence, averageShare = self.topicSpecificity()
+        distinctness = self.topicDistinctness()
+        topics = [{'topic': topic + 1,
+                   'words': int(self.topicCounts[topic]),
+                   'top words': words,
+                   'document presence': float(presence[topic]),
+                   'average document share': float(averageShare[topic]),
+                   'distinctness': float(distinctness[topic])}
+                  for topic, words in enumerate(self.topWords(numWords))]
+        report = {'topics': self.numTopics,
+                  'topic size variance': self.topicSizeVariance(),
+                  'corpus distribution': self.corpusDistribution().tolist(),
+                  'mean document divergence': float(self.documentDivergence().mean()),
+                  'mean distinctness': float(distinctness.mean())}
+        if index is not None:
+            coherence = self.coherence(index, numWords)
+            for name, scores in coherence.items():
+                report['mean ' + name] = float(np.nanmean(scores)) if not np.isnan(scores).all() else None
+                for topic, score in zip(topics, scores.tolist()):
+                    topic[name] = None if np.isnan(score) else score
+        report['per topic'] = topics
+        return report
+
+
+def textKey(model):
+    """Returns a key that is the same for models of the same chunked text."""
+    digest = hashlib.sha1(np.ascontiguousarray(model.array('docOffsets'), dtype=np.int64).tobytes())
+    digest.update("\n".join(sorted(model.vocab)).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def evaluateModels(paths, numWords=DEFAULT_TOP_WORDS):
+    """Scores a batch of models, building one co-occurrence index per text.
+
+    Args:
+        paths ([str]): .json models, .model directories, or directories holding them.
+        numWords (int): The number of top words in each topic to score.
+
+    Returns:
+        dict: The report of each model, keyed by its path.
+
+    """
+    indexes = {}
+    reports = {}
+    for path in modelStore.modelPaths(paths):
+        model = modelStore.loadModel(path)
+        key = textKey(model)
+        if key not in indexes:
+            indexes[key] = CooccurrenceIndex.fromModel(model)
+        reports[path] = ModelEvaluation.fromModel(model).report(indexes[key], numWords)
+    return reports
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scores trained LDA models.")
+    parser.add_argument('paths', nargs='+', help=".json models, .model directories or directories holding them")
+    parser.add_argument('--top', type=int, default=DEFAULT_TOP_WORDS,
+                        help="number of top words per topic to measure coherence over")
+    parser.add_argument('--output', help="file to write every metric to, as JSON")
+    args = parser.parse_args()
 
+    reports = evaluateModels(args.paths, args.top)
+    print("Model, Topics, Topic size variance, Document divergence, Distinctness, UMass, NPMI")
+    for path, report in reports.items():
+        print(", ".join(str(value) for value in
+                        [os.path.basename(path), report['topics'], round(report['topic size variance'], 1),
+                         round(report['mean document divergence'], 4), round(report['mean distinctness'], 4),
+                         report['mean umass'] if report['mean umass'] is None else round(report['mean umass'], 4),
+                         report['mean npmi'] if report['mean npmi'] is None else round(report['mean npmi'], 4)]))
+    if args.output:
+        with open(args.output, 'w') as outfile:
+            json.dump(reports, outfile, indent=4)
+        print("Results written to " + args.output)
 
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Tests for loading corpora into LDA.CorpusData.
+"""
+
+import csv
+import json
+import numpy as np
+import pytest
+import LDA
+from conftest import corpusRows
+
+
+def assertSameCorpus(corpus, expected):
+    assert corpus.staticVocab == expected.staticVocab and corpus.vocab == expected.vocab
+    assert corpus.stopwords == expected.stopwords
+    assert corpus.docTotalWordCounts == expected.docTotalWordCounts
+    for name in ('tokenIds', 'tokenTopics', 'docOffsets', 'staticTokenIds', 'staticDocOffsets', 'keepMask', 'n_wt',
+                 'n_dt', 'n_t'):
+        assert np.array_equal(getattr(corpus, name), getattr(expected, name)), name
+    for name in ('offsets', 'docs', 'positions'):
+        assert np.array_equal(getattr(corpus.postings, name), getattr(expected.postings, name)), name
+
+
+@pytest.mark.parametrize('stopwordOptions', [("off", "off", [], []), (0.05, 0.5, [], ["w1"]),
+                                             (0.1, 0.3, ["w0"], [])])
+def testCorpusWithStopwordsMatchesFreshLoad(stopwordOptions):
+    rows = corpusRows(30, 50, 4)
+    allWords = LDA.CorpusData("random.csv", 3)
+    allWords.loadRows(rows, "off", "off", [], [])
+    expected = LDA.CorpusData("random.csv", 3)
+    expected.loadRows(rows, *stopwordOptions)
+    assertSameCorpus(allWords.withStopwords(*stopwordOptions), expected)
+
+
+@pytest.mark.parametrize('stopwordOptions', [("off", "off", [], []), (0.1, 0.5, ["w0"], ["w2", "missing"])])
+def testLoadedCorpusMatchesRowsWordForWord(stopwordOptions):
+    rows = corpusRows(30, 50, 5)
+    corpus = LDA.CorpusData("random.csv", 4)
+    corpus.loadRows(rows, *stopwordOptions)
+    # the documents and stopwords, worked out directly from the rows
+    docs = {}
+    for word, label in rows:
+        docs.setdefault(label, []).append(word)
+    docWords = list(docs.values())
+    lowerBound, upperBound, whitelist, blacklist = stopwordOptions
+    lowerBound = 0 if lowerBound == "off" else lowerBound
+    upperBound = 2 if upperBound == "off" else upperBound
+    words = list(dict.fromkeys(word for word, label in rows))
+    docFrequency = {word: sum(word in doc for doc in docWords) for word in words}
+    stopwords = {word for word in words if docFrequency[word] <= np.ceil(len(docWords) * lowerBound)
+                 or docFrequency[word] >= np.ceil(len(docWords) * upperBound)}
+    stopwords = (stopwords | set(blacklist)) - set(whitelist)
+
+    assert corpus.stopwords == stopwords
+    assert corpus.vocab == [word for word in words if word not in stopwords]
+    assert corpus.staticVocab == corpus.vocab + [word for word in words if word in stopwords]
+    assert corpus.docTotalWordCounts == [len(doc) for doc in docWords]
+    assert corpus.wordLocArrayStatic == docWords
+    assert corpus.wordLocationArray == [[word for word in doc if word not in stopwords] for doc in docWords]
+    assert corpus.numDocs == len(docWords)
+
+
+def testEveryTokenStartsWithTheNextTopicInCorpusOrder(makeCorpus, checkCounts):
+    corpus = makeCorpus(numTopics=3, stopBlacklist=["w1"])
+    assert corpus.tokenTopics.tolist() == [(i + 1) % 3 for i in range(len(corpus.tokenIds))]
+    checkCounts(corpus)
+
+
+def testNewDocumentStartsWhenTheLabelChanges():
+    corpus = LDA.CorpusData("labels.csv", 2)
+    corpus.loadRows([("A", "1"), ("b", "1"), ("a", "2"), ("c", "1"), ("c", "1")], "off", "off", [], [])
+    assert corpus.wordLocationArray == [["a", "b"], ["a"], ["c", "c"]]
+
+
+def testStopwordMaskPicksOutTheSampledTokens(makeCorpus):
+    corpus = makeCorpus(stopBlacklist=["w0", "w2"])
+    assert np.array_equal(corpus.staticTokenIds[corpus.keepMask], corpus.tokenIds)
+    assert {corpus.staticVocab[i] for i in corpus.staticTokenIds[~corpus.keepMask]} == {"w0", "w2"}
+    for doc in range(corpus.numDocs):
+        start, stop = corpus.staticDocOffsets[doc], corpus.staticDocOffsets[doc + 1]
+        kept = corpus.staticTokenIds[start:stop][corpus.keepMask[start:stop]]
+        assert np.array_equal(kept, corpus.tokenIds[corpus.docOffsets[doc]:corpus.docOffsets[doc + 1]])
+
+
+def testAnnotatedTextMarksStopwordsAndKeepsTopicsInPlace(makeCorpus, tmp_path):
+    corpus = makeCorpus(stopBlacklist=["w0", "w2"])
+    LDA.runLDA(corpus, 3, 0.5, 0.5, seed=18)
+    assert corpus.topicAssignByLocStatic == []
+    corpus.createAnnoTextDataStructure()
+    words, topics = corpus.wordLocArrayStatic, corpus.topicAssignByLocStatic
+    for docWords, docTopics, sampledTopics in zip(words, topics, corpus.topicAssignmentByLoc):
+        assert [topic == -1 for topic in docTopics] == [word in ("w0", "w2") for word in docWords]
+        assert [topic for topic in docTopics if topic != -1] == sampledTopics
+
+    outputname = str(tmp_path / "model")
+    corpus.encodeData("random.csv", corpus.numTopics, 3, 0.5, 0.5, outputname, [[], [], []])
+    with open(outputname + ".json") as infile:
+        written = json.load(infile)
+    assert written['wordsByLocationWithStopwords'] == words
+    assert written['topicsByLocationWithStopwords'] == topics
+    assert sorted(written['stopwords']) == ["w0", "w2"]
+
+
+@pytest.mark.parametrize('numWords', [1, 5, 40, 100])
+def testTopWordIdsMatchAFullSort(numWords):
+    counts = np.random.default_rng(19).integers(0, 6, (60, 4))
+    counts[:, 3] = 0
+    counts[:50, 2] = 0
+    topIds = LDA.topWordIds(counts, numWords)
+    for topic in range(4):
+        column = counts[:, topic]
+        # highest count first, ties in order of id, words with no count left out
+        expected = [w for w in sorted(range(60), key=lambda w: (-column[w], w)) if column[w] > 0][:numWords]
+        assert topIds[topic].tolist() == expected
+
+
+def testTopicCsvAndSummaryListTheTopWords(makeCorpus, tmp_path):
+    corpus = makeCorpus()
+    LDA.runLDA(corpus, 3, 0.5, 0.5, seed=20)
+    outputname = str(tmp_path / "model")
+    corpus.outputAsCSV(outputname)
+    corpus.outputSummary(outputname, 5)
+    topWords = corpus.topWords(5)
+    with open(outputname + ".csv", newline='') as csvfile:
+        rows = list(csv.reader(csvfile))
+    assert rows[0][1::3] == ["Topic" + str(topic + 1) for topic in range(corpus.numTopics)]
+    for topic in range(corpus.numTopics):
+        column = [(row[3 * topic], int(row[3 * topic + 1])) for row in rows[2:7]]
+        assert column == topWords[topic]
+    with open(outputname + "-summary.json") as infile:
+        summary = json.load(infile)['topics']
+    for topic, entry in enumerate(summary):
+        assert entry['words'] == corpus.n_t[topic]
+        assert [(word['word'], word['count']) for word in entry['top words']] == topWords[topic]
+        assert entry['top words'][0]['percentage'] == pytest.approx(100 * topWords[topic][0][1] / corpus.n_t[topic])
@@ -0,0 +1,63 @@
+"""
+Tests for the independent sampling chains and their topic alignment in chains.py.
+"""
+
+import itertools
+import json
+import numpy as np
+import pytest
+import chains
+
+
+@pytest.mark.parametrize('size, seed', [(1, 0), (3, 1), (5, 2), (6, 3)])
+def testMatchTopicsFindsTheBestPairing(size, seed):
+    similarity = np.random.default_rng(seed).random((size, size))
+    match = chains.matchTopics(similarity)
+    assert sorted(match) == list(range(size))
+    best = max(similarity[np.arange(size), list(permutation)].sum()
+               for permutation in itertools.permutations(range(size)))
+    assert similarity[np.arange(size), match].sum() == pytest.approx(best)
+
+
+def testMatchTopicsUndoesAShuffle():
+    similarity = np.eye(7) + 0.1
+    shuffle = np.random.default_rng(4).permutation(7)
+    assert np.array_equal(chains.matchTopics(similarity[:, shuffle]), np.argsort(shuffle))
+
+
+def testTopicSimilarity():
+    counts = np.random.default_rng(5).integers(0, 10, size=(40, 6))
+    counts[:, 2] = 0
+    similarity = chains.topicSimilarity(counts, counts)
+    assert similarity.shape == (6, 6)
+    assert np.all(similarity >= -1e-12) and np.all(similarity <= 1 + 1e-12)
+    assert np.allclose(np.diag(similarity)[[0, 1, 3, 4, 5]], 1)
+    assert np.allclose(similarity, similarity.T)
+    # topics with no words in common are as far apart as can be
+    disjoint = np.array([[3, 0], [1, 0], [0, 2]])
+    assert np.allclose(chains.topicSimilarity(disjoint, disjoint), np.eye(2))
+
+
+def testRunChainsIsReproducible(makeCorpus, checkCounts, tmp_path):
+    corpus = makeCorpus()
+    reportFile = str(tmp_path / "chains.json")
+    best, report = chains.runChains(corpus, 3, 5, 0.5, 0.5, seed=11, processes=2, reportFile=reportFile)
+    again, reportAgain = chains.runChains(corpus, 3, 5, 0.5, 0.5, seed=11, processes=1)
+    assert np.array_equal(best.tokenTopics, again.tokenTopics)
+    assert ([chain['log likelihood'] for chain in report['chains']]
+            == [chain['log likelihood'] for chain in reportAgain['chains']])
+    assert corpus.tokenTopics is None or not np.shares_memory(corpus.tokenTopics, best.tokenTopics)
+    checkCounts(best)
+
+    with open(reportFile) as infile:
+        assert json.load(infile)['seed'] == 11
+    assert len(report['chains']) == 3 and len(report['topics']) == corpus.numTopics
+    bestIndex = report['best chain'] - 1
+    logLikelihoods = [chain['log likelihood'] for chain in report['chains']]
+    assert logLikelihoods[bestIndex] == max(logLikelihoods)
+    for index, chain in enumerate(report['chains']):
+        assert sorted(chain['topic matches']) == list(range(1, corpus.numTopics + 1))
+        if index == bestIndex:
+            assert chain['topic matches'] == list(range(1, corpus.numTopics + 1))
+    for topic in report['topics']:
+        assert 0 <= topic['lowest similarity'] <= topic['stability'] <= 1
@@ -0,0 +1,107 @@
+"""
+Tests for checkpointing and resuming runs in checkpoint.py and runLDA.
+"""
+
+import csv
+import json
+import os
+import sys
+import numpy as np
+import pytest
+import LDA
+import checkpoint
+import instrumentation
+from conftest import corpusRows
+
+
+class Interruption(Exception):
+    pass
+
+
+class InterruptAfter:
+    """Stands in for a convergence monitor, and stops a run by raising Interruption
+        after the given iteration, as if the process had been killed.
+
+    """
+
+    def __init__(self, iteration):
+        self.iteration = iteration
+
+    def start(self, corpus, alpha, beta, startIteration=0):
+        pass
+
+    def measure(self, iteration):
+        if iteration == self.iteration:
+            raise Interruption()
+        return False
+
+
+@pytest.mark.parametrize('sampler, workers', [('gibbs', 1), ('mh', 1), ('gibbs', 2)])
+def testResumedRunMatchesUninterruptedRun(makeCorpus, tmp_path, sampler, workers):
+    checkpointFile = str(tmp_path / "run-checkpoint.npz")
+    uninterrupted = makeCorpus()
+    LDA.runLDA(uninterrupted, 6, 0.5, 0.5, seed=8, sampler=sampler, workers=workers)
+
+    interrupted = makeCorpus()
+    with pytest.raises(Interruption):
+        LDA.runLDA(interrupted, 6, 0.5, 0.5, seed=8, sampler=sampler, workers=workers, checkpointFile=checkpointFile,
+                   checkpointEvery=2, monitor=InterruptAfter(5))
+    assert os.path.exists(checkpointFile)
+
+    resumed = makeCorpus()
+    completed = LDA.runLDA(resumed, 6, 0.5, 0.5, seed=8, sampler=sampler, workers=workers,
+                           checkpointFile=checkpointFile, checkpointEvery=2, resume=True)
+    assert completed == 6
+    for name in ('tokenTopics', 'n_wt', 'n_dt', 'n_t'):
+        assert np.array_equal(getattr(resumed, name), getattr(uninterrupted, name))
+
+
+def testFinishedRunRemovesItsCheckpoint(makeCorpus, tmp_path):
+    checkpointFile = str(tmp_path / "run-checkpoint.npz")
+    LDA.runLDA(makeCorpus(), 6, 0.5, 0.5, seed=9, checkpointFile=checkpointFile, checkpointEvery=2)
+    assert not os.path.exists(checkpointFile)
+
+
+def testCheckpointOfOtherSettingsIsRefused(makeCorpus, tmp_path):
+    checkpointFile = str(tmp_path / "run-checkpoint.npz")
+    with pytest.raises(Interruption):
+        LDA.runLDA(makeCorpus(), 6, 0.5, 0.5, seed=10, checkpointFile=checkpointFile, checkpointEvery=2,
+                   monitor=InterruptAfter(3))
+    with pytest.raises(checkpoint.CheckpointMismatchError):
+        LDA.runLDA(makeCorpus(), 6, 0.5, 0.1, seed=10, checkpointFile=checkpointFile, checkpointEvery=2, resume=True)
+
+
+def testRunWithoutResumeKeepsCheckpointOfInterruptedRun(makeCorpus, tmp_path):
+    checkpointFile = str(tmp_path / "run-checkpoint.npz")
+    with pytest.raises(Interruption):
+        LDA.runLDA(makeCorpus(), 6, 0.5, 0.5, seed=17, checkpointFile=checkpointFile, checkpointEvery=2,
+                   monitor=InterruptAfter(3))
+    LDA.runLDA(makeCorpus(), 6, 0.5, 0.5, seed=17, checkpointFile=checkpointFile)
+    assert os.path.exists(checkpointFile)
+    LDA.runLDA(makeCorpus(), 6, 0.5, 0.5, seed=17, checkpointFile=checkpointFile, resume=True)
+    assert not os.path.exists(checkpointFile)
+
+
+def testResumeFromCheckpointOfOtherSettingsIsReportedByMain(tmp_path, monkeypatch, capsys):
+    with open(tmp_path / "random.csv", 'w', newline='') as csvfile:
+        csv.writer(csvfile).writerows(corpusRows(20, 30, 6))
+    config = {"required parameters": {"source": str(tmp_path / "random.csv"), "iterations": 6, "topics": 3,
+                                      "output name": str(tmp_path / "out")},
+              "stopword options": {"lower limit": "off", "upper limit": "off", "whitelist": [], "blacklist": []},
+              "chunking options": {"using csv": "on"},
+              "hyperparameters": {"alpha": 0.5, "beta": 0.1},
+              "sampler options": {"seed": 5, "checkpoint every": 2}}
+    corpus = LDA.CorpusData("random.csv", 3)
+    corpus.loadRows(corpusRows(20, 30, 6), "off", "off", [], [])
+    with pytest.raises(Interruption):
+        LDA.runLDA(corpus, 6, 0.5, 0.2, seed=5, checkpointFile=str(tmp_path / "out-checkpoint.npz"),
+                   checkpointEvery=2, monitor=InterruptAfter(3))
+    with open(tmp_path / "config.json", 'w') as configFile:
+        json.dump(config, configFile)
+    monkeypatch.setattr(sys, 'argv', ["LDA.py", str(tmp_path / "config.json"), "--resume"])
+    # main registers its instrumentation hooks for the rest of the process
+    monkeypatch.setattr(instrumentation, '_hooks', [])
+    with pytest.raises(SystemExit):
+        LDA.main()
+    assert "Invalid checkpoint given: " in capsys.readouterr().out
+    assert not os.path.exists(str(tmp_path / "out.json"))
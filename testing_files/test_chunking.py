@@ -0,0 +1,81 @@
+"""
+Tests that the streaming chunker in chunking.py splits a .txt corpus into the
+same (word, document) rows as the txtToCsv it replaced.
+"""
+
+import csv
+import pytest
+import LDA
+import chunking
+
+TEXT = ('CHAPTER One.  "Arma virumque" cano,\tTroiae qui primus ab oris\n'
+        'Italiam, fato profugus, Laviniaque venit\n\nlitora; multum ille et terris (iactatus) et alto\n'
+        'Chapter Two: vi superum saevae memorem Iunonis ob iram;\n'
+        "multa quoque et bello passus, dum conderet urbem, ‘inferretque’ deos Latio\n"
+        'chapter three  genus unde Latinum, Albanique patres, atque altae moenia Romae.\n')
+
+
+def txtToCsvRows(fileName, splitString):
+    """The rows of the original txtToCsv, which read the whole text into memory."""
+    fileString = open(fileName, 'r').read().lower()
+    wordList = fileString.split()
+    if splitString[:3] == 'num' or splitString[:6] == 'length':
+        numCap = splitString[:3] == 'num'
+        docLen = len(wordList) // int(splitString[3:]) if numCap else int(splitString[6:])
+        docStrings = []
+        while wordList:
+            docStrings.append(" ".join(wordList[:docLen]))
+            wordList = wordList[docLen:]
+        lastDocLen = len(docStrings[-1].split())
+        if (numCap and lastDocLen < docLen) or (not numCap and lastDocLen < docLen // 2):
+            stubDoc = docStrings.pop()
+            docStrings[-1] += " " + stubDoc
+    else:
+        parts = fileString.split(splitString.lower())
+        docStrings = [parts[0]] + [splitString + part for part in parts[1:]]
+    rows = []
+    for currentDoc, docString in enumerate(docStrings, 1):
+        for word in docString.replace("\n", " ").split(' '):
+            word = word.strip('.,!?"“”‘’():;\n\t\'')
+            if word != '':
+                rows.append((word, str(currentDoc)))
+    return rows
+
+
+@pytest.fixture
+def textFile(tmp_path):
+    fileName = str(tmp_path / "aeneid.txt")
+    with open(fileName, 'w') as outfile:
+        outfile.write(TEXT * 3)
+    return fileName
+
+
+@pytest.mark.parametrize('splitString', ['num4', 'num7', 'length10', 'length13', 'length17', 'Chapter', '\n\n',
+                                         'ter t', 'missing'])
+@pytest.mark.parametrize('readSize', [5, 64, chunking.DEFAULT_READ_SIZE])
+def testChunkTextMatchesTxtToCsv(textFile, splitString, readSize):
+    assert list(chunking.chunkText(textFile, splitString, readSize)) == txtToCsvRows(textFile, splitString)
+
+
+def testTxtToCsvWritesTheStreamedRows(textFile):
+    LDA.txtToCsv(textFile, "length10")
+    with open(textFile[:-4] + ".csv", newline='') as csvfile:
+        assert [tuple(row) for row in csv.reader(csvfile)] == txtToCsvRows(textFile, "length10")
+
+
+def testWrittenRowsArePassedOn(textFile, tmp_path):
+    csvName = str(tmp_path / "written.csv")
+    rows = list(chunking.writeRows(chunking.chunkText(textFile, "Chapter"), csvName))
+    assert rows == txtToCsvRows(textFile, "Chapter")
+    with open(csvName, newline='') as csvfile:
+        assert [tuple(row) for row in csv.reader(csvfile)] == rows
+
+
+def testLoadTextMatchesLoadingTheCsv(textFile):
+    LDA.txtToCsv(textFile, "num5")
+    fromCsv = LDA.CorpusData(textFile[:-4] + ".csv", 3)
+    fromCsv.loadData(0.1, 0.9, [], ["et"])
+    fromText = LDA.CorpusData(textFile[:-4] + ".csv", 3)
+    fromText.loadText(textFile, "num5", 0.1, 0.9, [], ["et"])
+    assert fromText.staticVocab == fromCsv.staticVocab and fromText.stopwords == fromCsv.stopwords
+    assert fromText.wordLocArrayStatic == fromCsv.wordLocArrayStatic
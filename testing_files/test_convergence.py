@@ -0,0 +1,113 @@
+"""
+Tests for log-likelihood tracking in convergence.py.
+"""
+
+import csv
+import math
+import numpy as np
+import pytest
+import convergence
+import LDA
+import tokenStore
+
+
+def recountLogLikelihood(corpus, alpha, beta):
+    """Computes the collapsed joint log-likelihood term by term with math.lgamma."""
+    numTopics, vocabSize = corpus.numTopics, len(corpus.vocab)
+    total = 0.0
+    for topic in range(numTopics):
+        total += math.lgamma(vocabSize * beta) - vocabSize * math.lgamma(beta)
+        total += sum(math.lgamma(count + beta) for count in corpus.n_wt[:, topic].tolist())
+        total -= math.lgamma(int(corpus.n_t[topic]) + vocabSize * beta)
+    for doc in range(corpus.numDocs):
+        total += math.lgamma(numTopics * alpha) - numTopics * math.lgamma(alpha)
+        total += sum(math.lgamma(count + alpha) for count in corpus.n_dt[doc].tolist())
+        total -= math.lgamma(int(corpus.docOffsets[doc + 1] - corpus.docOffsets[doc]) + numTopics * alpha)
+    return total
+
+
+class RecountingMonitor(convergence.ConvergenceMonitor):
+    """A monitor that checks every measurement against a full recount."""
+
+    def measure(self, iteration):
+        expected = recountLogLikelihood(self.corpus, self.alpha, self.beta)
+        assert self.logLikelihood.value() == pytest.approx(expected, rel=1e-10)
+        self.checked = iteration
+        return super().measure(iteration)
+
+
+def testLogLikelihoodMatchesFullRecount(makeCorpus):
+    corpus = makeCorpus()
+    logLikelihood = convergence.JointLogLikelihood(corpus, 0.5, 0.1)
+    assert logLikelihood.value() == pytest.approx(recountLogLikelihood(corpus, 0.5, 0.1), rel=1e-12)
+
+
+@pytest.mark.parametrize('sampler, workers, blockTokens', [('gibbs', 1, None), ('mh', 1, None), ('gibbs', 2, None),
+                                                           ('gibbs', 1, 100)])
+def testTrackedLogLikelihoodMatchesFullRecount(makeCorpus, tmp_path, sampler, workers, blockTokens):
+    corpus = makeCorpus()
+    if blockTokens is not None:
+        tokenStore.TokenStore(str(tmp_path), blockTokens).hold(corpus)
+    monitor = RecountingMonitor(1)
+    LDA.runLDA(corpus, 4, 0.5, 0.1, seed=12, sampler=sampler, workers=workers, monitor=monitor)
+    assert monitor.checked == 4
+    assert corpus.moveListener is None
+
+
+def testMonitorStopsRunOnceConverged(makeCorpus, tmp_path):
+    traceFile = str(tmp_path / "run-trace.csv")
+    monitor = convergence.ConvergenceMonitor(2, 1.0, traceFile=traceFile)
+    completed = LDA.runLDA(makeCorpus(), 20, 0.5, 0.5, seed=13, monitor=monitor)
+    assert completed == 4
+    with open(traceFile, newline='') as csvfile:
+        rows = list(csv.reader(csvfile))
+    assert [row[0] for row in rows] == ['Iteration', '2', '4']
+
+
+def testResumedRunContinuesTheTrace(makeCorpus, tmp_path):
+    checkpointFile = str(tmp_path / "run-checkpoint.npz")
+    traceFile = str(tmp_path / "run-trace.csv")
+    uninterruptedTrace = str(tmp_path / "uninterrupted-trace.csv")
+    LDA.runLDA(makeCorpus(), 8, 0.5, 0.5, seed=14,
+               monitor=convergence.ConvergenceMonitor(2, traceFile=uninterruptedTrace))
+
+    class InterruptedMonitor(convergence.ConvergenceMonitor):
+        def measure(self, iteration):
+            stop = super().measure(iteration)
+            if iteration == 6:
+                raise KeyboardInterrupt()
+            return stop
+
+    with pytest.raises(KeyboardInterrupt):
+        LDA.runLDA(makeCorpus(), 8, 0.5, 0.5, seed=14, checkpointFile=checkpointFile, checkpointEvery=4,
+                   monitor=InterruptedMonitor(2, traceFile=traceFile))
+    monitor = convergence.ConvergenceMonitor(2, traceFile=traceFile)
+    LDA.runLDA(makeCorpus(), 8, 0.5, 0.5, seed=14, checkpointFile=checkpointFile, checkpointEvery=4, resume=True,
+               monitor=monitor)
+    with open(traceFile, newline='') as csvfile:
+        rows = list(csv.reader(csvfile))
+    with open(uninterruptedTrace, newline='') as csvfile:
+        expected = list(csv.reader(csvfile))
+    # the measurement at 6 was taken after the checkpoint at 4, so it is taken again
+    assert [row[0] for row in rows] == ['Iteration', '2', '4', '6', '8']
+    assert [float(row[1]) for row in rows[1:]] == pytest.approx([float(row[1]) for row in expected[1:]])
+    assert [row[0] for row in monitor.trace] == [2, 4, 6, 8]
+
+
+def testResumedRunChecksTheToleranceAgainstTheTrace(makeCorpus, tmp_path):
+    checkpointFile = str(tmp_path / "run-checkpoint.npz")
+    traceFile = str(tmp_path / "run-trace.csv")
+
+    class InterruptedMonitor(convergence.ConvergenceMonitor):
+        def measure(self, iteration):
+            if iteration == 3:
+                raise KeyboardInterrupt()
+            return super().measure(iteration)
+
+    with pytest.raises(KeyboardInterrupt):
+        LDA.runLDA(makeCorpus(), 20, 0.5, 0.5, seed=13, checkpointFile=checkpointFile, checkpointEvery=2,
+                   monitor=InterruptedMonitor(2, 1.0, traceFile=traceFile))
+    # a single new measurement is enough to stop, since the one at 2 is read back
+    completed = LDA.runLDA(makeCorpus(), 20, 0.5, 0.5, seed=13, checkpointFile=checkpointFile, checkpointEvery=2,
+                           resume=True, monitor=convergence.ConvergenceMonitor(2, 1.0, traceFile=traceFile))
+    assert completed == 4
@@ -0,0 +1,98 @@
+"""
+Tests for the on-disk cache of loaded corpora in corpusCache.py.
+"""
+
+import os
+import numpy as np
+import pytest
+import LDA
+import corpusCache
+import tokenStore
+
+TEXT = ("Arma virumque cano, Troiae qui primus ab oris\nItaliam, fato profugus, Laviniaque venit\n"
+        "litora, multum ille et terris iactatus et alto\nvi superum saevae memorem Iunonis ob iram;\n") * 10
+LOAD_OPTIONS = ("length of documents", 12, 0.05, 0.9, [], ["et"])
+
+
+@pytest.fixture
+def source(tmp_path):
+    fileName = str(tmp_path / "aeneid.txt")
+    with open(fileName, 'w') as outfile:
+        outfile.write(TEXT)
+    return fileName
+
+
+def load(source, cache, options=LOAD_OPTIONS, store=None):
+    chunkType, chunkParam, lowerBound, upperBound, whitelist, blacklist = options
+    return LDA.loadCorpus(source, 3, chunkType, chunkParam, lowerBound, upperBound, whitelist, blacklist, False,
+                          cache, store)
+
+
+def testSecondLoadIsReadFromTheCache(source, tmp_path, capsys):
+    cache = corpusCache.CorpusCache(str(tmp_path / "cache"))
+    loaded, csvName, puncData = load(source, cache)
+    assert "from the cache" not in capsys.readouterr().out
+    cached, cachedCsvName, cachedPuncData = load(source, cache)
+    assert "Loaded the corpus from the cache" in capsys.readouterr().out
+    assert cachedCsvName == csvName and list(cachedPuncData) == list(puncData)
+    assert cached.staticVocab == loaded.staticVocab and cached.vocab == loaded.vocab
+    assert cached.stopwords == loaded.stopwords and cached.docTotalWordCounts == loaded.docTotalWordCounts
+    for name in ('tokenIds', 'tokenTopics', 'docOffsets', 'staticTokenIds', 'keepMask', 'n_wt', 'n_dt', 'n_t'):
+        assert np.array_equal(getattr(cached, name), getattr(loaded, name)), name
+    for name in ('offsets', 'docs', 'positions'):
+        assert np.array_equal(getattr(cached.postings, name), getattr(loaded.postings, name)), name
+
+
+def testKeyFollowsTheSourceAndTheOptionsThatShapeIt(source, tmp_path):
+    cache = corpusCache.CorpusCache(str(tmp_path / "cache"))
+    key = cache.key(source, "length of documents", 12, 0.05, 0.9, [], ["et", "ab"])
+    assert cache.key(source, "length of documents", 12, 0.05, 0.9, [], ["ab", "et"]) == key
+    assert cache.key(source, "length of documents", 13, 0.05, 0.9, [], ["et", "ab"]) != key
+    assert cache.key(source, "length of documents", 12, 0.05, 0.8, [], ["et", "ab"]) != key
+    with open(source, 'a') as outfile:
+        outfile.write("Aeneas\n")
+    assert cache.key(source, "length of documents", 12, 0.05, 0.9, [], ["et", "ab"]) != key
+    csvSource = str(tmp_path / "rows.csv")
+    with open(csvSource, 'w') as outfile:
+        outfile.write("arma,1\n")
+    # chunking does not apply to a .csv
+    assert (cache.key(csvSource, "length of documents", 12, "off", "off", [], [])
+            == cache.key(csvSource, "using csv", 0, "off", "off", [], []))
+
+
+def testLeastRecentlyUsedEntriesAreEvicted(source, tmp_path):
+    cache = corpusCache.CorpusCache(str(tmp_path / "cache"))
+    options = [LOAD_OPTIONS[:2] + (0.05, upperBound, [], []) for upperBound in (0.9, 0.8, 0.7)]
+    for age, loadOptions in enumerate(options):
+        load(source, cache, loadOptions)
+        entryFile = cache.entryFile(cache.key(source, *loadOptions))
+        os.utime(entryFile, ns=(age * 10 ** 9, age * 10 ** 9))
+    sizes = [os.path.getsize(cache.entryFile(cache.key(source, *loadOptions))) for loadOptions in options]
+    # reading the oldest entry makes it the most recently used
+    assert load(source, cache, options[0])[0].numDocs > 0
+    cache.maxBytes = sizes[0] + sizes[2]
+    cache.evict()
+    assert [os.path.exists(cache.entryFile(cache.key(source, *loadOptions))) for loadOptions in options] == [
+        True, False, True]
+
+
+def testDamagedEntryIsLoadedAgain(source, tmp_path, capsys):
+    cache = corpusCache.CorpusCache(str(tmp_path / "cache"))
+    loaded = load(source, cache)[0]
+    entryFile = cache.entryFile(cache.key(source, *LOAD_OPTIONS))
+    with open(entryFile, 'wb') as outfile:
+        outfile.write(b"not a zip file")
+    capsys.readouterr()
+    reloaded = load(source, cache)[0]
+    assert "from the cache" not in capsys.readouterr().out
+    assert np.array_equal(reloaded.staticTokenIds, loaded.staticTokenIds)
+    assert os.path.getsize(entryFile) > len(b"not a zip file")
+
+
+def testCachedCorpusIsMovedIntoTheTokenStore(source, tmp_path):
+    cache = corpusCache.CorpusCache(str(tmp_path / "cache"))
+    loaded = load(source, cache, store=tokenStore.TokenStore(str(tmp_path / "first"), 50))[0]
+    cached = load(source, cache, store=tokenStore.TokenStore(str(tmp_path / "second"), 50))[0]
+    assert isinstance(cached.tokenIds, np.memmap) and cached.tokenStore is not None
+    for name in ('tokenIds', 'tokenTopics', 'staticTokenIds', 'n_wt', 'n_dt'):
+        assert np.array_equal(getattr(cached, name), getattr(loaded, name)), name
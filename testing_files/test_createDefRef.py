@@ -0,0 +1,93 @@
+"""
+Tests for the definition reference sheets of createDefRef.py.
+"""
+
+import csv
+import os
+import pytest
+import LDA
+import createDefRef
+
+ROWS = [("quam", "how, than"), ("Iuno", "Juno"), ("arma", "arms, weapons"), ("arma", "a second entry"),
+        ("virus", "poison")]
+
+
+@pytest.fixture
+def definitions(tmp_path, monkeypatch):
+    """A definitions spreadsheet, whose rows are read by a stand-in for readSpreadsheet."""
+    definitionsFile = str(tmp_path / "definitions.xlsx")
+    with open(definitionsFile, 'w') as outfile:
+        outfile.write("spreadsheet")
+    reads = []
+
+    def readSpreadsheet(fileName):
+        reads.append(fileName)
+        return list(ROWS)
+    monkeypatch.setattr(createDefRef, 'readSpreadsheet', readSpreadsheet)
+    return definitionsFile, reads
+
+
+def testLookupMatchesNormalAndLemmaForms(tmp_path):
+    storeFile = str(tmp_path / "definitions.sqlite")
+    createDefRef.writeStore(storeFile, ROWS)
+    store = createDefRef.DefinitionStore(storeFile)
+    words = ["quam", "qvam/1", "ivno", "IUNO", "arma", "arma/2", "virvs", "missing", "missing/1"]
+    assert store.lookup(words) == {"quam": "how, than", "qvam/1": "how, than", "ivno": "Juno", "IUNO": "Juno",
+                                   "arma": "arms, weapons", "arma/2": "arms, weapons", "virvs": "poison"}
+    store.close()
+
+
+def testLookupOfMoreWordsThanABatch(tmp_path, monkeypatch):
+    monkeypatch.setattr(createDefRef, 'LOOKUP_BATCH_SIZE', 3)
+    storeFile = str(tmp_path / "definitions.sqlite")
+    rows = [("w" + str(i), "d" + str(i)) for i in range(20)]
+    createDefRef.writeStore(storeFile, rows)
+    store = createDefRef.DefinitionStore(storeFile)
+    words = ["w" + str(i) + "/1" for i in range(25)]
+    assert store.lookup(words) == {"w" + str(i) + "/1": "d" + str(i) for i in range(20)}
+    store.close()
+
+
+def testStoreIsCompiledOnceAndAgainWhenTheSpreadsheetChanges(definitions):
+    definitionsFile, reads = definitions
+    createDefRef.openDefinitions(definitionsFile).close()
+    createDefRef.openDefinitions(definitionsFile).close()
+    assert len(reads) == 1
+    stat = os.stat(definitionsFile)
+    os.utime(definitionsFile, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    createDefRef.openDefinitions(definitionsFile).close()
+    assert len(reads) == 2
+    # the compiled store is enough without the spreadsheet
+    os.remove(definitionsFile)
+    store = createDefRef.openDefinitions(definitionsFile)
+    assert store.lookup(["arma"]) == {"arma": "arms, weapons"}
+    store.close()
+    os.remove(os.path.splitext(definitionsFile)[0] + ".sqlite")
+    with pytest.raises(FileNotFoundError):
+        createDefRef.openDefinitions(definitionsFile)
+
+
+def testEveryTopicGetsDefinitions(makeCorpus, definitions, tmp_path):
+    definitionsFile, reads = definitions
+    corpus = makeCorpus(numTopics=5)
+    LDA.runLDA(corpus, 3, 0.5, 0.5, seed=15)
+    outputname = str(tmp_path / "topics")
+    corpus.outputAsCSV(outputname)
+    topics = createDefRef.readTopicWords(outputname + ".csv", 4)
+    assert topics == [[word for word, count in words] for words in corpus.topWords(4)]
+
+    # give one word of each topic a definition
+    definedWords = {words[0] for words in topics}
+    definedRows = [(word, "meaning of " + word) for word in definedWords]
+    createDefRef.writeStore(os.path.splitext(definitionsFile)[0] + ".sqlite", definedRows,
+                            os.stat(definitionsFile).st_mtime_ns)
+    outputFile = str(tmp_path / "defRefs.csv")
+    written, defined = createDefRef.makeDefRefs(outputname + ".csv", definitionsFile, outputFile, 4)
+    assert not reads
+    assert (written, defined) == (sum(len(words) for words in topics),
+                                  sum(word in definedWords for words in topics for word in words))
+    with open(outputFile, newline='') as csvfile:
+        rows = list(csv.reader(csvfile))
+    assert rows[0] == ['Topic', 'Word', 'Definition']
+    assert rows[1:] == [['Topic' + str(topic + 1), word, "meaning of " + word if word in definedWords else '']
+                        for topic, words in enumerate(topics) for word in words]
@@ -0,0 +1,87 @@
+"""
+Tests for the model metrics in evaluation.py.
+"""
+
+import math
+import numpy as np
+import pytest
+import LDA
+import evaluation
+import postings
+
+
+def sampledCorpus(makeCorpus, seed=21):
+    corpus = makeCorpus(stopBlacklist=["w0"])
+    LDA.runLDA(corpus, 5, 0.5, 0.1, seed=seed)
+    return corpus
+
+
+def testDistributionsAreNormalized(makeCorpus):
+    scores = evaluation.ModelEvaluation.fromCorpus(sampledCorpus(makeCorpus), 0.5, 0.1)
+    assert np.allclose(scores.phi.sum(axis=1), 1)
+    assert np.allclose(scores.theta.sum(axis=1), 1)
+    assert scores.corpusDistribution().sum() == pytest.approx(1)
+
+
+def testDivergencesAreSymmetricAndZeroForEqualDistributions():
+    rng = np.random.default_rng(22)
+    p, q = rng.dirichlet(np.ones(5), 3), rng.dirichlet(np.ones(5))
+    assert np.allclose(evaluation.jensenShannon(p, q), evaluation.jensenShannon(q, p))
+    assert np.allclose(evaluation.jensenShannon(p, p), 0)
+    assert (evaluation.jensenShannon(p, q) <= math.log(2)).all()
+    assert evaluation.klDivergence(np.array([0.5, 0.5, 0]), np.array([0.25, 0.25, 0.5])) == pytest.approx(math.log(2))
+
+
+def testCoherenceMatchesDocumentCounts(makeCorpus):
+    corpus = sampledCorpus(makeCorpus)
+    scores = evaluation.ModelEvaluation.fromCorpus(corpus, 0.5, 0.1)
+    coherence = scores.coherence(evaluation.CooccurrenceIndex(corpus.staticVocab, corpus.postings), 5)
+    docSets = [set(doc) for doc in corpus.wordLocArrayStatic]
+    numDocs = len(docSets)
+
+    def documents(*words):
+        return sum(all(word in doc for word in words) for doc in docSets)
+
+    for topic, words in enumerate(scores.topWords(5)):
+        umass, npmi = [], []
+        for i in range(1, len(words)):
+            for j in range(i):
+                together = documents(words[i], words[j])
+                umass.append(math.log((together + 1) / documents(words[j])))
+                if together == 0:
+                    npmi.append(-1.0)
+                elif together == numDocs:
+                    npmi.append(1.0)
+                else:
+                    joint = together / numDocs
+                    pmi = math.log(joint / (documents(words[i]) / numDocs * documents(words[j]) / numDocs))
+                    npmi.append(pmi / -math.log(joint))
+        assert coherence['umass'][topic] == pytest.approx(np.mean(umass))
+        assert coherence['npmi'][topic] == pytest.approx(np.mean(npmi))
+
+
+def testTopicsWithFewerThanTwoWordsScoreNan():
+    counts = np.array([[4, 0], [0, 0], [2, 0]])
+    scores = evaluation.ModelEvaluation(counts, np.array([[6, 0]]), ["a", "b", "c"], 0.1, 0.1)
+    index = evaluation.CooccurrenceIndex(["a", "b", "c"],
+                                         postings.Postings.build(np.array([0, 2, 0]), np.array([0, 3]), 3))
+    coherence = scores.coherence(index)
+    assert not np.isnan(coherence['umass'][0]) and np.isnan(coherence['umass'][1])
+    report = scores.report(index)
+    assert report['per topic'][1]['umass'] is None and report['mean umass'] == coherence['umass'][0]
+
+
+def testModelsOfOneTextShareAnIndex(makeCorpus, tmp_path, monkeypatch):
+    for name, seed in (("first", 23), ("second", 24)):
+        corpus = sampledCorpus(makeCorpus, seed)
+        LDA.writeOutputs(corpus, "random.csv", corpus.numTopics, 5, 0.5, 0.1, str(tmp_path / name), [[], [], []],
+                         "both")
+    built = []
+    fromModel = evaluation.CooccurrenceIndex.fromModel
+    monkeypatch.setattr(evaluation.CooccurrenceIndex, 'fromModel', lambda model: built.append(1) or fromModel(model))
+    reports = evaluation.evaluateModels([str(tmp_path)])
+    assert len(reports) == 4 and len(built) == 1
+    jsonReport, binaryReport = reports[str(tmp_path / "first.json")], reports[str(tmp_path / "first.model")]
+    assert jsonReport['mean umass'] == pytest.approx(binaryReport['mean umass'])
+    assert [topic['top words'] for topic in jsonReport['per topic']] == [
+        topic['top words'] for topic in binaryReport['per topic']]
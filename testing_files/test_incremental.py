@@ -0,0 +1,94 @@
+"""
+Tests for incremental updates of a trained model in incremental.py.
+"""
+
+import numpy as np
+import pytest
+import LDA
+import incremental
+import modelStore
+from conftest import corpusRows
+
+PUNC_DATA = [["Alpha,", "(beta)"], [3.0, 17.0], [12, 40]]
+
+
+@pytest.fixture
+def model(makeCorpus, tmp_path):
+    """A sampled model of words w0 to w49, with w0 and w3 as stopwords."""
+    corpus = makeCorpus(stopBlacklist=["w0", "w3"])
+    LDA.runLDA(corpus, 4, 0.5, 0.5, seed=12)
+    outputname = str(tmp_path / "model")
+    LDA.writeOutputs(corpus, "random.csv", corpus.numTopics, 4, 0.5, 0.5, outputname, PUNC_DATA, "binary")
+    return modelStore.loadModel(outputname + ".model")
+
+
+def newDocuments(numTopics):
+    """Returns new documents that use words w0 to w59, ten of which are new."""
+    newCorpus = LDA.CorpusData("new.csv", numTopics)
+    newCorpus.loadRows(corpusRows(12, 60, 13), "off", "off", [], [])
+    return newCorpus
+
+
+def update(model, newCorpus, stopWhitelist=(), stopBlacklist=(), **options):
+    return incremental.updateModel(model, newCorpus, "updated.csv", "off", "off", list(stopWhitelist),
+                                   list(stopBlacklist), foldInSweeps=2, sweeps=3, seed=14, **options)
+
+
+def testUpdatedCorpusHoldsOldThenNewDocuments(model, checkCounts):
+    newCorpus = newDocuments(model.numTopics)
+    newTokens = len(newCorpus.staticTokenIds)
+    corpus = update(model, newCorpus)
+    checkCounts(corpus)
+    numOldTokens = len(model.array('tokenIds'))
+    assert corpus.numDocs == model.numDocs + newCorpus.numDocs
+    assert len(corpus.staticTokenIds) == numOldTokens + newTokens
+    staticVocab = np.array(corpus.staticVocab)
+    assert list(staticVocab[corpus.staticTokenIds[:numOldTokens]]) == [
+        model.vocab[word] for word in model.array('tokenIds')]
+    assert list(staticVocab[corpus.staticTokenIds[numOldTokens:]]) == [
+        newCorpus.staticVocab[word] for word in newCorpus.staticTokenIds]
+    assert np.array_equal(corpus.staticDocOffsets[:model.numDocs + 1], model.array('docOffsets'))
+    assert corpus.docTotalWordCounts[model.numDocs:] == newCorpus.docTotalWordCounts
+    assert corpus.vocab[:len(model.topicWordCounts)] == model.vocab[:len(model.topicWordCounts)]
+
+
+def testOldWordsKeepTheirStopwordStatus(model):
+    newCorpus = newDocuments(model.numTopics)
+    newWords = sorted(set(newCorpus.staticVocab) - set(model.vocab))
+    assert newWords
+    corpus = update(model, newCorpus, stopWhitelist=["w0"], stopBlacklist=["w1", newWords[0]])
+    assert {"w0", "w3", newWords[0]} <= corpus.stopwords
+    assert "w1" in corpus.vocab and "w1" not in corpus.stopwords
+    assert set(newWords[1:]) <= set(corpus.vocab)
+    stopIds = [corpus.staticVocab.index(word) for word in ("w0", "w3", newWords[0])]
+    assert not corpus.keepMask[np.isin(corpus.staticTokenIds, stopIds)].any()
+
+
+def testOldTopicsStayFixedWithoutOldDocumentSample(model):
+    corpus = update(model, newDocuments(model.numTopics), oldSample=0)
+    oldTopics = model.array('topicIds')
+    numOld = np.count_nonzero(oldTopics >= 0)
+    assert np.array_equal(corpus.tokenTopics[:numOld], oldTopics[oldTopics >= 0])
+    assert np.all((corpus.tokenTopics >= 0) & (corpus.tokenTopics < model.numTopics))
+
+
+def testUpdateIsReproducible(model):
+    first = update(model, newDocuments(model.numTopics))
+    second = update(model, newDocuments(model.numTopics))
+    assert np.array_equal(first.tokenTopics, second.tokenTopics)
+
+
+def testUpdatedModelCanBeWrittenAndExtendedAgain(model, tmp_path, checkCounts):
+    corpus = update(model, newDocuments(model.numTopics))
+    puncData = incremental.extendPuncData(model, [["Gamma."], [2.0], [5]])
+    numOldTokens = len(model.array('tokenIds'))
+    assert puncData == [PUNC_DATA[0] + ["Gamma."], PUNC_DATA[1] + [2.0 + numOldTokens],
+                        PUNC_DATA[2] + [5 + numOldTokens]]
+    outputname = str(tmp_path / "updated")
+    LDA.writeOutputs(corpus, "random.csv", corpus.numTopics, 7, 0.5, 0.5, outputname, puncData, "binary")
+    updated = modelStore.loadModel(outputname + ".model")
+    assert updated.numDocs == corpus.numDocs
+    assert updated.wordList('puncAndCap') == puncData[0]
+    again = update(updated, newDocuments(model.numTopics))
+    checkCounts(again)
+    assert again.numDocs == corpus.numDocs + newDocuments(model.numTopics).numDocs
@@ -0,0 +1,80 @@
+"""
+Tests for folding new documents into a trained model in inference.py.
+"""
+
+import types
+import numpy as np
+import pytest
+import LDA
+import inference
+import modelStore
+import samplers
+
+# two topics with no words in common
+VOCAB = ["a0", "a1", "a2", "b0", "b1", "b2"]
+COUNTS = np.array([[30, 0], [20, 0], [10, 0], [0, 30], [0, 20], [0, 10]])
+
+
+def disjointInferencer(alpha=0.1, beta=0.01):
+    return inference.TopicInferencer.fromCorpus(types.SimpleNamespace(n_wt=COUNTS, vocab=VOCAB), alpha, beta)
+
+
+def testDocumentsOfOneTopicAreInferredToBeAboutIt():
+    distributions = disjointInferencer().infer([["a0", "A1", "a2"] * 5, ["b0", "b2"] * 6, ["a0", "b0"] * 8],
+                                               iterations=20, seed=0)
+    assert distributions.shape == (3, 2)
+    assert np.allclose(distributions.sum(axis=1), 1)
+    assert distributions[0, 0] > 0.9 and distributions[1, 1] > 0.9
+    assert 0.3 < distributions[2, 0] < 0.7
+
+
+def testUnknownWordsAreLeftOut():
+    inferencer = disjointInferencer()
+    tokenIds, docOffsets = inferencer.encode([["a0", "zzz", "b1"], ["zzz"], []])
+    assert tokenIds.tolist() == [0, 4] and docOffsets.tolist() == [0, 2, 2, 2]
+    distributions = inferencer.infer([["zzz"], []], iterations=4, seed=1)
+    assert np.allclose(distributions, 0.5)
+    assert np.isnan(inferencer.perplexity([["zzz"]], iterations=2, seed=1))
+
+
+def testFoldInBlocksHoldOneTokenOfEachDocument():
+    docOffsets = np.array([0, 50, 53, 120, 121])
+    tokenDocs = samplers.tokenDocIndex(docOffsets)
+    order, blockStarts = samplers.blockSchedule(docOffsets, 3, tokenDocs, stripeLength=1)
+    assert sorted(order.tolist()) == list(range(121))
+    for start, stop in zip(blockStarts[:-1], blockStarts[1:]):
+        blockDocs = tokenDocs[order[start:stop]]
+        assert 0 < len(blockDocs) <= 3 and len(set(blockDocs.tolist())) == len(blockDocs)
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def testSeededInferenceIsRepeatable(workers):
+    docs = [["a0", "b1", "a2"], ["b0"] * 4, ["a1", "a1", "b2"]]
+    first = disjointInferencer().infer(docs, iterations=6, seed=2, workers=workers)
+    assert np.array_equal(first, disjointInferencer().infer(docs, iterations=6, seed=2, workers=workers))
+    # with a large beta every topic is likely, so the order of the draws matters
+    blocked = disjointInferencer(beta=50).infer(docs, iterations=6, seed=2, workers=workers, blockSize=1)
+    assert np.array_equal(blocked, disjointInferencer(beta=50).infer(docs, iterations=6, seed=2, workers=workers,
+                                                                     blockSize=1))
+    assert not np.array_equal(blocked, disjointInferencer(beta=50).infer(docs, iterations=6, seed=2,
+                                                                         workers=workers))
+    if workers > 1:
+        # each worker samples its chunk with the caller's block size
+        chunks = np.array_split(np.arange(len(docs)), workers)
+        seeds = np.random.SeedSequence(2).spawn(workers)
+        serial = [disjointInferencer(beta=50).infer([docs[d] for d in chunk], 6, chunkSeed, blockSize=1)
+                  for chunk, chunkSeed in zip(chunks, seeds)]
+        assert np.array_equal(blocked, np.vstack(serial))
+
+
+def testSavedModelScoresItsOwnDocuments(makeCorpus, tmp_path):
+    corpus = makeCorpus()
+    LDA.runLDA(corpus, 10, 0.5, 0.1, seed=3)
+    outputname = str(tmp_path / "model")
+    LDA.writeOutputs(corpus, "random.csv", corpus.numTopics, 10, 0.5, 0.1, outputname, [[], [], []], "binary")
+    docs = corpus.wordLocationArray[:5]
+    distributions = inference.inferTopics(outputname + ".model", docs, iterations=10, seed=4)
+    assert distributions.shape == (5, corpus.numTopics)
+    assert np.allclose(distributions.sum(axis=1), 1)
+    inferencer = inference.TopicInferencer(modelStore.loadModel(outputname + ".model"))
+    assert 1 < inferencer.perplexity(docs, iterations=10, seed=4) < len(corpus.vocab)
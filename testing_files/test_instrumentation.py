@@ -0,0 +1,97 @@
+"""
+Tests for the phase and sweep metrics and the profiling modes in instrumentation.py.
+"""
+
+import json
+import os
+import pytest
+import LDA
+import instrumentation
+
+
+@pytest.fixture
+def recorder():
+    """Returns a MetricsRecorder registered as a hook for the length of the test."""
+    recorder = instrumentation.MetricsRecorder()
+    instrumentation.addHook(recorder)
+    yield recorder
+    instrumentation.removeHook(recorder)
+
+
+def testLoadingAndSamplingAreRecorded(makeCorpus, recorder):
+    corpus = makeCorpus(stopBlacklist=["w1"])
+    LDA.runLDA(corpus, 3, 0.5, 0.5, seed=17)
+    summary = recorder.summary()
+    for name in ('load', 'postings', 'stopword filtering', 'initialization'):
+        assert summary['phases'][name]['count'] == 1
+        assert summary['phases'][name]['wall'] >= 0 and summary['phases'][name]['cpu'] >= 0
+    assert summary['phases']['initialization']['tokens'] == len(corpus.tokenIds)
+    assert [sweep['iteration'] for sweep in summary['sweeps']] == [1, 2, 3]
+    assert all(sweep['tokens'] == len(corpus.tokenIds) for sweep in summary['sweeps'])
+    assert summary['sampling']['sweeps'] == 3
+    assert summary['sampling']['tokens per second'] > 0
+
+
+def testPhasesAddUpAcrossRepeats(recorder):
+    for count in range(3):
+        with instrumentation.phase('step', items=count):
+            pass
+    totals = recorder.summary()['phases']['step']
+    assert totals['count'] == 3 and totals['items'] == 2
+
+
+def testNoEventsWithoutHooks(monkeypatch):
+    events = []
+    monkeypatch.setattr(instrumentation, 'emit', events.append)
+    with instrumentation.phase('unwatched'):
+        pass
+    instrumentation.sweepDone(1, 1, 0.1, 0.1, 10)
+    assert events == []
+
+
+def testMetricsFileHoldsSettingsAndSummary(recorder, tmp_path):
+    instrumentation.sweepDone(1, 2, 0.5, 0.25, 100)
+    instrumentation.sweepDone(2, 2, 0.5, 0.25, 100)
+    fileName = str(tmp_path / "metrics.json")
+    recorder.write(fileName, {'topics': 4})
+    with open(fileName) as infile:
+        metrics = json.load(infile)
+    assert metrics['settings'] == {'topics': 4}
+    assert metrics['sampling'] == {'sweeps': 2, 'wall': 1.0, 'cpu': 0.5, 'tokens per second': 200.0}
+    assert metrics['sweeps'][0]['tokens per second'] == 200.0
+
+
+def testLogEventPrintsOneJsonLine(capsys):
+    instrumentation.logEvent({'event': 'phase', 'name': 'load', 'wall': 1.5})
+    lines = capsys.readouterr().out.splitlines()
+    assert len(lines) == 1
+    event = json.loads(lines[0])
+    assert event['name'] == 'load' and event['wall'] == 1.5 and 'time' in event
+
+
+def testProgressModeIsChecked(monkeypatch):
+    monkeypatch.setattr(instrumentation, '_progressMode', "auto")
+    instrumentation.setProgressMode("log")
+    assert not instrumentation.useProgressBar()
+    instrumentation.setProgressMode("bar")
+    assert instrumentation.useProgressBar()
+    with pytest.raises(ValueError):
+        instrumentation.setProgressMode("quiet")
+
+
+@pytest.mark.parametrize('mode, suffix', [('cprofile', '.prof'), ('tracemalloc', '-memory.json')])
+def testProfileIsWrittenAndReported(recorder, tmp_path, mode, suffix):
+    outputname = str(tmp_path / "run")
+    with instrumentation.profiling(mode, outputname):
+        sum(range(1000))
+    assert os.path.exists(outputname + suffix)
+    profiles = recorder.summary()['profiles']
+    assert len(profiles) == 1 and profiles[0]['mode'] == mode and profiles[0]['file'] == outputname + suffix
+    if mode == 'tracemalloc':
+        assert profiles[0]['peak bytes'] >= profiles[0]['current bytes'] >= 0
+
+
+def testUnknownProfileModeIsRefused(tmp_path):
+    with pytest.raises(ValueError):
+        with instrumentation.profiling("perf", str(tmp_path / "run")):
+            pass
@@ -0,0 +1,37 @@
+"""
+Tests for the binary model format in modelStore.py.
+"""
+
+import json
+import numpy as np
+import LDA
+import modelStore
+
+PUNC_DATA = [["Alpha,", "(beta)"], [3.0, 17.0], [12, 40]]
+
+
+def writeModel(makeCorpus, tmp_path):
+    """Samples a corpus with stopwords and writes it in both formats."""
+    corpus = makeCorpus(stopBlacklist=["w0", "w3", "missing"])
+    LDA.runLDA(corpus, 3, 0.5, 0.5, seed=11)
+    outputname = str(tmp_path / "model")
+    LDA.writeOutputs(corpus, "random.csv", corpus.numTopics, 3, 0.5, 0.5, outputname, PUNC_DATA, "both")
+    return outputname
+
+
+def testBinaryModelMatchesJsonModel(makeCorpus, tmp_path):
+    outputname = writeModel(makeCorpus, tmp_path)
+    with open(outputname + ".json") as infile:
+        jsonModel = json.load(infile)
+    assert modelStore.loadModel(outputname + ".model").toDict() == jsonModel
+    assert modelStore.loadModel(outputname + ".json").toDict() == jsonModel
+
+
+def testJsonModelSavedAsBinaryMatchesBinaryModel(makeCorpus, tmp_path):
+    outputname = writeModel(makeCorpus, tmp_path)
+    modelStore.loadModel(outputname + ".json").save(str(tmp_path / "converted.model"))
+    converted = modelStore.loadModel(str(tmp_path / "converted.model"))
+    written = modelStore.loadModel(outputname + ".model")
+    assert converted.vocab == written.vocab
+    for name in modelStore.ARRAYS + modelStore.POSTINGS_ARRAYS:
+        assert np.array_equal(converted.array(name), written.array(name))
@@ -0,0 +1,79 @@
+"""
+Tests for online variational Bayes LDA in onlineLDA.py and runOnlineLDA.
+"""
+
+import csv
+import json
+import math
+import numpy as np
+import LDA
+import modelStore
+import onlineLDA
+from conftest import corpusRows
+
+EULER_GAMMA = 0.5772156649015329
+
+
+def writeRows(rows, fileName):
+    with open(fileName, 'w', newline='') as csvfile:
+        csv.writer(csvfile).writerows(rows)
+    return fileName
+
+
+def testDigammaMatchesKnownValues():
+    x = np.array([0.5, 1.0, 2.0, 7.5, 30.0])
+    # psi(x + 1) = psi(x) + 1 / x from psi(1) = -gamma and psi(1/2) = -gamma - 2 log 2
+    expected = [-EULER_GAMMA - 2 * math.log(2), -EULER_GAMMA, 1 - EULER_GAMMA]
+    assert np.allclose(onlineLDA.digamma(x[:3]), expected, atol=1e-10)
+    # and from the slope of lgamma elsewhere
+    slopes = [(math.lgamma(v + 1e-6) - math.lgamma(v - 1e-6)) / 2e-6 for v in x[3:]]
+    assert np.allclose(onlineLDA.digamma(x[3:]), slopes, atol=1e-6)
+
+
+def testUpdateKeepsPositiveParametersOfEveryWord():
+    vocab = ["w" + str(i) for i in range(20)]
+    model = onlineLDA.OnlineLDA(vocab, 3, 10, 0.1, 0.01, np.random.default_rng(0))
+    rng = np.random.default_rng(1)
+    model.update([rng.integers(0, 20, 15) for doc in range(4)] + [np.zeros(0, dtype=np.int64)])
+    assert model.updates == 1
+    assert model.wordTopicWeights.shape == model.expElogBeta.shape == (20, 3)
+    assert (model.wordTopicWeights > 0).all()
+    topics = model.documentTopics(np.array([0, 5, 5, 19]))
+    assert len(topics) == 4 and ((topics >= 0) & (topics < 3)).all()
+
+
+def testTopicsOfDisjointVocabulariesSeparate(tmp_path):
+    rng = np.random.default_rng(2)
+    rows = []
+    for doc in range(40):
+        prefix = "a" if doc % 2 else "b"
+        rows.extend((prefix + str(word), str(doc)) for word in rng.integers(0, 8, 30))
+    model = LDA.runOnlineLDA(writeRows(rows, str(tmp_path / "disjoint.csv")), 2, 10, 0.5, 0.1, "off", "off", [], [],
+                             seed=3, batchSize=8)
+    best = model.wordTopicWeights.argmax(axis=1)
+    groups = [{best[i] for i, word in enumerate(model.vocab) if word[0] == prefix} for prefix in "ab"]
+    assert len(groups[0]) == len(groups[1]) == 1 and groups[0] != groups[1]
+
+
+def testOnlineOutputsMatchTheirSourceInBothFormats(tmp_path):
+    rows = corpusRows(20, 40, 6)
+    source = writeRows(rows, str(tmp_path / "random.csv"))
+    model = LDA.runOnlineLDA(source, 3, 2, 0.5, 0.5, "off", "off", [], ["w1"], seed=4)
+    assert "w1" in model.stopwords and "w1" not in model.wordIds
+    outputname = str(tmp_path / "online")
+    numTokens, numDocs = LDA.writeOnlineOutputs(model, source, 3, 2, 0.5, 0.5, outputname, [[], [], []], "both")
+
+    with open(outputname + ".json") as infile:
+        written = json.load(infile)
+    docWords = [words for label, words in LDA.readDocuments(source)]
+    assert numDocs == len(docWords) == 20
+    assert written['wordsByLocationWithStopwords'] == docWords
+    topics = written['topicsByLocationWithStopwords']
+    for words, wordTopics in zip(docWords, topics):
+        assert [topic == -1 for topic in wordTopics] == [word == "w1" for word in words]
+        assert all(-1 <= topic < 3 for topic in wordTopics)
+    assert numTokens == sum(topic >= 0 for wordTopics in topics for topic in wordTopics)
+    assert sum(sum(counts.values()) for counts in written['topicWordInstancesDict']) == numTokens
+    binary = modelStore.loadModel(outputname + ".model").toDict()
+    for key in ('wordsByLocationWithStopwords', 'topicsByLocationWithStopwords', 'topicWordInstancesDict'):
+        assert binary[key] == written[key]
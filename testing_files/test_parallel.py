@@ -0,0 +1,28 @@
+"""
+Tests for the AD-LDA sampler in parallel.py.
+"""
+
+import numpy as np
+import LDA
+import parallel
+
+
+def testPartitionsCoverEveryDocumentOnce(makeCorpus):
+    corpus = makeCorpus()
+    partitions = parallel.partitionDocs(corpus.docOffsets, 3)
+    assert partitions[0][0] == 0 and partitions[-1][1] == corpus.numDocs
+    assert all(previous[1] == following[0] for previous, following in zip(partitions, partitions[1:]))
+
+
+def testParallelRunKeepsCountsConsistent(makeCorpus, checkCounts):
+    corpus = makeCorpus()
+    LDA.runLDA(corpus, 3, 0.5, 0.5, seed=6, workers=2)
+    checkCounts(corpus)
+
+
+def testParallelRunIsReproducible(makeCorpus):
+    first, second = makeCorpus(), makeCorpus()
+    for corpus in (first, second):
+        LDA.runLDA(corpus, 3, 0.5, 0.5, seed=7, workers=2)
+    assert np.array_equal(first.tokenTopics, second.tokenTopics)
+    assert np.array_equal(first.n_wt, second.n_wt)
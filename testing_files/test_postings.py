@@ -0,0 +1,64 @@
+"""
+Tests for the inverted index in postings.py.
+"""
+
+import numpy as np
+import pytest
+import LDA
+import modelStore
+import postings
+
+
+def randomText(seed=25, numDocs=40, vocabSize=30):
+    rng = np.random.default_rng(seed)
+    docLengths = rng.integers(0, 25, numDocs)
+    docOffsets = np.zeros(numDocs + 1, dtype=np.int64)
+    np.cumsum(docLengths, out=docOffsets[1:])
+    tokenIds = rng.integers(0, vocabSize - 2, docOffsets[-1]).astype(np.int32)
+    return tokenIds, docOffsets, vocabSize
+
+
+def testIndexListsEveryOccurrenceInCorpusOrder():
+    tokenIds, docOffsets, vocabSize = randomText()
+    index = postings.Postings.build(tokenIds, docOffsets, vocabSize)
+    assert index.vocabSize == vocabSize and index.numDocs == len(docOffsets) - 1
+    docs = [tokenIds[docOffsets[d]:docOffsets[d + 1]].tolist() for d in range(index.numDocs)]
+    frequency = index.documentFrequency()
+    for word in range(vocabSize):
+        expected = [(d, p) for d, doc in enumerate(docs) for p, w in enumerate(doc) if w == word]
+        wordDocs, positions = index.locations(word)
+        assert list(zip(wordDocs.tolist(), positions.tolist())) == expected
+        assert index.wordDocuments(word).tolist() == sorted({d for d, p in expected})
+        assert frequency[word] == len({d for d, p in expected})
+
+
+@pytest.mark.parametrize('blockSize', [3, postings.COOCCURRENCE_BLOCK_SIZE])
+def testCooccurrencesCountSharedDocuments(monkeypatch, blockSize):
+    monkeypatch.setattr(postings, 'COOCCURRENCE_BLOCK_SIZE', blockSize)
+    tokenIds, docOffsets, vocabSize = randomText(26)
+    index = postings.Postings.build(tokenIds, docOffsets, vocabSize)
+    docSets = [set(tokenIds[docOffsets[d]:docOffsets[d + 1]].tolist()) for d in range(index.numDocs)]
+    wordIds = [4, 0, vocabSize - 1, 7, -1]
+    expected = [[sum(i in doc and j in doc for doc in docSets) for j in wordIds] for i in wordIds]
+    assert index.cooccurrences(wordIds).tolist() == expected
+
+
+def testRenumberedIndexMatchesIndexOfRenumberedText():
+    tokenIds, docOffsets, vocabSize = randomText(27)
+    newIds = np.random.default_rng(28).permutation(vocabSize).astype(np.int32)
+    renumbered = postings.Postings.build(tokenIds, docOffsets, vocabSize).renumber(newIds)
+    expected = postings.Postings.build(newIds[tokenIds], docOffsets, vocabSize)
+    for name in ('offsets', 'docs', 'positions'):
+        assert np.array_equal(getattr(renumbered, name), getattr(expected, name))
+
+
+def testModelIndexMatchesItsText(makeCorpus, tmp_path):
+    corpus = makeCorpus(stopBlacklist=["w1"])
+    LDA.runLDA(corpus, 2, 0.5, 0.5, seed=29)
+    outputname = str(tmp_path / "model")
+    LDA.writeOutputs(corpus, "random.csv", corpus.numTopics, 2, 0.5, 0.5, outputname, [[], [], []], "both")
+    saved = modelStore.loadModel(outputname + ".model").postings()
+    built = modelStore.loadModel(outputname + ".json").postings()
+    for index in (saved, built):
+        for name in ('offsets', 'docs', 'positions'):
+            assert np.array_equal(getattr(index, name), getattr(corpus.postings, name))
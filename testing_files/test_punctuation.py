@@ -0,0 +1,70 @@
+"""
+Tests that the line-by-line punctuation and newline scanner, grabPuncAndCap,
+finds what the original whole-file scanner found.
+"""
+
+import pytest
+import LDA
+
+# the marks the original scanner checked for, one by one
+PUNCTUATION = '.,!?"():;“”‘’\''
+
+TEXTS = ['Arma virumque cano, Troiae qui primus ab oris\nItaliam fato profugus\n',
+         '\n\n  \tLeading whitespace and Capitals.\n\n\nblank lines - above\n',
+         'tabs\tbetween\t\twords ; and ... lone — marks " here\n  indented Line\n',
+         '“Curly” ‘quotes’ and l\'apostrophe (parens) end!\nALLCAPS mIxEd 123 x.y\n\n',
+         'no newline at all until the end\n']
+
+
+def originalPuncAndCap(fileName):
+    """grabPuncAndCap as it was before it read the file a line at a time."""
+    fileString = open(fileName, 'r').read().split()
+    unsplitFile = open(fileName, 'r').read().lstrip(' \t\n')
+    newlineLocations = []
+    count = 0
+    trackToken = ''
+    for i in range(len(unsplitFile)):
+        if unsplitFile[i] == "\n":
+            if trackToken != '':
+                newlineLocations.append(count)
+                trackToken = ''
+                count += 1
+            else:
+                newlineLocations.append(newlineLocations[-1])
+        elif unsplitFile[i] == '\t' or unsplitFile[i] == ' ':
+            if unsplitFile[i + 1] not in '\t \n' and trackToken != '':
+                trackToken = ''
+                count += 1
+        else:
+            trackToken += unsplitFile[i]
+    puncAndCap = []
+    puncCapLocations = []
+    count = 0
+    for token in fileString:
+        allPunc = False
+        if any(char in PUNCTUATION for char in token) or any(ltr.isupper() for ltr in token):
+            allPunc = all(char in PUNCTUATION for char in token)
+            puncAndCap.append(token)
+            puncCapLocations.append(count - 0.5 if allPunc else count)
+        if not allPunc:
+            count += 1
+    return puncAndCap, puncCapLocations, newlineLocations
+
+
+@pytest.mark.parametrize('text', TEXTS)
+def testScannerMatchesOriginal(tmp_path, text):
+    fileName = str(tmp_path / "text.txt")
+    with open(fileName, 'w') as outfile:
+        outfile.write(text)
+    assert list(LDA.grabPuncAndCap(fileName)) == list(originalPuncAndCap(fileName))
+
+
+def testScannerFindsMarkedWordsAndLineEnds(tmp_path):
+    fileName = str(tmp_path / "text.txt")
+    with open(fileName, 'w') as outfile:
+        outfile.write("Arma virumque cano ,\n\nTroiae qui\n")
+    puncAndCap, puncCapLocations, newlineLocations = LDA.grabPuncAndCap(fileName)
+    assert puncAndCap == ["Arma", ",", "Troiae"]
+    # the lone comma sits between the third and fourth words
+    assert puncCapLocations == [0, 2.5, 3]
+    assert newlineLocations == [3, 3, 5]
@@ -0,0 +1,113 @@
+"""
+Tests for the model query server and its LRU cache in queryServer.py.
+"""
+
+import json
+import threading
+import urllib.error
+import urllib.request
+from http.server import ThreadingHTTPServer
+import pytest
+import LDA
+import queryServer
+
+
+@pytest.fixture
+def servedCorpus(makeCorpus, tmp_path):
+    """Returns a sampled corpus with stopwords, and a server holding it in both formats."""
+    corpus = makeCorpus(stopBlacklist=["w0"])
+    LDA.runLDA(corpus, 3, 0.5, 0.5, seed=30)
+    outputname = str(tmp_path / "model")
+    LDA.writeOutputs(corpus, "random.csv", corpus.numTopics, 3, 0.5, 0.5, outputname, [[], [], []], "both")
+    corpus.createAnnoTextDataStructure()
+    server = queryServer.ModelServer(cacheSize=8)
+    server.addModel(outputname + ".json", "json")
+    server.addModel(outputname + ".model")
+    return corpus, server
+
+
+def testCacheDropsTheLeastRecentlyUsedEntry():
+    cache = queryServer.LRUCache(2)
+    calls = []
+
+    def compute(value):
+        return lambda: calls.append(value) or value
+
+    assert cache.get('a', compute(1)) == 1 and cache.get('b', compute(2)) == 2
+    assert cache.get('a', compute(-1)) == 1
+    assert cache.get('c', compute(3)) == 3
+    assert list(cache.entries) == ['a', 'c']
+    assert cache.get('b', compute(4)) == 4
+    assert calls == [1, 2, 3, 4] and cache.hits == 1 and cache.misses == 4
+
+
+@pytest.mark.parametrize('name', ['json', 'model'])
+def testAnswersMatchTheCorpus(servedCorpus, name):
+    corpus, server = servedCorpus
+    topWords = corpus.topWords(5)
+    for topic in range(corpus.numTopics):
+        answer = server.topicWords(name, topic, 5)
+        assert [(word['word'], word['count']) for word in answer['top words']] == topWords[topic]
+        assert answer['words'] == corpus.n_t[topic]
+    answer = server.documentTopics(name, 3)
+    assert answer['counts'] == corpus.n_dt[3].tolist()
+    assert sum(answer['distribution']) == pytest.approx(1)
+    answer = server.passageTopics(name, 2, 1, 6)
+    assert answer['words'] == corpus.wordLocArrayStatic[2][1:6]
+    assert answer['topics'] == corpus.topicAssignByLocStatic[2][1:6]
+    assert server.passageTopics(name, 2)['words'] == corpus.wordLocArrayStatic[2]
+    docs, positions = corpus.postings.locations(corpus.staticVocab.index("w3"))
+    locations = [(entry['document'], location) for entry in server.wordLocations(name, "W3")['documents']
+                 for location in entry['locations']]
+    assert locations == list(zip(docs.tolist(), positions.tolist()))
+
+
+def testRepeatedQueriesAreAnsweredFromTheCache(servedCorpus):
+    corpus, server = servedCorpus
+    first = server.topicWords('model', 1, 5)
+    assert server.topicWords('model', 1, 5) is first
+    assert server.cache.hits == 1 and server.cache.misses == 1
+    server.topicWords('json', 1, 5)
+    assert server.cache.misses == 2
+
+
+def testUnknownQueriesAreRefused(servedCorpus):
+    corpus, server = servedCorpus
+    for query in (lambda: server.topicWords('missing', 0), lambda: server.topicWords('model', corpus.numTopics),
+                  lambda: server.documentTopics('model', corpus.numDocs), lambda: server.wordLocations('model', "zzz")):
+        with pytest.raises(queryServer.NotFoundError):
+            query()
+    for numWords in (0, -3):
+        with pytest.raises(ValueError):
+            server.topicWords('model', 0, numWords)
+
+
+def testQueriesAreServedOverHttp(servedCorpus):
+    corpus, server = servedCorpus
+    httpServer = ThreadingHTTPServer(('127.0.0.1', 0), queryServer.QueryHandler)
+    httpServer.modelServer = server
+    thread = threading.Thread(target=httpServer.serve_forever, daemon=True)
+    thread.start()
+    url = "http://127.0.0.1:" + str(httpServer.server_port)
+    try:
+        with urllib.request.urlopen(url + "/models") as response:
+            assert sorted(model['name'] for model in json.load(response)['models']) == ['json', 'model']
+        with urllib.request.urlopen(url + "/models/model/documents/2/passage?start=1&stop=6") as response:
+            assert json.load(response) == server.passageTopics('model', 2, 1, 6)
+        with urllib.request.urlopen(url + "/models/model/topics/0?words=3") as response:
+            assert json.load(response) == server.topicWords('model', 0, 3)
+        for query in ("/models/missing/topics/0", "/models/model/words/zzz", "/nothing"):
+            with pytest.raises(urllib.error.HTTPError) as error:
+                urllib.request.urlopen(url + query)
+            assert error.value.code == 404
+            error.value.close()
+        for query in ("/models/model/topics/0?words=-1", "/models/model/topics/0?words=many",
+                      "/models/model/documents/two", "/models/model/documents/2/passage?start=x"):
+            with pytest.raises(urllib.error.HTTPError) as error:
+                urllib.request.urlopen(url + query)
+            assert error.value.code == 400
+            assert "kth" not in json.load(error.value)['error']
+            error.value.close()
+    finally:
+        httpServer.shutdown()
+        httpServer.server_close()
@@ -0,0 +1,105 @@
+"""
+Tests for the sampling engines in samplers.py.
+"""
+
+import numpy as np
+import pytest
+import samplers
+
+
+@pytest.mark.parametrize('blockSize', [2, 7, 256])
+def testBlockScheduleHoldsOneStripeOfEachDocument(makeCorpus, blockSize):
+    corpus = makeCorpus()
+    order, blockStarts = samplers.blockSchedule(corpus.docOffsets, blockSize)
+    assert np.array_equal(np.sort(order), np.arange(len(corpus.tokenIds)))
+    assert blockStarts[0] == 0 and blockStarts[-1] == len(order)
+    tokenDocs = samplers.tokenDocIndex(corpus.docOffsets)
+    for start, stop in zip(blockStarts[:-1], blockStarts[1:]):
+        tokens = order[start:stop]
+        assert 0 < len(tokens) <= blockSize
+        for doc in np.unique(tokenDocs[tokens]):
+            stripe = tokens[tokenDocs[tokens] == doc]
+            # each stripe is a run of consecutive tokens of its document
+            assert np.array_equal(np.diff(stripe), np.ones(len(stripe) - 1))
+            assert blockSize > corpus.numDocs or len(stripe) == 1
+    if blockSize > corpus.numDocs:
+        # every document is cut into the same number of stripes, so the blocks stay full
+        assert len(blockStarts) - 1 <= -(-len(order) // (blockSize - corpus.numDocs))
+
+
+def testBlockScheduleOfManyDocumentsHoldsOneTokenOfEachDocument(makeCorpus):
+    corpus = makeCorpus()
+    order, blockStarts = samplers.blockSchedule(corpus.docOffsets, 256, stripeLength=1)
+    tokenDocs = samplers.tokenDocIndex(corpus.docOffsets)
+    sizes = np.diff(blockStarts)
+    assert all(len(np.unique(tokenDocs[order[start:stop]])) == stop - start
+               for start, stop in zip(blockStarts[:-1], blockStarts[1:]))
+    # every document has a first token, so the first block holds all of them
+    assert sizes[0] == corpus.numDocs
+    assert np.array_equal(samplers.blockSchedule(corpus.docOffsets, 16)[1],
+                          samplers.blockSchedule(corpus.docOffsets, 16, stripeLength=1)[1])
+
+
+def testBlockScheduleOfOneKeepsCorpusOrder(makeCorpus):
+    corpus = makeCorpus()
+    order, blockStarts = samplers.blockSchedule(corpus.docOffsets, 1)
+    assert np.array_equal(order, np.arange(len(corpus.tokenIds)))
+    assert blockStarts == list(range(len(corpus.tokenIds) + 1))
+
+
+@pytest.mark.parametrize('blockSize', [1, 256])
+def testGibbsSweepKeepsCountsConsistent(makeCorpus, checkCounts, blockSize):
+    corpus = makeCorpus()
+    rng = np.random.default_rng(1)
+    for iteration in range(3):
+        samplers.gibbsSweep(corpus, 0.5, 0.5, rng, blockSize)
+    checkCounts(corpus)
+
+
+def testGibbsSweepIsReproducible(makeCorpus):
+    first, second = makeCorpus(), makeCorpus()
+    for corpus in (first, second):
+        rng = np.random.default_rng(2)
+        for iteration in range(3):
+            samplers.gibbsSweep(corpus, 0.5, 0.5, rng)
+    assert np.array_equal(first.tokenTopics, second.tokenTopics)
+    assert not np.array_equal(first.tokenTopics, makeCorpus().tokenTopics)
+
+
+def testMhSweepKeepsCountsConsistent(makeCorpus, checkCounts):
+    corpus = makeCorpus(numTopics=12)
+    rng = np.random.default_rng(3)
+    for iteration in range(3):
+        samplers.mhSweep(corpus, 0.5, 0.5, rng)
+    checkCounts(corpus)
+
+
+def testMhSweepIsReproducible(makeCorpus):
+    first, second = makeCorpus(numTopics=12), makeCorpus(numTopics=12)
+    for corpus in (first, second):
+        rng = np.random.default_rng(4)
+        for iteration in range(3):
+            samplers.mhSweep(corpus, 0.5, 0.5, rng)
+    assert np.array_equal(first.tokenTopics, second.tokenTopics)
+
+
+def testWordProposalDrawsOnlyTopicsWithMass():
+    # every topic holds words, so with a tiny beta the smoothing bucket is never chosen
+    tokenIds = np.array([0, 0, 0, 1, 1, 1, 1, 1, 2, 2, 2, 2])
+    tokenTopics = np.array([0, 0, 0, 2, 2, 2, 2, 2, 1, 1, 1, 1])
+    proposal = samplers.WordProposal(tokenIds, tokenTopics, np.array([3, 4, 5]), 1e-9)
+    rng = np.random.default_rng(5)
+    words = np.array([0, 1] * 50)
+    topics = proposal.draw(words, rng.random(len(words)), rng.random(len(words)))
+    assert np.array_equal(topics, np.where(words == 0, 0, 2))
+
+
+def testWordProposalWeightsMatchTheCountsOfTheTokens():
+    tokenIds = np.array([0, 1, 0, 2, 1, 0])
+    tokenTopics = np.array([1, 0, 1, 2, 2, 0])
+    n_wt = np.zeros((3, 3))
+    np.add.at(n_wt, (tokenIds, tokenTopics), 1)
+    n_t = n_wt.sum(axis=0)
+    proposal = samplers.WordProposal(tokenIds, tokenTopics, n_t, 0.1)
+    words, topics = np.repeat(np.arange(3), 3), np.tile(np.arange(3), 3)
+    assert np.allclose(proposal.weight(words, topics), (n_wt[words, topics] + 0.1) / (n_t[topics] + 0.1))
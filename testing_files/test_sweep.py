@@ -0,0 +1,65 @@
+"""
+Tests for the hyperparameter sweep runner in sweep.py.
+"""
+
+import csv
+import json
+import sys
+import numpy as np
+import sweep
+from conftest import corpusRows
+
+STOPWORDS = {"lower limit": "off", "upper limit": "off", "whitelist": [], "blacklist": []}
+
+
+def sweepConfig(tmp_path, grid):
+    return {"required parameters": {"source": str(tmp_path / "random.csv"), "iterations": 2, "topics": 3,
+                                    "output name": str(tmp_path / "out")},
+            "stopword options": STOPWORDS,
+            "chunking options": {"using csv": "on"},
+            "hyperparameters": {"alpha": 0.5, "beta": 0.1},
+            "sampler options": {"seed": 5},
+            "sweep": grid}
+
+
+def testGridHoldsEveryCombinationOnce(tmp_path):
+    otherStopwords = dict(STOPWORDS, blacklist=["w1"])
+    grid = {"topics": [2, 4], "alpha": [0.1, 0.5, 1], "stopword options": [STOPWORDS, otherStopwords]}
+    config = sweepConfig(tmp_path, grid)
+    stopwordSets, runs = sweep.gridRuns(config)
+    assert stopwordSets == [STOPWORDS, otherStopwords]
+    assert len(runs) == 12
+    assert len({run['output name'] for run in runs}) == 12
+    assert {(run['topics'], run['alpha'], run['stopword set']) for run in runs} == {
+        (topics, alpha, stopwordSet) for topics in (2, 4) for alpha in (0.1, 0.5, 1) for stopwordSet in (0, 1)}
+    assert all(run['iterations'] == 2 and run['beta'] == 0.1 for run in runs)
+    assert runs[0]['output name'] == str(tmp_path / "out") + "-2-2-0.1-0.1-stopwords1"
+
+
+def testGridWithoutSweptStopwordsKeepsPlainNames(tmp_path):
+    stopwordSets, runs = sweep.gridRuns(sweepConfig(tmp_path, {"beta": [0.1, 0.2]}))
+    assert stopwordSets == [STOPWORDS]
+    outputname = str(tmp_path / "out")
+    assert [run['output name'] for run in runs] == [outputname + "-2-3-0.5-0.1", outputname + "-2-3-0.5-0.2"]
+
+
+def testSweepWritesEveryModelAndItsListing(tmp_path, monkeypatch):
+    with open(tmp_path / "random.csv", 'w', newline='') as csvfile:
+        csv.writer(csvfile).writerows(corpusRows(20, 30, 7))
+    grid = {"topics": [2, 3], "stopword options": [STOPWORDS, dict(STOPWORDS, blacklist=["w0"])], "processes": 1}
+    config = sweepConfig(tmp_path, grid)
+    with open(tmp_path / "sweep.json", 'w') as configFile:
+        json.dump(config, configFile)
+    monkeypatch.setattr(sys, 'argv', ["sweep.py", str(tmp_path / "sweep.json")])
+    sweep.main()
+
+    with open(str(tmp_path / "out") + "-sweep.json") as infile:
+        listing = json.load(infile)
+    assert len(listing) == 4
+    for run in listing:
+        with open(run['output name'] + ".json") as infile:
+            model = json.load(infile)
+        assert model['topics'] == run['topics'] == len(model['topicWordInstancesDict'])
+        assert ("w0" in model['stopwords']) == (run['stopword options']['blacklist'] == ["w0"])
+        topics = np.concatenate([np.array(doc) for doc in model['topicsByLocationWithStopwords']])
+        assert topics.max() < run['topics'] and run['seconds'] >= 0
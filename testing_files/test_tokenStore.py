@@ -0,0 +1,89 @@
+"""
+Tests for the memory-mapped token store in tokenStore.py.
+"""
+
+import os
+import numpy as np
+import pytest
+import LDA
+import checkpoint
+import tokenStore
+from conftest import corpusRows
+from test_checkpoint import Interruption, InterruptAfter
+
+
+def holdCorpus(corpus, directory, blockTokens):
+    tokenStore.TokenStore(str(directory), blockTokens).hold(corpus)
+    return corpus
+
+
+def testDocumentBlocksCoverEveryDocumentOnce(makeCorpus):
+    docOffsets = makeCorpus().docOffsets
+    blocks = tokenStore.documentBlocks(docOffsets, 100)
+    assert blocks[0][0] == 0 and blocks[-1][1] == len(docOffsets) - 1
+    for firstDoc, lastDoc in blocks:
+        assert lastDoc == firstDoc + 1 or docOffsets[lastDoc] - docOffsets[firstDoc] <= 100
+    assert all(previous[1] == following[0] for previous, following in zip(blocks, blocks[1:]))
+
+
+def testHeldCorpusKeepsEveryTokenArrayOnDisk(makeCorpus, tmp_path):
+    corpus = holdCorpus(makeCorpus(), tmp_path, 100)
+    for array in (corpus.tokenIds, corpus.tokenTopics, corpus.docOffsets, corpus.staticTokenIds, corpus.keepMask,
+                  corpus.postings.docs, corpus.postings.positions):
+        assert isinstance(array, np.memmap)
+
+
+def testLoadingIntoStoreMatchesLoadingInMemory(tmp_path):
+    rows = corpusRows(30, 50, 3)
+    inMemory = LDA.CorpusData("random.csv", 4)
+    inMemory.loadRows(rows, 0.05, 0.5, [], ["w1"])
+    store = tokenStore.TokenStore(str(tmp_path), 100)
+    loaded = LDA.CorpusData("random.csv", 4)
+    loaded.loadRows(iter(rows), 0.05, 0.5, [], ["w1"], store)
+    assert loaded.tokenStore is store
+    assert not os.path.exists(os.path.join(str(tmp_path), tokenStore.RAW_TOKENS_FILE))
+    assert loaded.staticVocab == inMemory.staticVocab and loaded.vocab == inMemory.vocab
+    assert loaded.stopwords == inMemory.stopwords
+    assert loaded.docTotalWordCounts == inMemory.docTotalWordCounts
+    for name in ('tokenIds', 'tokenTopics', 'docOffsets', 'staticTokenIds', 'staticDocOffsets', 'keepMask', 'n_wt',
+                 'n_dt', 'n_t'):
+        assert np.array_equal(getattr(loaded, name), getattr(inMemory, name)), name
+    for name in ('offsets', 'docs', 'positions'):
+        assert np.array_equal(getattr(loaded.postings, name), getattr(inMemory.postings, name)), name
+    for array in (loaded.tokenIds, loaded.tokenTopics, loaded.staticTokenIds, loaded.keepMask, loaded.postings.docs):
+        assert isinstance(array, np.memmap)
+
+
+@pytest.mark.parametrize('sampler', ['gibbs', 'mh'])
+def testSingleBlockRunMatchesRunInMemory(makeCorpus, tmp_path, sampler):
+    inMemory = makeCorpus()
+    LDA.runLDA(inMemory, 3, 0.5, 0.5, seed=14, sampler=sampler)
+    held = holdCorpus(makeCorpus(), tmp_path, 1 << 20)
+    LDA.runLDA(held, 3, 0.5, 0.5, seed=14, sampler=sampler)
+    assert np.array_equal(held.tokenTopics, inMemory.tokenTopics)
+    assert np.array_equal(held.n_wt, inMemory.n_wt)
+
+
+def testRunInBlocksKeepsCountsConsistent(makeCorpus, checkCounts, tmp_path):
+    corpus = holdCorpus(makeCorpus(), tmp_path, 100)
+    LDA.runLDA(corpus, 3, 0.5, 0.5, seed=15)
+    corpus.createAnnoTextDataStructure()
+    expected = np.full(len(corpus.keepMask), -1, dtype=np.int32)
+    expected[np.asarray(corpus.keepMask)] = corpus.tokenTopics
+    assert np.array_equal(corpus.staticTopics, expected)
+    checkCounts(corpus)
+
+
+def testResumedRunInBlocksMatchesUninterruptedRun(makeCorpus, tmp_path, monkeypatch):
+    monkeypatch.setattr(checkpoint, 'LOAD_BLOCK_SIZE', 7)
+    checkpointFile = str(tmp_path / "run-checkpoint.npz")
+    uninterrupted = holdCorpus(makeCorpus(), tmp_path / "uninterrupted", 100)
+    LDA.runLDA(uninterrupted, 6, 0.5, 0.5, seed=16)
+    interrupted = holdCorpus(makeCorpus(), tmp_path / "interrupted", 100)
+    with pytest.raises(Interruption):
+        LDA.runLDA(interrupted, 6, 0.5, 0.5, seed=16, checkpointFile=checkpointFile, checkpointEvery=2,
+                   monitor=InterruptAfter(5))
+    resumed = holdCorpus(makeCorpus(), tmp_path / "resumed", 100)
+    LDA.runLDA(resumed, 6, 0.5, 0.5, seed=16, checkpointFile=checkpointFile, checkpointEvery=2, resume=True)
+    for name in ('tokenTopics', 'n_wt', 'n_dt', 'n_t'):
+        assert np.array_equal(getattr(resumed, name), getattr(uninterrupted, name))
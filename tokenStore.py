@@ -0,0 +1,295 @@
+"""
+A memory-mapped store for the per-token arrays of a corpus. The word id and
+topic of every token and the document offsets are moved out of memory into
+.npy files under a directory, word ids and topics as uint16 when they fit
+and uint32 otherwise, and runLDA streams them through the sampler one block
+of documents at a time. The arrays read only for the output files (the
+token ids with stopwords, the stopword mask and the inverted index) are
+moved into the store as well. While sampling, the memory used is then the
+count matrices plus one block, whatever the length of the corpus; the
+operating system pages the files in and out as the blocks are read and
+written back.
+
+A corpus can also be loaded straight into a store: CorpusData.loadRows then
+appends the word ids to a file here as it reads them, and the stopwords,
+renumbered ids, document offsets, inverted index and first topics are all
+worked out a block of documents at a time from that file, so the whole
+corpus is never in memory.
+"""
+
+import os
+import numpy as np
+import postings
+
+# most tokens in a block of documents streamed through the sampler, unless one document is longer
+DEFAULT_BLOCK_TOKENS = 1 << 20
+# the raw int32 word ids of a corpus being loaded into a store, stopwords included
+RAW_TOKENS_FILE = "allTokenIds.bin"
+
+
+def smallestDtype(numIds):
+    """Returns uint16 if ids from 0 to numIds - 1 fit in it, and uint32 otherwise."""
+    return np.uint16 if numIds <= np.iinfo(np.uint16).max + 1 else np.uint32
+
+
+def documentBlocks(docOffsets, blockTokens=DEFAULT_BLOCK_TOKENS):
+    """Splits a corpus into runs of whole documents.
+
+    Args:
+        docOffsets (numpy.ndarray): Document d owns tokens docOffsets[d] to docOffsets[d + 1].
+        blockTokens (int): The most tokens in a run, unless one document alone is longer.
+
+    Returns:
+        [(int, int)]: The first document of each run and the document after its last.
+
+    """
+    numDocs = len(docOffsets) - 1
+    blocks = []
+    firstDoc = 0
+    while firstDoc < numDocs:
+        lastDoc = int(np.searchsorted(docOffsets, docOffsets[firstDoc] + blockTokens, side='right')) - 1
+        lastDoc = min(max(lastDoc, firstDoc + 1), numDocs)
+        blocks.append((firstDoc, lastDoc))
+        firstDoc = lastDoc
+    return blocks
+
+
+class DocumentBlock:
+    """A run of whole documents of a corpus, read into memory to be sampled. It has
+        the attributes the sweeps of samplers.py use: its own tokens and document
+        offsets, the rows of n_dt for its documents, and the corpus' n_wt and n_t,
+        so a sweep over the block keeps the corpus' counts up to date.
+
+    """
+
+    def __init__(self, corpus, firstDoc, lastDoc):
+        self.start = int(corpus.docOffsets[firstDoc])
+        self.stop = int(corpus.docOffsets[lastDoc])
+        self.numTopics = corpus.numTopics
+        self.tokenIds = np.array(corpus.tokenIds[self.start:self.stop], dtype=np.int32)
+        self.tokenTopics = np.array(corpus.tokenTopics[self.start:self.stop], dtype=np.int32)
+        self.docOffsets = np.array(corpus.docOffsets[firstDoc:lastDoc + 1], dtype=np.int64) - self.start
+        self.n_wt = corpus.n_wt
+        self.n_dt = corpus.n_dt[firstDoc:lastDoc]
+        self.n_t = corpus.n_t
+        self.moveListener = corpus.moveListener
+
+
+class TokenStore:
+    """The files holding the token arrays of one corpus."""
+
+    def __init__(self, directory, blockTokens=DEFAULT_BLOCK_TOKENS):
+        """Opens a store directory, creating it if needed.
+
+        Args:
+            directory (str): The directory the files are kept in.
+            blockTokens (int): The most tokens streamed through the sampler at once,
+                unless one document is longer.
+
+        """
+        self.directory = directory
+        self.blockTokens = blockTokens
+        os.makedirs(directory, exist_ok=True)
+
+    def create(self, name, length, dtype):
+        """Creates an array in the store, stored in [name].npy.
+
+        Returns:
+            numpy.memmap: The new array, mapped for reading and writing.
+
+        """
+        fileName = os.path.join(self.directory, name + ".npy")
+        return np.lib.format.open_memmap(fileName, mode='w+', dtype=dtype, shape=(length,))
+
+    def write(self, name, array, dtype):
+        """Copies an array into the store a block at a time.
+
+        Args:
+            name (str): The name of the array; it is stored in [name].npy.
+            array (numpy.ndarray): The array to store.
+            dtype (numpy.dtype): The type to store it as.
+
+        Returns:
+            numpy.memmap: The stored array, mapped for reading and writing.
+
+        """
+        mapped = self.create(name, len(array), dtype)
+        for start in range(0, len(array), self.blockTokens):
+            mapped[start:start + self.blockTokens] = array[start:start + self.blockTokens]
+        mapped.flush()
+        return mapped
+
+    def openTokens(self):
+        """Opens the file the word ids of a corpus being loaded are appended to, as
+            int32, before readTokens and holdTokens read them back.
+
+        """
+        return open(os.path.join(self.directory, RAW_TOKENS_FILE), 'wb')
+
+    def readTokens(self, numTokens):
+        """Maps the word ids appended to the file from openTokens."""
+        if numTokens == 0:
+            return np.zeros(0, dtype=np.intc)
+        return np.memmap(os.path.join(self.directory, RAW_TOKENS_FILE), dtype=np.intc, mode='r', shape=(numTokens,))
+
+    def countWords(self, docOffsets, numWords):
+        """Counts the tokens and documents of every word appended to the file from
+            openTokens, a block of documents at a time.
+
+        Args:
+            docOffsets (numpy.ndarray): The offsets of each document into the appended ids.
+            numWords (int): The number of word ids.
+
+        Returns:
+            (numpy.ndarray, numpy.ndarray): The number of tokens of each word, and the
+                number of documents it appears in.
+
+        """
+        allTokenIds = self.readTokens(int(docOffsets[-1]))
+        tokenCounts = np.zeros(numWords, dtype=np.int64)
+        docCounts = np.zeros(numWords, dtype=np.int64)
+        for firstDoc, lastDoc in documentBlocks(docOffsets, self.blockTokens):
+            ids = np.asarray(allTokenIds[docOffsets[firstDoc]:docOffsets[lastDoc]], dtype=np.int64)
+            docs = np.repeat(np.arange(lastDoc - firstDoc, dtype=np.int64), np.diff(docOffsets[firstDoc:lastDoc + 1]))
+            tokenCounts += np.bincount(ids, minlength=numWords)
+            docCounts += np.bincount(np.unique(docs * numWords + ids) % numWords, minlength=numWords)
+        return tokenCounts, docCounts
+
+    def holdTokens(self, corpus, staticDocOffsets, newIds, numWords, tokenCounts):
+        """Gives a corpus its per-token arrays from the word ids appended to the file
+            from openTokens, as CorpusData.setTokens does in memory, writing them
+            into the store a block of documents at a time. The appended file is
+            then deleted. The corpus' vocabulary is set by the caller.
+
+        Args:
+            corpus (CorpusData): The corpus being loaded.
+            staticDocOffsets (numpy.ndarray): The offsets of each document into the appended ids.
+            newIds (numpy.ndarray): The staticVocab id of each appended word id.
+            numWords (int): The number of words in staticVocab that are not stopwords.
+            tokenCounts (numpy.ndarray): The number of tokens of each appended word id.
+
+        """
+        numTokens = int(staticDocOffsets[-1])
+        numDocs = len(staticDocOffsets) - 1
+        allTokenIds = self.readTokens(numTokens)
+        counts = np.zeros(len(newIds), dtype=np.int64)
+        counts[newIds] = tokenCounts
+        staticTokenIds = self.create('staticTokenIds', numTokens, np.int32)
+        keepMask = self.create('keepMask', numTokens, bool)
+        tokenIds = self.create('tokenIds', int(counts[:numWords].sum()), smallestDtype(numWords))
+        docOffsets = np.zeros(numDocs + 1, dtype=np.int64)
+        # the postings of each word are filled in corpus order from the start of its entries
+        offsets = np.zeros(len(newIds) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        nextEntry = offsets[:-1].copy()
+        postingsDocs = self.create('postingsDocs', numTokens, np.int32)
+        postingsPositions = self.create('postingsPositions', numTokens, np.int32)
+        kept = 0
+        for firstDoc, lastDoc in documentBlocks(staticDocOffsets, self.blockTokens):
+            start, stop = int(staticDocOffsets[firstDoc]), int(staticDocOffsets[lastDoc])
+            ids = newIds[allTokenIds[start:stop]]
+            keep = ids < numWords
+            staticTokenIds[start:stop] = ids
+            keepMask[start:stop] = keep
+            tokenIds[kept:kept + int(keep.sum())] = ids[keep]
+            localOffsets = staticDocOffsets[firstDoc:lastDoc + 1] - start
+            keptBefore = np.zeros(len(ids) + 1, dtype=np.int64)
+            np.cumsum(keep, out=keptBefore[1:])
+            docOffsets[firstDoc + 1:lastDoc + 1] = kept + keptBefore[localOffsets[1:]]
+            kept += int(keptBefore[-1])
+
+            docs = np.repeat(np.arange(firstDoc, lastDoc, dtype=np.int32), np.diff(localOffsets))
+            order = np.argsort(ids, kind='stable')
+            sortedIds = ids[order]
+            entries = nextEntry[sortedIds] + np.arange(len(ids)) - np.searchsorted(sortedIds, sortedIds)
+            postingsDocs[entries] = docs[order]
+            postingsPositions[entries] = order - localOffsets[docs[order] - firstDoc]
+            nextEntry += np.bincount(ids, minlength=len(newIds))
+        del allTokenIds
+        os.remove(os.path.join(self.directory, RAW_TOKENS_FILE))
+
+        for array in (staticTokenIds, keepMask, tokenIds, postingsDocs, postingsPositions):
+            array.flush()
+        corpus.staticTokenIds = staticTokenIds
+        corpus.staticDocOffsets = staticDocOffsets
+        corpus.keepMask = keepMask
+        corpus.tokenIds = tokenIds
+        corpus.docOffsets = self.write('docOffsets', docOffsets, np.int64)
+        corpus.postings = postings.Postings(offsets, postingsDocs, postingsPositions, numDocs)
+        corpus.tokenStore = self
+
+    def initializeTopics(self, corpus):
+        """Gives every token of a corpus held in the store its first topic, as
+            CorpusData.initializeTopics does, and builds the count matrices, a
+            block of documents at a time.
+
+        """
+        numTopics = corpus.numTopics
+        corpus.tokenTopics = self.create('tokenTopics', len(corpus.tokenIds), smallestDtype(numTopics))
+        corpus.n_wt = np.zeros((len(corpus.vocab), numTopics), dtype=np.int32)
+        corpus.n_dt = np.zeros((corpus.numDocs, numTopics), dtype=np.int32)
+        for firstDoc, lastDoc in documentBlocks(corpus.docOffsets, self.blockTokens):
+            start, stop = int(corpus.docOffsets[firstDoc]), int(corpus.docOffsets[lastDoc])
+            topics = (np.arange(start, stop) + 1) % numTopics
+            corpus.tokenTopics[start:stop] = topics
+            np.add.at(corpus.n_wt, (np.asarray(corpus.tokenIds[start:stop], dtype=np.intp), topics), 1)
+            docs = np.repeat(np.arange(firstDoc, lastDoc), np.diff(corpus.docOffsets[firstDoc:lastDoc + 1]))
+            np.add.at(corpus.n_dt, (docs, topics), 1)
+        corpus.tokenTopics.flush()
+        corpus.n_t = corpus.n_wt.sum(axis=0, dtype=np.int64)
+
+    def hold(self, corpus):
+        """Moves the per-token arrays of a loaded corpus into the store, and replaces
+            the corpus' arrays with maps of the stored files. runLDA then streams
+            the corpus through the sampler.
+
+        """
+        corpus.tokenIds = self.write('tokenIds', corpus.tokenIds, smallestDtype(len(corpus.vocab)))
+        corpus.tokenTopics = self.write('tokenTopics', corpus.tokenTopics, smallestDtype(corpus.numTopics))
+        corpus.docOffsets = self.write('docOffsets', corpus.docOffsets, np.int64)
+        corpus.staticTokenIds = self.write('staticTokenIds', corpus.staticTokenIds, corpus.staticTokenIds.dtype)
+        corpus.keepMask = self.write('keepMask', corpus.keepMask, bool)
+        index = corpus.postings
+        corpus.postings = postings.Postings(index.offsets, self.write('postingsDocs', index.docs, index.docs.dtype),
+                                            self.write('postingsPositions', index.positions, index.positions.dtype),
+                                            index.numDocs)
+        corpus.tokenStore = self
+
+    def staticTopics(self, corpus):
+        """Writes the topic of every token of a corpus held in the store, with -1 for
+            stopwords, a block at a time, as createAnnoTextDataStructure does in memory.
+
+        Returns:
+            numpy.memmap: The stored topics.
+
+        """
+        fileName = os.path.join(self.directory, "staticTopics.npy")
+        mapped = np.lib.format.open_memmap(fileName, mode='w+', dtype=np.int32, shape=corpus.keepMask.shape)
+        kept = 0
+        for start in range(0, len(mapped), self.blockTokens):
+            keep = np.asarray(corpus.keepMask[start:start + self.blockTokens])
+            topics = np.full(len(keep), -1, dtype=np.int32)
+            topics[keep] = corpus.tokenTopics[kept:kept + int(keep.sum())]
+            kept += int(keep.sum())
+            mapped[start:start + len(keep)] = topics
+        mapped.flush()
+        return mapped
+
+    def sweep(self, sweep, corpus, alpha, beta, rng, blockSize):
+        """Performs one sweep over a corpus held in the store, one block of documents
+            at a time. Each block is read into memory, sampled, and its topics
+            written back before the next block is read.
+
+        Args:
+            sweep (function): A sweep from samplers.SWEEPS.
+            corpus (CorpusData): The corpus, after hold.
+            alpha (float): Smoothing constant for the P(t|d) term.
+            beta (float): Smoothing constant for the P(w|t) term.
+            rng (numpy.random.Generator): Source of randomness for this sweep.
+            blockSize (int): The number of tokens the sweep resamples together.
+
+        """
+        for firstDoc, lastDoc in documentBlocks(corpus.docOffsets, self.blockTokens):
+            block = DocumentBlock(corpus, firstDoc, lastDoc)
+            sweep(block, alpha, beta, rng, blockSize)
+            corpus.tokenTopics[block.start:block.stop] = block.tokenTopics